@@ -12,12 +12,43 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import pickle
+import joblib
 import os
+import threading
+import time
 from datetime import datetime, timedelta
 import warnings
 warnings.filterwarnings('ignore')
 
+from retailsmart.basket import cross_sell, load_rules, rules_path
+from retailsmart.cache import ARTIFACT_CACHE, cached
+from retailsmart.campaigns import CUBE_PATH as CAMPAIGN_CUBE_PATH, DEFAULT_WINDOW, CampaignCube
+from retailsmart.cohorts import MATRIX_PATH as COHORT_MATRIX_PATH, METRICS as COHORT_METRICS, CohortMatrix
+from retailsmart.cube import DailyCube
+from retailsmart.downsample import DEFAULT_POINT_BUDGET, DEFAULT_TOP_N, downsample_frame, page_slice, top_n_other
+from retailsmart.features import refresh_store, rfm_frame
+from retailsmart.forecasting import FORECAST_PATH, LEGACY_FORECAST_PATH, load_forecasts, select_series
+from retailsmart.instrumentation import export_prometheus, span, stage_summary, timed
+from retailsmart.loading import load_concurrently, timed_load, timings_frame
+from retailsmart.paths import PHASE2_MODELS_DIR
+from retailsmart.pipeline import CUBE_PATH
+from retailsmart.profiling import TABLES as PROFILED_TABLES, load_profile, profile_path, quality_summary
+from retailsmart.scoring import SCORES_PATH, load_scores
+from retailsmart.shared import (CURRENT_PATH as SHARED_CURRENT_PATH, ENABLED as SHARED_MODE, attach, attach_snapshot,
+                                shared_version)
+from retailsmart.segmentation import (ASSIGNMENTS_PATH, LEGACY_SUMMARY_PATH as LEGACY_SEGMENT_SUMMARY_PATH,
+                                      SUMMARY_PATH as SEGMENT_SUMMARY_PATH, load_assignments, load_summary)
+from retailsmart.snapshot import load_interned_snapshot, resolve_sources, snapshot_version
+from retailsmart.sqlite_store import open_analytics, refresh_database
+
+MODEL_PATH = os.path.join(PHASE2_MODELS_DIR, 'clv_model.pkl')
+SCALER_PATH = os.path.join(PHASE2_MODELS_DIR, 'scaler.pkl')
+TREND_FREQUENCIES = {'D': 'Daily', 'W': 'Weekly', 'M': 'Monthly'}
+PAGE_SIZES = [100, 500, 1000]
+
+# Latency summaries for a node-exporter textfile collector
+export_prometheus()
+
 # ========================
 # PAGE CONFIGURATION
 # ========================
@@ -72,157 +103,216 @@ st.markdown("""
 # ========================
 # DATA LOADING FUNCTIONS
 # ========================
-@st.cache_data
+# The loaders below raise instead of warning: main() runs them concurrently
+# on worker threads and reports failures in a fixed order afterwards.
+# ARTIFACT_CACHE keys each one on the files it reads, so a pipeline run is
+# picked up on the next rerun; exceptions are never cached.
+@timed()
+@cached(sources=lambda: [SHARED_CURRENT_PATH] if SHARED_MODE else list(resolve_sources()[1].values()))
 def load_cleaned_data():
-    """Load cleaned datasets from Phase 1"""
-    try:
-        # Try Phase 1 cleaned files first
-        customers = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-1/Cleaned Files/customers_cleaned.csv')
-        sales = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-1/Cleaned Files/sales_cleaned.csv')
-        products = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-1/Cleaned Files/products_cleaned.csv')
-        marketing = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-1/Cleaned Files/marketing_cleaned.csv')
-        reviews = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-1/Cleaned Files/reviews_cleaned.csv')
-        
-        return customers, sales, products, marketing, reviews, "Phase 1 Cleaned Data"
-    except Exception as e1:
-        try:
-            # Fallback to raw Datasets folder
-            customers = pd.read_csv('/workspaces/Capstone_Project/Datasets/customers.csv')
-            sales = pd.read_csv('/workspaces/Capstone_Project/Datasets/sales.csv')
-            products = pd.read_csv('/workspaces/Capstone_Project/Datasets/products.csv')
-            marketing = pd.read_csv('/workspaces/Capstone_Project/Datasets/marketing.csv')
-            reviews = pd.read_csv('/workspaces/Capstone_Project/Datasets/reviews.csv')
-            
-            return customers, sales, products, marketing, reviews, "Raw Dataset Files"
-        except Exception as e2:
-            st.error(f"❌ Could not load data files!\n\nTried:\n1. Exported_files/Phase1/\n2. Datasets/\n\nError: {str(e2)}")
-            return None, None, None, None, None, None
+    """Load cleaned datasets from Phase 1 via the columnar snapshot"""
+    # Phase 1 cleaned files first, Datasets/ as fallback; the snapshot is
+    # only rebuilt when one of those CSVs has changed on disk. Hex IDs come
+    # back as shared int32 codes; id_registry turns them back into hex.
+    # With RETAILSMART_SHARED=1 the tables are memory-mapped from the
+    # publication of `python -m retailsmart.shared` instead.
+    if SHARED_MODE:
+        return attach_snapshot()
+    return load_interned_snapshot()
 
-@st.cache_data
+@timed()
+@cached(sources=lambda: [SHARED_CURRENT_PATH] if SHARED_MODE else [SCORES_PATH])
 def load_model_predictions():
     """Load Phase 2 model predictions and results"""
-    try:
-        # Load churn predictions
-        churn_pred = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-2/Models/best_churn_model.pkl')
-        
-        # Load model input with features
-        model_input = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-2/data cleaned/model_input.csv')
-        
-        return churn_pred, model_input, True
-    except Exception as e:
-        st.warning(f"⚠️ Phase 2 predictions not found: {str(e)}")
-        return None, None, False
+    # Churn probability and predicted CLV per customer, written by
+    # `python -m retailsmart.scoring` from the Phase 2 models
+    if SHARED_MODE:
+        scores = attach('scores')
+        if scores is None:
+            raise FileNotFoundError('no scores in the shared publication')
+        return scores
+    return load_scores()
 
-@st.cache_resource
+@timed()
+@cached(sources=lambda: [MODEL_PATH, SCALER_PATH])
 def load_trained_model():
     """Load trained ML model from Phase 2"""
-    try:
-        with open('/workspaces/Capstone_Project/Exported_files/Phase-2/Models/clv_model.pkl', 'rb') as f:
-            model = pickle.load(f)
-        
-        with open('/workspaces/Capstone_Project/Exported_files/Phase-2/Models/scaler.pkl', 'rb') as f:
-            scaler = pickle.load(f)
-            
-        return model, scaler, True
-    except Exception as e:
-        st.warning(f"⚠️ Trained model not found: {str(e)}")
-        return None, None, False
+    # The notebook saved these with joblib, which plain pickle cannot read back.
+    # Unpickling pulls in the estimator's library, so this is the slowest
+    # artifact; only the Predictions tab asks for it (see start_warm_up).
+    with span('unpickle.clv_model'):
+        clv_search = joblib.load(MODEL_PATH)
+    model = getattr(clv_search, 'best_estimator_', clv_search)
+    with span('unpickle.scaler'):
+        scaler = joblib.load(SCALER_PATH)
+    return model, scaler
 
-@st.cache_data
+@st.cache_resource
+def start_warm_up():
+    """Pre-load the trained model once per server process, off the render path"""
+    def warm_up():
+        try:
+            load_trained_model()
+        except Exception:
+            pass  # reported by the Predictions tab when it is opened
+    
+    thread = threading.Thread(target=warm_up, name='retailsmart-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+@timed()
+@cached(sources=lambda: [SEGMENT_SUMMARY_PATH, LEGACY_SEGMENT_SUMMARY_PATH, ASSIGNMENTS_PATH])
 def load_clustering_results():
     """Load Phase 3 clustering and segmentation"""
-    try:
-        cluster_summary = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-3/data outputs/cluster_summary.csv')
-        customers_clustered = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-3/data outputs/customers_with_clusters.csv')
-        
-        return cluster_summary, customers_clustered, True
-    except Exception as e:
-        st.warning(f"⚠️ Phase 3 clustering not found: {str(e)}")
-        return None, None, False
+    # Both files are written by `python -m retailsmart.segmentation` (else the
+    # notebook's cluster_summary.csv); the per-customer assignments are
+    # optional for the summary view
+    cluster_summary = load_summary()
+    customers_clustered = load_assignments() if os.path.exists(ASSIGNMENTS_PATH) else None
+    return cluster_summary, customers_clustered
 
-@st.cache_data
+@timed()
+@cached(sources=lambda: [FORECAST_PATH, LEGACY_FORECAST_PATH])
 def load_forecast_results():
     """Load Phase 3 demand forecasting results"""
-    try:
-        forecast = pd.read_csv('/workspaces/Capstone_Project/Exported_files/Phase-3/data outputs/forecast_results.csv')
-        return forecast, True
-    except Exception as e:
-        st.warning(f"⚠️ Phase 3 forecast not found: {str(e)}")
-        return None, False
+    # Category x state table from `python -m retailsmart.forecasting`,
+    # else the notebook's total-only forecast_results.csv
+    return load_forecasts()
+
+@timed()
+def load_artifacts():
+    """Load the snapshot and every precomputed artifact concurrently"""
+    start = time.perf_counter()
+    results = load_concurrently({
+        'cleaned data': load_cleaned_data,
+        'predictions': load_model_predictions,
+        'clustering': load_clustering_results,
+        'forecast': load_forecast_results,
+    })
+    return results, time.perf_counter() - start
+
+def unpack_artifact(result, label, command):
+    """Value and found flag of a load result, warning when it failed"""
+    if result.ok:
+        return result.value, True
+    st.warning(f"⚠️ {label} not found: {str(result.error)} (run `python -m retailsmart.{command}`)")
+    return None, False
+
+@timed()
+@cached()
+def load_rfm_features(data_version):
+    """Load per-customer RFM from the incremental feature store"""
+    # Folds only the sales/marketing rows appended since the last refresh;
+    # shared workers leave that to the publishing process
+    if SHARED_MODE:
+        return attach('features')
+    store, _ = refresh_store()
+    return rfm_frame(store)
+
+@timed()
+@cached(sources=lambda level: [rules_path(level)])
+def load_basket_rules(level):
+    """Load Phase 3 market-basket rules for category or product level"""
+    # Written by `python -m retailsmart.basket --level <level>`
+    return load_rules(level)
+
+@timed()
+@cached(sources=lambda data_version: [CUBE_PATH])
+def load_daily_cube(_sales, _products, data_version):
+    """Load the precomputed day x category x payment_type sales cube, or build it once per data version"""
+    # `python -m retailsmart.pipeline` saves the cube stamped with the snapshot
+    # version it was built from; a missing or stale file falls back to a build
+    return DailyCube.load(CUBE_PATH, version=data_version) or DailyCube.from_sales(_sales, _products)
+
+@timed()
+@cached(sources=lambda data_version: [CAMPAIGN_CUBE_PATH])
+def load_campaign_cube(_marketing, _sales, _customers, data_version):
+    """Load the precomputed campaign attribution cube, or build it once per data version"""
+    # Written by `python -m retailsmart.campaigns` (or the pipeline) for every
+    # attribution window; a missing or stale file falls back to a build
+    return (CampaignCube.load(CAMPAIGN_CUBE_PATH, version=data_version)
+            or CampaignCube.from_tables(_marketing, _sales, _customers))
+
+@timed()
+@cached(sources=lambda data_version: [COHORT_MATRIX_PATH])
+def load_cohort_matrix(_sales, _customers, data_version):
+    """Load the precomputed cohort retention matrix, or build it once per data version"""
+    # Written by `python -m retailsmart.cohorts` (or the pipeline)
+    return CohortMatrix.load(COHORT_MATRIX_PATH, version=data_version) or CohortMatrix.from_sales(_sales, _customers)
+
+@timed()
+@cached(sources=lambda data_version: [profile_path(t) for t in PROFILED_TABLES])
+def load_data_quality(_tables, data_version):
+    """Table-level quality counts from the stored profiles, or a missing-value scan if they are stale"""
+    # Profiles are written by the ingest and kept current by
+    # `python -m retailsmart.profiling`; only without them are the tables rescanned
+    quality = quality_summary()
+    if quality is None:
+        quality = pd.DataFrame({name: {'rows': len(df), 'missing': int(df.isnull().sum().sum())}
+                                for name, df in _tables.items()}).T
+    return quality
+
+@timed()
+@cached(sources=lambda table, data_version: [profile_path(table)])
+def load_column_profile(table, data_version):
+    """Per-column profile of one table, or None if it has not been profiled"""
+    profile = load_profile(table)
+    return None if profile is None else profile.describe()
+
+@timed()
+@cached()
+def load_sqlite_analytics(data_version):
+    """Open the SQLite store, rebuilding it first if the snapshot changed"""
+    refresh_database()
+    return open_analytics()
 
 # ========================
 # ANALYSIS FUNCTIONS
 # ========================
-def calculate_real_kpis(sales_df, customers_df):
+# KPIs and range figures are cached per (data version, date range), so
+# flipping back to a range seen before skips the cube queries and plotting
+@timed()
+@cached()
+def calculate_real_kpis(_cube, _customers_df, data_version, start, end):
     """Calculate actual KPIs from your data"""
-    # Revenue metrics
-    total_revenue = sales_df['OrderValue'].sum() if 'OrderValue' in sales_df.columns else sales_df['order_value'].sum()
-    
-    # Order metrics
-    total_orders = len(sales_df)
-    avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+    cube, customers_df = _cube, _customers_df
+    # Revenue, order, AOV and 30-day growth metrics all come from the cube's
+    # prefix sums, so a new date range never rescans the sales rows
+    kpis = cube.kpis(start, end)
     
     # Customer metrics
-    total_customers = customers_df['CustomerID'].nunique() if 'CustomerID' in customers_df.columns else len(customers_df)
-    
-    # Time-based growth (compare last 30 days vs previous 30 days)
-    sales_df['OrderDate'] = pd.to_datetime(sales_df.get('OrderDate', sales_df.get('order_date')))
-    latest_date = sales_df['OrderDate'].max()
-    thirty_days_ago = latest_date - timedelta(days=30)
-    sixty_days_ago = latest_date - timedelta(days=60)
-    
-    recent_sales = sales_df[sales_df['OrderDate'] >= thirty_days_ago]
-    previous_sales = sales_df[(sales_df['OrderDate'] >= sixty_days_ago) & (sales_df['OrderDate'] < thirty_days_ago)]
-    
-    recent_revenue = recent_sales['OrderValue'].sum() if 'OrderValue' in recent_sales.columns else recent_sales['order_value'].sum()
-    previous_revenue = previous_sales['OrderValue'].sum() if 'OrderValue' in previous_sales.columns else previous_sales['order_value'].sum()
-    
-    revenue_growth = ((recent_revenue - previous_revenue) / previous_revenue * 100) if previous_revenue > 0 else 0
-    
-    orders_growth = ((len(recent_sales) - len(previous_sales)) / len(previous_sales) * 100) if len(previous_sales) > 0 else 0
-    
-    recent_aov = recent_revenue / len(recent_sales) if len(recent_sales) > 0 else 0
-    previous_aov = previous_revenue / len(previous_sales) if len(previous_sales) > 0 else 0
-    aov_growth = ((recent_aov - previous_aov) / previous_aov * 100) if previous_aov > 0 else 0
-    
-    return {
-        'total_revenue': total_revenue,
-        'revenue_growth': revenue_growth,
-        'total_orders': total_orders,
-        'orders_growth': orders_growth,
-        'avg_order_value': avg_order_value,
-        'aov_growth': aov_growth,
-        'total_customers': total_customers,
-        'customer_growth': 0  # Would need historical customer data
-    }
+    kpis['total_customers'] = customers_df['CustomerID'].nunique() if 'CustomerID' in customers_df.columns else len(customers_df)
+    kpis['customer_growth'] = 0  # Would need historical customer data
+    return kpis
 
-def create_revenue_trend_actual(sales_df):
+@timed()
+@cached()
+def create_revenue_trend_actual(_cube, data_version, start, end, freq='M', max_points=DEFAULT_POINT_BUDGET):
     """Create revenue trend from actual data"""
-    sales_df['OrderDate'] = pd.to_datetime(sales_df.get('OrderDate', sales_df.get('order_date')))
-    sales_df['YearMonth'] = sales_df['OrderDate'].dt.to_period('M')
-    
-    value_col = 'OrderValue' if 'OrderValue' in sales_df.columns else 'order_value'
-    monthly_revenue = sales_df.groupby('YearMonth')[value_col].sum().reset_index()
-    monthly_revenue['OrderDate'] = monthly_revenue['YearMonth'].dt.to_timestamp()
-    
-    fig = px.line(monthly_revenue, x='OrderDate', y=value_col,
-                  title='📈 Actual Revenue Trend (Monthly)',
-                  labels={value_col: 'Revenue ($)', 'OrderDate': 'Date'})
+    revenue = _cube.series(start, end, freq=freq)
+    # Long daily ranges are thinned with LTTB so the browser gets at most
+    # max_points points, with the peaks and dips kept
+    points = downsample_frame(revenue, 'date', 'revenue', max_points)
+    shown = f', {len(points):,} of {len(revenue):,} points' if len(points) < len(revenue) else ''
+    
+    fig = px.line(points, x='date', y='revenue',
+                  title=f'📈 Actual Revenue Trend ({TREND_FREQUENCIES[freq]}{shown})',
+                  labels={'revenue': 'Revenue ($)', 'date': 'Date'})
     fig.update_traces(line_color='#667eea', line_width=3, fill='tozeroy')
     fig.update_layout(hovermode='x unified', height=400)
     return fig
 
-def create_category_analysis(sales_df, products_df):
+@timed()
+@cached()
+def create_category_analysis(_cube, data_version, start, end, top_n=DEFAULT_TOP_N):
     """Analyze sales by product category"""
     try:
-        # Merge sales with products to get category
-        sales_merged = sales_df.merge(products_df, on='ProductID', how='left')
-        category_col = 'ProductCategory' if 'ProductCategory' in sales_merged.columns else 'category'
-        value_col = 'OrderValue' if 'OrderValue' in sales_merged.columns else 'order_value'
-        
-        category_sales = sales_merged.groupby(category_col)[value_col].sum().reset_index()
+        category_sales = _cube.by_category(start, end)
+        category_sales = category_sales[category_sales['revenue'] > 0]
+        # The long tail of small categories becomes one "Other" slice
+        category_sales = top_n_other(category_sales, 'category_english', 'revenue', top_n)
         
-        fig = px.pie(category_sales, values=value_col, names=category_col,
+        fig = px.pie(category_sales, values='revenue', names='category_english',
                      title='🥧 Sales Distribution by Category',
                      color_discrete_sequence=px.colors.qualitative.Set3)
         fig.update_traces(textposition='inside', textinfo='percent+label')
@@ -232,6 +322,23 @@ def create_category_analysis(sales_df, products_df):
         st.error(f"Error creating category chart: {e}")
         return None
 
+@timed()
+def show_table_page(df, id_registry, key):
+    """One page of a raw table, with page controls"""
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f'{key}_page_size')
+    n_pages = max(1, (len(df) + page_size - 1) // page_size)
+    with col2:
+        page = st.number_input(f"Page (of {n_pages:,})", min_value=1, max_value=n_pages, value=1,
+                               key=f'{key}_page')
+    # Only the visible slice is decoded and sent to the browser
+    rows, _ = page_slice(df, page, page_size)
+    first = (page - 1) * page_size
+    st.dataframe(id_registry.decode_frame(rows), use_container_width=True)
+    st.caption(f"Rows {first + 1:,}–{first + len(rows):,} of {len(df):,}")
+
+@timed()
 def create_churn_analysis(churn_predictions):
     """Analyze churn predictions from your model"""
     if churn_predictions is None:
@@ -271,28 +378,106 @@ def create_churn_analysis(churn_predictions):
     fig.update_layout(height=300)
     return fig
 
+@timed()
 def create_cluster_visualization(cluster_summary, customers_clustered):
     """Visualize customer segments from Phase 3"""
     if cluster_summary is None:
         return None
     
-    fig = px.bar(cluster_summary, x='Cluster', y='CustomerCount',
+    fig = px.bar(cluster_summary, x='profile', y='count',
                  title='👥 Customer Segments (From Your Clustering)',
-                 color='Cluster',
+                 labels={'profile': 'Segment', 'count': 'Customers'},
+                 color='profile',
                  color_discrete_sequence=['#667eea', '#764ba2', '#f093fb', '#4facfe'])
     fig.update_layout(showlegend=False, height=400)
     return fig
 
-def create_forecast_visualization(forecast_df):
+@timed()
+def create_cross_sell_chart(recommendations):
+    """Lift of the recommended add-on items"""
+    if recommendations is None or recommendations.empty:
+        return None
+    
+    chart = recommendations.assign(
+        item=recommendations['consequents'].map(', '.join)
+    )
+    fig = px.bar(chart, x='lift', y='item', orientation='h',
+                 title='🛒 Cross-Sell Candidates (Lift)',
+                 hover_data={'confidence': ':.2%', 'support': ':.4%'},
+                 color='confidence', color_continuous_scale='Purples')
+    fig.update_layout(height=400, yaxis={'categoryorder': 'total ascending'})
+    return fig
+
+@timed()
+def create_forecast_visualization(series_df, measure='revenue'):
     """Visualize demand forecast from Phase 3"""
-    if forecast_df is None:
+    if series_df is None or series_df.empty:
+        return None
+    
+    label = 'Revenue ($)' if measure == 'revenue' else 'Orders'
+    actual = series_df[~series_df['is_forecast']]
+    forecast = series_df[series_df['is_forecast']]
+    # Start the forecast line at the last actual month so the two join up
+    forecast = pd.concat([actual.tail(1), forecast])
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=actual['date'], y=actual[measure], name='Actual',
+                             mode='lines+markers', line=dict(color='#667eea', width=3)))
+    fig.add_trace(go.Scatter(x=forecast['date'], y=forecast[measure], name='Forecast',
+                             mode='lines+markers', line=dict(color='#764ba2', width=3, dash='dash')))
+    fig.update_layout(title=f'📊 {label.split(" ")[0]} Forecast (From Your Model)',
+                      xaxis_title='Date', yaxis_title=label, height=400)
+    return fig
+
+@timed()
+def create_campaign_channel_chart(by_channel):
+    """Attributed vs baseline revenue per channel, ROI on hover"""
+    if by_channel is None or by_channel.empty:
+        return None
+    
+    chart = by_channel.reset_index()
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=chart['channel'], y=chart['attributed_revenue'], name='Attributed',
+                         marker_color='#667eea', customdata=chart['roi'],
+                         hovertemplate='%{x}<br>$%{y:,.0f}<br>ROI %{customdata:.1%}<extra></extra>'))
+    fig.add_trace(go.Bar(x=chart['channel'], y=chart['baseline_revenue'], name='Baseline (before touch)',
+                         marker_color='#c3cfe2'))
+    fig.update_layout(title='📣 Revenue After vs Before Campaign Touches', barmode='group',
+                      xaxis_title='Channel', yaxis_title='Revenue ($)', height=400)
+    return fig
+
+@timed()
+def create_campaign_trend_chart(by_month):
+    """Incremental revenue and spend per campaign month"""
+    if by_month is None or by_month.empty:
+        return None
+    
+    chart = by_month.reset_index()
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=chart['month'], y=chart['incremental_revenue'], name='Incremental revenue',
+                         marker_color='#764ba2'))
+    fig.add_trace(go.Scatter(x=chart['month'], y=chart['spend'], name='Spend', yaxis='y2',
+                             mode='lines+markers', line=dict(color='#f5576c', width=2)))
+    fig.update_layout(title='📅 Incremental Revenue and Spend by Month', xaxis_title='Campaign month',
+                      yaxis=dict(title='Incremental revenue ($)'),
+                      yaxis2=dict(title='Spend ($)', overlaying='y', side='right'), height=400)
+    return fig
+
+@timed()
+def create_cohort_heatmap(table, metric):
+    """Acquisition cohort x months-since-acquisition heatmap"""
+    if table is None or table.empty:
         return None
     
-    fig = px.line(forecast_df, x='Date', y='ForecastedRevenue',
-                  title='📊 Revenue Forecast (From Your Model)',
-                  labels={'ForecastedRevenue': 'Forecasted Revenue ($)', 'Date': 'Date'})
-    fig.update_traces(line_color='#764ba2', line_width=3)
-    fig.update_layout(height=400)
+    values = table * 100 if metric == 'retention' else table
+    # Month 0 retention is 100% by definition; scale colours on later months
+    later = values.iloc[:, 1:].to_numpy()
+    top = np.nanmax(later) if metric == 'retention' and np.isfinite(later).any() else None
+    fig = px.imshow(values, aspect='auto', color_continuous_scale='Purples',
+                    range_color=(0, top) if top else None, text_auto='.1f' if metric == 'retention' else '.3s',
+                    labels=dict(x='Months since first purchase', y='Acquisition cohort',
+                                color=COHORT_METRICS[metric]))
+    fig.update_layout(title=f'🔁 {COHORT_METRICS[metric]} by Cohort', height=max(400, 22 * len(values)))
     return fig
 
 # ========================
@@ -306,9 +491,11 @@ def main():
     
     # Load data
     with st.spinner('Loading your project data...'):
-        customers, sales, products, marketing, reviews, data_source = load_cleaned_data()
+        artifacts, load_seconds = load_artifacts()
+        start_warm_up()
         
-        if customers is None:
+        if not artifacts['cleaned data'].ok:
+            st.error(f"❌ Could not load data files!\n\nTried:\n1. Exported_files/Phase1/\n2. Datasets/\n\nError: {str(artifacts['cleaned data'].error)}")
             st.error("❌ Cannot load data files. Please check your folder structure!")
             st.info("""
             **Expected folder structure:**
@@ -327,21 +514,24 @@ def main():
             ```
             """)
             return
+        customers, sales, products, marketing, reviews, data_source, id_registry = artifacts['cleaned data'].value
+        data_version = shared_version() if SHARED_MODE else snapshot_version()
         
-        # Load Phase 2 predictions
-        churn_pred, model_input, has_predictions = load_model_predictions()
-        model, scaler, has_model = load_trained_model()
+        # Load Phase 2 predictions (the trained model itself loads lazily)
+        churn_pred, has_predictions = unpack_artifact(artifacts['predictions'], 'Phase 2 predictions', 'scoring')
+        has_model = os.path.exists(MODEL_PATH)
         
         # Load Phase 3 results
-        cluster_summary, customers_clustered, has_clustering = load_clustering_results()
-        forecast, has_forecast = load_forecast_results()
+        clustering, has_clustering = unpack_artifact(artifacts['clustering'], 'Phase 3 clustering', 'segmentation')
+        cluster_summary, customers_clustered = clustering if has_clustering else (None, None)
+        forecast, has_forecast = unpack_artifact(artifacts['forecast'], 'Phase 3 forecast', 'forecasting')
         
         # Data source indicator
         st.markdown(f"""
         <div class="success-box">
             ✅ <strong>Data Loaded Successfully!</strong><br>
             📂 Source: {data_source}<br>
-            🔬 Phase 2 Model: {'✅ Loaded' if has_model else '❌ Not Found'}<br>
+            🔬 Phase 2 Model: {'✅ Available' if has_model else '❌ Not Found'}<br>
             🎯 Phase 2 Predictions: {'✅ Loaded' if has_predictions else '❌ Not Found'}<br>
             👥 Phase 3 Clustering: {'✅ Loaded' if has_clustering else '❌ Not Found'}<br>
             📈 Phase 3 Forecast: {'✅ Loaded' if has_forecast else '❌ Not Found'}
@@ -352,19 +542,25 @@ def main():
     st.sidebar.title("📊 Dashboard Controls")
     st.sidebar.markdown("---")
     
-    # Filters
-    date_col = 'OrderDate' if 'OrderDate' in sales.columns else 'order_date'
-    sales[date_col] = pd.to_datetime(sales[date_col])
+    # Filters (RETAILSMART_BACKEND=sqlite answers the date-range analytics
+    # from the SQLite store instead of the in-memory cube)
+    if os.environ.get('RETAILSMART_BACKEND', 'pandas') == 'sqlite':
+        cube = load_sqlite_analytics(data_version)
+    else:
+        cube = load_daily_cube(sales, products, data_version)
     
     date_range = st.sidebar.date_input(
         "Select Date Range",
-        value=(sales[date_col].min(), sales[date_col].max()),
+        value=(cube.days[0].date(), cube.days[-1].date()),
         key='date_range'
     )
     
-    # Apply filters
-    filtered_sales = sales[(sales[date_col] >= pd.Timestamp(date_range[0])) & 
-                           (sales[date_col] <= pd.Timestamp(date_range[1]))]
+    # Apply filters (a half-picked range behaves like a single day)
+    start_date, end_date = (date_range[0], date_range[-1]) if date_range else (cube.days[0], cube.days[-1])
+    
+    # Upper bound on the points any one line chart sends to the browser
+    point_budget = st.sidebar.number_input("Max points per chart", min_value=100, max_value=100_000,
+                                           value=DEFAULT_POINT_BUDGET, step=100, key='point_budget')
     
     st.sidebar.markdown("---")
     st.sidebar.markdown("### 📁 Your Data")
@@ -376,9 +572,14 @@ def main():
     **Reviews:** {len(reviews):,}
     """)
     
+    with st.sidebar.expander("⏱️ Load Timings"):
+        timings = timings_frame(artifacts)
+        st.dataframe(timings, hide_index=True, use_container_width=True)
+        st.caption(f"{load_seconds:.2f}s wall time for {timings['seconds'].sum():.2f}s of loading")
+    
     # KPIs
     st.markdown("## 📈 Key Performance Indicators (From Your Data)")
-    kpis = calculate_real_kpis(filtered_sales, customers)
+    kpis = calculate_real_kpis(cube, customers, data_version, start_date, end_date)
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -415,19 +616,21 @@ def main():
     # Visualizations
     st.markdown("## 📊 Analytics from Your Project Phases")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["📈 Phase 1: EDA", "🎯 Phase 2: Predictions", "👥 Phase 3: Clustering", "📊 Phase 3: Forecast"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["📈 Phase 1: EDA", "🎯 Phase 2: Predictions", "👥 Phase 3: Clustering", "📊 Phase 3: Forecast", "🛒 Phase 3: Market Basket", "📣 Campaign ROI", "🔁 Cohort Retention"])
     
-    with tab1:
+    with tab1, span('tab.eda'):
         st.markdown("### Phase 1: Exploratory Data Analysis")
         
         col1, col2 = st.columns(2)
         
         with col1:
-            fig = create_revenue_trend_actual(filtered_sales)
+            freq = st.radio("Granularity", list(TREND_FREQUENCIES), index=2, horizontal=True,
+                            format_func=TREND_FREQUENCIES.get, key='trend_freq')
+            fig = create_revenue_trend_actual(cube, data_version, start_date, end_date, freq, point_budget)
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
-            fig = create_category_analysis(filtered_sales, products)
+            fig = create_category_analysis(cube, data_version, start_date, end_date)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
         
@@ -435,19 +638,51 @@ def main():
         st.markdown("### 📋 Data Quality Summary")
         col1, col2, col3 = st.columns(3)
         
+        quality = load_data_quality({'sales': sales, 'customers': customers, 'products': products},
+                                    data_version)
+        
         with col1:
-            missing_sales = sales.isnull().sum().sum()
+            missing_sales = quality.loc['sales', 'missing']
             st.metric("Sales Missing Values", missing_sales)
         
         with col2:
-            missing_customers = customers.isnull().sum().sum()
+            missing_customers = quality.loc['customers', 'missing']
             st.metric("Customer Missing Values", missing_customers)
         
         with col3:
-            missing_products = products.isnull().sum().sum()
+            missing_products = quality.loc['products', 'missing']
             st.metric("Product Missing Values", missing_products)
+        
+        if 'duplicate_rows' in quality.columns:
+            with st.expander("Column profiles"):
+                st.dataframe(quality, use_container_width=True)
+                table = st.selectbox("Table", list(quality.index), key='profile_table')
+                columns = load_column_profile(table, data_version)
+                if columns is not None:
+                    st.dataframe(columns, use_container_width=True)
+        
+        # Customer RFM from the feature store
+        rfm, has_rfm = unpack_artifact(timed_load(lambda: load_rfm_features(data_version)),
+                                       'RFM feature store', 'features')
+        if has_rfm and len(rfm):
+            st.markdown("### 👤 Customer RFM Profile")
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Avg Recency (days)", f"{rfm['recency'].mean():.0f}")
+            
+            with col2:
+                st.metric("Repeat Customers", f"{(rfm['frequency'] > 1).mean() * 100:.1f}%")
+            
+            with col3:
+                st.metric("Avg Lifetime Spend", f"${rfm['monetary'].mean():,.2f}")
+            
+            with col4:
+                targeted = rfm[rfm['campaigns'] > 0]
+                response_rate = targeted['response_rate'].mean() * 100 if len(targeted) else 0
+                st.metric("Campaign Response Rate", f"{response_rate:.1f}%")
     
-    with tab2:
+    with tab2, span('tab.predictions'):
         st.markdown("### Phase 2: Churn Prediction Results")
         
         if has_predictions:
@@ -470,13 +705,18 @@ def main():
                 Check Phase2 folder for detailed metrics!
                 """)
                 
-                if has_model:
-                    st.success("✅ Model loaded successfully!")
-                    st.code(f"Model: {type(model).__name__}")
+                # Loaded on demand; start_warm_up has usually cached it already
+                if has_model and st.toggle("🔬 Show trained model", key='show_model'):
+                    try:
+                        model, scaler = load_trained_model()
+                        st.success("✅ Model loaded successfully!")
+                        st.code(f"Model: {type(model).__name__}")
+                    except Exception as e:
+                        st.warning(f"⚠️ Trained model not found: {str(e)}")
         else:
             st.warning("⚠️ Phase 2 predictions not found. Complete Phase 2 to see churn analysis.")
     
-    with tab3:
+    with tab3, span('tab.clustering'):
         st.markdown("### Phase 3: Customer Segmentation")
         
         if has_clustering:
@@ -493,37 +733,194 @@ def main():
         else:
             st.warning("⚠️ Phase 3 clustering not found. Complete Phase 3 to see segmentation.")
     
-    with tab4:
+    with tab4, span('tab.forecast'):
         st.markdown("### Phase 3: Demand Forecasting")
         
         if has_forecast:
-            fig = create_forecast_visualization(forecast)
+            # Reconciled forecasts add up, so any category/state slice is a
+            # sum over the bottom series
+            bottom = forecast[forecast['level'] == 'category_state']
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                category = st.selectbox("Category", ['All'] + sorted(bottom['category'].unique()),
+                                        key='forecast_category')
+            with col2:
+                in_category = bottom if category == 'All' else bottom[bottom['category'] == category]
+                state = st.selectbox("State", ['All'] + sorted(in_category['state'].unique()),
+                                     key='forecast_state')
+            with col3:
+                measure = st.radio("Measure", ['revenue', 'orders'], horizontal=True,
+                                   format_func=str.title, key='forecast_measure')
+            
+            with span('select_series'):
+                series = select_series(forecast,
+                                       category=None if category == 'All' else category,
+                                       state=None if state == 'All' else state)
+            fig = create_forecast_visualization(series, measure)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
             
             st.markdown("#### 📊 Forecast Details")
-            st.dataframe(forecast.head(10), use_container_width=True)
+            st.dataframe(series[series['is_forecast']].drop(columns='is_forecast'), use_container_width=True)
         else:
             st.warning("⚠️ Phase 3 forecast not found. Complete Phase 3 to see predictions.")
     
+    with tab5, span('tab.basket'):
+        st.markdown("### Phase 3: Market Basket & Cross-Sell")
+        
+        level = st.radio("Item level", ['category', 'product'], horizontal=True,
+                         format_func=str.title, key='basket_level')
+        rules, has_rules = unpack_artifact(timed_load(lambda: load_basket_rules(level)),
+                                           f'{level.title()}-level basket rules', f'basket --level {level}')
+        
+        if has_rules and len(rules):
+            antecedent_items = sorted({item for items in rules['antecedents'] for item in items})
+            basket_items = st.multiselect("Items in the basket", antecedent_items,
+                                          default=antecedent_items[:1], key='basket_items')
+            with span('cross_sell'):
+                recommendations = cross_sell(rules, basket_items)
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fig = create_cross_sell_chart(recommendations)
+                if fig:
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("No rule fires for this basket.")
+            
+            with col2:
+                st.markdown("#### 🔗 Strongest Rules")
+                top_rules = rules.head(20).assign(
+                    antecedents=rules['antecedents'].head(20).map(', '.join),
+                    consequents=rules['consequents'].head(20).map(', '.join),
+                )
+                st.dataframe(top_rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']],
+                             use_container_width=True)
+        elif has_rules:
+            st.info("No rules above the minimum lift at this level.")
+    
+    with tab6, span('tab.campaigns'):
+        st.markdown("### Campaign ROI & Attribution")
+        
+        campaign_cube = load_campaign_cube(marketing, sales, customers, data_version)
+        if len(campaign_cube.months):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                windows = [int(w) for w in campaign_cube.windows]
+                window = st.selectbox("Attribution window (days)", windows,
+                                      index=windows.index(DEFAULT_WINDOW) if DEFAULT_WINDOW in windows else 0,
+                                      key='campaign_window')
+            with col2:
+                channels = st.multiselect("Channels", list(campaign_cube.channels),
+                                          default=list(campaign_cube.channels), key='campaign_channels')
+            with col3:
+                month_labels = [month.strftime('%Y-%m') for month in campaign_cube.months]
+                first_month, last_month = st.select_slider("Campaign months", options=month_labels,
+                                                           value=(month_labels[0], month_labels[-1]),
+                                                           key='campaign_months')
+            
+            # Sums over the precomputed cells; ROI and costs are derived after summing
+            with span('campaign_slice'):
+                selection = dict(channels=channels, start=first_month, end=last_month)
+                totals = campaign_cube.totals(window, **selection)
+                by_channel = campaign_cube.summary(window, by='channel', **selection)
+                by_month = campaign_cube.summary(window, by='month', **selection)
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Campaign Spend", f"${totals['spend']:,.0f}")
+            with col2:
+                st.metric("Incremental Revenue", f"${totals['incremental_revenue']:,.0f}",
+                          help="Revenue in the window after each touch minus the window before it")
+            with col3:
+                st.metric("ROI", f"{totals['roi']:.1%}" if pd.notna(totals['roi']) else "n/a")
+            with col4:
+                st.metric("Cost per Conversion", f"${totals['cost_per_conversion']:,.2f}"
+                          if pd.notna(totals['cost_per_conversion']) else "n/a")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                fig = create_campaign_channel_chart(by_channel)
+                if fig:
+                    st.plotly_chart(fig, use_container_width=True)
+            with col2:
+                fig = create_campaign_trend_chart(by_month)
+                if fig:
+                    st.plotly_chart(fig, use_container_width=True)
+            
+            st.markdown("#### 📊 Channel Breakdown")
+            st.dataframe(by_channel, use_container_width=True)
+        else:
+            st.warning("⚠️ No marketing campaigns with a start date in this data.")
+    
+    with tab7, span('tab.cohorts'):
+        st.markdown("### Cohort Retention & Repeat Purchases")
+        
+        cohort_matrix = load_cohort_matrix(sales, customers, data_version)
+        if len(cohort_matrix.months) > 1:
+            col1, col2 = st.columns(2)
+            with col1:
+                metric = st.selectbox("Measure", list(COHORT_METRICS), format_func=COHORT_METRICS.get,
+                                      key='cohort_metric')
+            with col2:
+                max_age = st.slider("Months since first purchase", min_value=1,
+                                    max_value=len(cohort_matrix.months) - 1,
+                                    value=min(12, len(cohort_matrix.months) - 1), key='cohort_max_age')
+            
+            cohort_summary = cohort_matrix.summary()
+            retention = cohort_matrix.frame('retention', max_age)
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Cohorts", f"{len(cohort_summary):,}")
+            with col2:
+                st.metric("Avg Month-1 Retention", f"{retention[1].mean():.1%}")
+            with col3:
+                st.metric("Repeat Purchase Rate",
+                          f"{cohort_summary['repeat_customers'].sum() / cohort_summary['customers'].sum():.1%}")
+            
+            fig = create_cohort_heatmap(cohort_matrix.frame(metric, max_age), metric)
+            if fig:
+                st.plotly_chart(fig, use_container_width=True)
+            
+            st.markdown("#### 👥 Cohort Summary")
+            st.dataframe(cohort_summary, use_container_width=True)
+        else:
+            st.warning("⚠️ Not enough order history for a cohort view (fewer than two months).")
+    
     st.markdown("---")
     
     # Raw Data
     with st.expander("📋 View Your Raw Data"):
         tab1, tab2, tab3, tab4, tab5 = st.tabs(["Customers", "Sales", "Products", "Marketing", "Reviews"])
         
-        with tab1:
-            st.dataframe(customers.head(100), use_container_width=True)
-        with tab2:
-            st.dataframe(sales.head(100), use_container_width=True)
-        with tab3:
-            st.dataframe(products.head(100), use_container_width=True)
-        with tab4:
-            st.dataframe(marketing.head(100), use_container_width=True)
-        with tab5:
-            st.dataframe(reviews.head(100), use_container_width=True)
+        for tab, (name, df) in zip((tab1, tab2, tab3, tab4, tab5),
+                                   [('customers', customers), ('sales', sales), ('products', products),
+                                    ('marketing', marketing), ('reviews', reviews)]):
+            with tab:
+                show_table_page(df, id_registry, f'raw_{name}')
     
     # Footer
+    # Per-stage latency across every session; hidden unless the URL has
+    # ?perf=1 or RETAILSMART_PERF_PANEL=1 is set
+    if st.query_params.get('perf') == '1' or os.environ.get('RETAILSMART_PERF_PANEL') == '1':
+        with st.sidebar.expander("⚡ Performance"):
+            summary = stage_summary()
+            st.dataframe(summary.sort_values('p90_ms', ascending=False).round(2),
+                         hide_index=True, use_container_width=True)
+            st.caption(f"{int(summary['count'].sum()) if len(summary) else 0:,} spans recorded; "
+                       f"exported to Exported_files/Metrics/")
+    
+    # Cache stats go last so they include this run's lookups
+    with st.sidebar.expander("🗄️ Artifact Cache"):
+        stats = ARTIFACT_CACHE.stats()
+        st.caption(f"{stats['bytes'] / 2 ** 20:,.1f} of {stats['max_bytes'] / 2 ** 20:,.0f} MB · "
+                   f"{stats['entries']} entries · {stats['hit_rate']:.0%} hit rate")
+        st.caption(f"{stats['hits']:,} hits · {stats['misses']:,} misses · "
+                   f"{stats['evictions']:,} evictions · {stats['invalidations']:,} invalidations")
+        st.dataframe(ARTIFACT_CACHE.entries()[['name', 'args', 'bytes', 'hits']],
+                     hide_index=True, use_container_width=True)
+    
     st.markdown("---")
     st.markdown("""
         <div style='text-align: center; color: #666;'>
@@ -535,4 +932,5 @@ def main():
     """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with span('render'):
+        main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+"""
+Campaign Attribution Benchmark
+==============================
+Last-touch attribution of orders to marketing touches: a cross merge of
+touches and orders per customer, filtered to each window, vs the sorted
+as-of join CampaignCube.from_tables runs once for every window.
+
+- --touch-scale replicates each touch with random date shifts, to see how
+  the join grows with millions of touches. The cross merge is skipped once
+  its pair count passes --max-pairs.
+- Both paths compute attributed and baseline revenue for every window, and
+  are checked to agree per window and channel.
+
+Usage:
+    python benchmarks/bench_campaigns.py
+    python benchmarks/bench_campaigns.py --touch-scale 100
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_campaigns.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.campaigns import CampaignCube, load_inputs, order_events  # noqa: E402
+from retailsmart.features import customer_key_map  # noqa: E402
+
+
+def time_call(fn, repeat):
+    """Best-of-N wall time in seconds, and the last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def scale_touches(marketing, factor, seed):
+    """factor copies of every touch, all but the first shifted by up to a year"""
+    if factor <= 1:
+        return marketing
+    rng = np.random.default_rng(seed)
+    copies = pd.concat([marketing] * factor, ignore_index=True)
+    shift = rng.integers(-365, 366, len(copies))
+    shift[:len(marketing)] = 0
+    copies['start_date'] = copies['start_date'] + pd.to_timedelta(shift, unit='D')
+    return copies
+
+
+def cross_merge(marketing, sales, customers, windows):
+    """Attributed and baseline revenue per window and channel, from every (touch, order) pair of a customer"""
+    key_map = customer_key_map(customers)
+    orders = order_events(sales, key_map)
+    touches = pd.DataFrame({'person': marketing['customer_id'].map(key_map).fillna(marketing['customer_id']),
+                            'start_date': marketing['start_date'], 'channel': marketing['channel']})
+    pairs = orders.reset_index().merge(touches, on='person')
+    pairs['lag'] = pairs['ts'] - pairs['start_date']
+    pairs = pairs[pairs['lag'].abs() <= pd.Timedelta(days=max(windows))].sort_values('start_date', kind='stable')
+    last = pairs[pairs['lag'] >= pd.Timedelta(0)].drop_duplicates('index', keep='last')
+    first = pairs[pairs['lag'] < pd.Timedelta(0)].drop_duplicates('index', keep='first')
+    result = {}
+    for window in windows:
+        limit = pd.Timedelta(days=window)
+        result[window] = pd.DataFrame({
+            'attributed_revenue': last[last['lag'] <= limit].groupby('channel', observed=True)['revenue'].sum(),
+            'baseline_revenue': first[-first['lag'] <= limit].groupby('channel', observed=True)['revenue'].sum(),
+        })
+    return result
+
+
+def pair_count(marketing, sales, customers):
+    """Rows the cross merge would materialise"""
+    key_map = customer_key_map(customers)
+    touch_counts = marketing['customer_id'].map(key_map).fillna(marketing['customer_id']).value_counts()
+    order_counts = order_events(sales, key_map)['person'].value_counts()
+    return int((touch_counts * order_counts.reindex(touch_counts.index, fill_value=0)).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark campaign attribution')
+    parser.add_argument('--touch-scale', type=int, default=1, help='copies of each touch')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-pairs', type=int, default=20_000_000, help='skip the cross merge past this')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    tables = load_inputs()
+    customers, sales = tables['customers'], tables['sales']
+    marketing = scale_touches(tables['marketing'], args.touch_scale, args.seed)
+
+    new, cube = time_call(lambda: CampaignCube.from_tables(marketing, sales, customers), args.repeat)
+    pairs = pair_count(marketing, sales, customers)
+
+    print(f"Touches / sales rows:       {len(marketing):,} / {len(sales):,}")
+    print(f"Windows:                    {', '.join(str(w) for w in cube.windows)} days")
+    print(f"Cube (as-of join):          {new:9.3f} s  ({len(marketing) / new:,.0f} touches/s)")
+    if pairs > args.max_pairs:
+        print(f"Cross merge:                skipped ({pairs:,} pairs)")
+        return
+    old, expected = time_call(lambda: cross_merge(marketing, sales, customers, cube.windows), args.repeat)
+    same = all(np.allclose(expected[window].reindex(cube.channels, fill_value=0)[column],
+                           cube.summary(window)[column])
+               for window in cube.windows for column in expected[window].columns)
+    print(f"Cross merge:                {old:9.3f} s  ({pairs:,} pairs)")
+    print(f"Speed-up:                   {old / new:9.1f}x  (same revenue per window and channel: {same})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Cohort Matrix Benchmark
+=======================
+Cohort x months-since-acquisition retention and revenue: the notebook-style
+pandas path (groupby for the first month, period arithmetic, groupby with
+nunique per cell) vs CohortMatrix.from_sales on interned codes.
+
+- --scale stacks that many copies of the interned sales, each with its own
+  order, customer and customer_unique_id codes, to reach tens of millions of
+  orders. The pandas path is skipped past --max-baseline-rows.
+- Checks that both paths give the same customers and revenue per cell.
+
+Usage:
+    python benchmarks/bench_cohorts.py
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_cohorts.py --scale 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.cohorts import CohortMatrix  # noqa: E402
+from retailsmart.features import KEY  # noqa: E402
+from retailsmart.snapshot import current_interned_dir, interned_file, refresh_interned, refresh_snapshot  # noqa: E402
+
+SALES_COLUMNS = ['order_id', 'customer_id', 'order_purchase_timestamp', 'total_price']
+
+
+def time_call(fn, repeat):
+    """Best-of-N wall time in seconds, and the last result"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def stack_copies(sales, customers, factor):
+    """factor copies of the tables with disjoint order and customer codes"""
+    if factor <= 1:
+        return sales, customers
+    offsets = {col: int(max(sales[col].max() if col in sales else -1, customers[col].max()
+                             if col in customers else -1)) + 1
+               for col in ('order_id', 'customer_id', KEY)}
+    def shift(values, col, k):
+        # Codes stay int32, like the interned snapshot's
+        return (values.astype(np.int64) + k * offsets[col]).astype(np.int32)
+
+    sales_copies, customer_copies = [], []
+    for k in range(factor):
+        sales_copies.append(sales.assign(order_id=shift(sales['order_id'], 'order_id', k),
+                                         customer_id=shift(sales['customer_id'], 'customer_id', k)))
+        customer_copies.append(customers.assign(customer_id=shift(customers['customer_id'], 'customer_id', k),
+                                                **{KEY: shift(customers[KEY], KEY, k)}))
+    return pd.concat(sales_copies, ignore_index=True), pd.concat(customer_copies, ignore_index=True)
+
+
+def pandas_cohorts(sales, customers):
+    """Customers and revenue per (cohort, age) with groupbys, as a notebook would"""
+    person = sales['customer_id'].map(customers.drop_duplicates('customer_id').set_index('customer_id')[KEY])
+    df = sales.assign(person=person.fillna(-1 - sales['customer_id']),
+                      month=sales['order_purchase_timestamp'].dt.to_period('M'))
+    df['cohort'] = df.groupby('person')['month'].transform('min')
+    df['age'] = (df['month'].dt.year - df['cohort'].dt.year) * 12 + (df['month'].dt.month - df['cohort'].dt.month)
+    return df.groupby(['cohort', 'age']).agg(customers=('person', 'nunique'), revenue=('total_price', 'sum'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the cohort matrix')
+    parser.add_argument('--scale', type=int, default=1, help='stacked copies of the sales')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-baseline-rows', type=int, default=5_000_000, help='skip pandas past this')
+    args = parser.parse_args()
+
+    refresh_snapshot()
+    refresh_interned()
+    directory = current_interned_dir()
+    sales = pd.read_feather(interned_file('sales', directory), columns=SALES_COLUMNS)
+    customers = pd.read_feather(interned_file('customers', directory), columns=['customer_id', KEY])
+    sales, customers = stack_copies(sales, customers, args.scale)
+
+    new, matrix = time_call(lambda: CohortMatrix.from_sales(sales, customers), args.repeat)
+    orders = int(matrix.orders.sum())
+    print(f"Sales rows / orders:        {len(sales):,} / {orders:,}")
+    print(f"Cohorts:                    {len(matrix.months)}")
+    print(f"CohortMatrix:               {new:9.3f} s  ({orders / new:,.0f} orders/s)")
+    if len(sales) > args.max_baseline_rows:
+        print("pandas groupbys:            skipped")
+        return
+
+    old, cells = time_call(lambda: pandas_cohorts(sales, customers), 1)
+    index = pd.PeriodIndex(matrix.months, freq='M')
+    same = all(np.allclose(cells[name].unstack(fill_value=0).values,
+                           pd.DataFrame(getattr(matrix, name), index=index)
+                           .loc[cells.index.levels[0], cells.index.levels[1]].values)
+               for name in ('customers', 'revenue'))
+    print(f"pandas groupbys:            {old:9.3f} s")
+    print(f"Speed-up:                   {old / new:9.1f}x  (same customers and revenue per cell: {same})")
+
+
+if __name__ == '__main__':
+    main()
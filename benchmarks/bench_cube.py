@@ -0,0 +1,78 @@
+"""
+Daily Cube Benchmark
+====================
+Cost of one sidebar date-range change: the old path (mask the sales frame,
+re-parse dates, 30/60-day windows, monthly groupby) vs range queries on the
+pre-aggregated DailyCube.
+
+Usage:
+    python benchmarks/bench_cube.py --repeat 20
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_cube.py
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.cube import DailyCube  # noqa: E402
+from retailsmart.snapshot import load_interned_snapshot  # noqa: E402
+
+
+def time_call(fn, repeat):
+    """Best-of-N wall time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def rescan_filter(sales, start, end):
+    """What one filter change used to cost: mask, KPIs with growth windows, monthly trend"""
+    dates = pd.to_datetime(sales['order_purchase_timestamp'])
+    filtered = sales[(dates >= start) & (dates <= end)]
+    filtered_dates = pd.to_datetime(filtered['order_purchase_timestamp'])
+    latest = filtered_dates.max()
+    recent = filtered[filtered_dates >= latest - timedelta(days=30)]
+    previous = filtered[(filtered_dates >= latest - timedelta(days=60)) & (filtered_dates < latest - timedelta(days=30))]
+    totals = (filtered['total_price'].sum(), len(filtered), recent['total_price'].sum(), previous['total_price'].sum())
+    monthly = filtered.groupby(filtered_dates.dt.to_period('M'))['total_price'].sum()
+    return totals, monthly
+
+
+def cube_filter(cube, start, end):
+    """The same answers from the cube"""
+    return cube.kpis(start, end), cube.series(start, end, freq='M'), cube.by_category(start, end)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark date-filter changes')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    _, sales, products, _, _, _, _ = load_interned_snapshot()
+    build = time_call(lambda: DailyCube.from_sales(sales, products), 1)
+    cube = DailyCube.from_sales(sales, products)
+
+    start = cube.days[len(cube.days) // 4]
+    end = cube.days[-1]
+    old = time_call(lambda: rescan_filter(sales, start, end), args.repeat)
+    new = time_call(lambda: cube_filter(cube, start, end), args.repeat)
+
+    print(f"Sales rows:                 {len(sales):,}")
+    print(f"Cube shape / size:          {cube.revenue.shape} / {cube.nbytes / 1e6:.1f} MB")
+    print(f"Cube build (once):          {build * 1e3:9.1f} ms")
+    print(f"Filter change, rescan:      {old * 1e3:9.2f} ms")
+    print(f"Filter change, cube:        {new * 1e3:9.2f} ms")
+    print(f"Speed-up:                   {old / new:9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Downsampling Benchmark
+======================
+Payload bytes and server-side render time of the dashboard's charts and
+tables, sent whole vs through retailsmart.downsample:
+
+- a per-order revenue line (one point per sale, the finest time series the
+  data has), full vs LTTB vs min/max decimation at the point budget
+- the category pie, every category vs top-N plus "Other"
+- the raw sales table, whole vs one page
+
+Render time is the Plotly figure build plus its JSON serialization (what
+st.plotly_chart does on the server), or the Arrow encoding for tables.
+Browser-side drawing scales with the same payload but is not measured here.
+
+Usage:
+    python benchmarks/bench_downsample.py --budget 1000
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_downsample.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart import downsample  # noqa: E402
+from retailsmart.snapshot import load_table  # noqa: E402
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def report(label, count, nbytes, seconds, baseline=None, unit='points'):
+    ratio = f"  ({baseline / nbytes:,.1f}x smaller)" if baseline else ''
+    print(f"  {label:<16} {count:>10,} {unit:<6}  {nbytes / 1024:>10,.1f} KB  {seconds * 1e3:8.1f} ms{ratio}")
+
+
+def line_payload(frame):
+    fig = px.line(frame, x='order_purchase_timestamp', y='payment_value')
+    return downsample.figure_payload_bytes(fig)
+
+
+def pie_payload(frame):
+    fig = px.pie(frame, values='payment_value', names='category_english')
+    return downsample.figure_payload_bytes(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark chart/table payloads with and without downsampling')
+    parser.add_argument('--budget', type=int, default=downsample.DEFAULT_POINT_BUDGET, help='points per chart')
+    parser.add_argument('--top-n', type=int, default=downsample.DEFAULT_TOP_N, help='pie slices')
+    args = parser.parse_args()
+
+    sales = load_table('sales')
+    orders = sales[['order_purchase_timestamp', 'payment_value']].sort_values('order_purchase_timestamp')
+    print(f"Per-order revenue line: {len(orders):,} points, budget {args.budget:,}")
+
+    full_bytes, seconds = timed(lambda: line_payload(orders))
+    report('full', len(orders), full_bytes, seconds)
+    for method in ('lttb', 'minmax'):
+        def run():
+            points = downsample.downsample_frame(orders, 'order_purchase_timestamp', 'payment_value',
+                                                 args.budget, method=method)
+            return len(points), line_payload(points)
+        (points, nbytes), seconds = timed(run)
+        report(method, points, nbytes, seconds, full_bytes)
+
+    by_category = sales.groupby('category_english', observed=True)['payment_value'].sum().reset_index()
+    print(f"Category pie: {len(by_category):,} categories, top {args.top_n}")
+    full_pie, seconds = timed(lambda: pie_payload(by_category))
+    report('all categories', len(by_category), full_pie, seconds, unit='slices')
+    top = downsample.top_n_other(by_category, 'category_english', 'payment_value', args.top_n)
+    nbytes, seconds = timed(lambda: pie_payload(top))
+    report('top-N + other', len(top), nbytes, seconds, full_pie, unit='slices')
+
+    print(f"Sales table: {len(sales):,} rows")
+    full_table, seconds = timed(lambda: downsample.frame_payload_bytes(sales))
+    report('whole table', len(sales), full_table, seconds, unit='rows')
+    page, _ = downsample.page_slice(sales, 1)
+    nbytes, seconds = timed(lambda: downsample.frame_payload_bytes(page))
+    report('one page', len(page), nbytes, seconds, full_table, unit='rows')
+
+
+if __name__ == '__main__':
+    main()
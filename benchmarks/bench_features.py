@@ -0,0 +1,100 @@
+"""
+RFM Feature Store Benchmark
+===========================
+Cost of bringing per-customer RFM up to date after a small append to the sales
+export: a full refresh_store(rebuild=True) vs an incremental refresh_store()
+that reads only the appended rows. Both are timed end to end (watermark
+checks, key map, parse, fold and the store write). Also checks both give the
+same RFM.
+
+The sales CSV is copied to a scratch directory, cut at an order boundary and
+then appended to, so the real store and sources are left alone.
+
+Usage:
+    python benchmarks/bench_features.py --delta 0.01
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_features.py
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.features import refresh_store, rfm_frame  # noqa: E402
+from retailsmart.snapshot import refresh_snapshot, resolve_sources  # noqa: E402
+
+
+def order_boundary(orders, row):
+    """First row index >= row that starts a new order"""
+    while 0 < row < len(orders) and orders[row] == orders[row - 1]:
+        row += 1
+    return row
+
+
+def row_offset(path, row):
+    """Byte position where data row `row` starts"""
+    with open(path, 'rb') as f:
+        f.readline()
+        for _ in range(row):
+            f.readline()
+        return f.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark incremental RFM refresh')
+    parser.add_argument('--delta', type=float, default=0.01, help='fraction of sales rows that are new')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    refresh_snapshot()
+    _, sources = resolve_sources()
+    orders = pd.read_csv(sources['sales'], usecols=['order_id'], dtype=str)['order_id'].to_numpy()
+    base_rows = order_boundary(orders, int(len(orders) * (1 - args.delta)))
+    offset = row_offset(sources['sales'], base_rows)
+    with open(sources['sales'], 'rb') as f:
+        data = f.read()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        sales_path = os.path.join(scratch, 'sales.csv')
+        store_path = os.path.join(scratch, 'rfm_store.parquet')
+        scratch_sources = dict(sources, sales=sales_path)
+
+        def refresh(rebuild=False):
+            start = time.perf_counter()
+            store, report = refresh_store(rebuild=rebuild, path=store_path, sources=scratch_sources)
+            return time.perf_counter() - start, store, report
+
+        full = incremental = noop = float('inf')
+        for _ in range(args.repeat):
+            with open(sales_path, 'wb') as f:
+                f.write(data[:offset])
+            refresh(rebuild=True)
+            with open(sales_path, 'ab') as f:
+                f.write(data[offset:])
+            seconds, appended_store, report = refresh()
+            assert not report['full_rebuild'] and report['sales'] == len(orders) - base_rows
+            incremental = min(incremental, seconds)
+            noop = min(noop, refresh()[0])
+            seconds, rebuilt_store, _ = refresh(rebuild=True)
+            full = min(full, seconds)
+
+    expected = rfm_frame(rebuilt_store).sort_index()
+    actual = rfm_frame(appended_store).sort_index()
+    pd.testing.assert_frame_equal(expected, actual, check_exact=False)
+
+    print(f"Sales rows:                 {len(orders):,} ({len(orders) - base_rows:,} new)")
+    print(f"Customers in store:         {len(expected):,}")
+    print(f"Full rebuild:               {full * 1e3:9.1f} ms")
+    print(f"Incremental refresh:        {incremental * 1e3:9.1f} ms")
+    print(f"Refresh with nothing new:   {noop * 1e3:9.1f} ms")
+    print(f"Speed-up:                   {full / incremental:9.1f}x")
+    print("Results identical:          yes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Forecasting Benchmark
+=====================
+Wall time and series/s of the per-series fits in retailsmart.forecasting,
+serially in-process vs on the process pool. The grid-search exponential
+smoothing is also compared with the notebook's statsmodels ExponentialSmoothing
+on a sample of series when statsmodels is installed. --replicate tiles the
+series (with jitter) to reach the series counts of a larger catalogue.
+
+Usage:
+    python benchmarks/bench_forecasting.py --workers 4 --replicate 4
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_forecasting.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart import forecasting  # noqa: E402
+from retailsmart.snapshot import load_table  # noqa: E402
+
+try:
+    from statsmodels.tsa.holtwinters import ExponentialSmoothing
+except ImportError:
+    ExponentialSmoothing = None
+
+
+def statsmodels_fit(Y, horizon):
+    """The notebook's model, one fit per series"""
+    for y in Y:
+        seasonal = 'add' if len(y) >= 2 * forecasting.SEASON else None
+        ExponentialSmoothing(y, trend='add', damped_trend=True, seasonal=seasonal,
+                             seasonal_periods=forecasting.SEASON if seasonal else None).fit().forecast(horizon)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs pooled series fits')
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: all cores)')
+    parser.add_argument('--replicate', type=int, default=1, help='tile the series this many times')
+    parser.add_argument('--horizon', type=int, default=forecasting.DEFAULT_HORIZON)
+    parser.add_argument('--statsmodels-sample', type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    series = forecasting.SeriesSet.from_sales(load_table('sales'), load_table('customers'), load_table('products'))
+    build_seconds = time.perf_counter() - start
+
+    Y = np.vstack([series.orders, series.revenue])
+    if args.replicate > 1:
+        rng = np.random.default_rng(0)
+        Y = np.vstack([Y] + [Y * rng.normal(1, 0.05, Y.shape) for _ in range(args.replicate - 1)])
+    print(f"Series: {len(Y):,} x {Y.shape[1]} months (built in {build_seconds:.2f}s, {os.cpu_count()} CPUs)")
+
+    start = time.perf_counter()
+    serial, _ = forecasting.fit_all(Y, args.horizon, workers=1)
+    serial_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    pooled, models = forecasting.fit_all(Y, args.horizon, workers=args.workers)
+    pooled_seconds = time.perf_counter() - start
+    assert np.allclose(serial, pooled)
+
+    print(f"  serial       {serial_seconds:8.2f}s  {len(Y) / serial_seconds:>10,.0f} series/s")
+    print(f"  process pool {pooled_seconds:8.2f}s  {len(Y) / pooled_seconds:>10,.0f} series/s  "
+          f"({serial_seconds / pooled_seconds:.1f}x)")
+
+    active = Y[np.array(models) != 'mean'][:args.statsmodels_sample]
+    if ExponentialSmoothing is not None and len(active):
+        start = time.perf_counter()
+        statsmodels_fit(active, args.horizon)
+        per_series = (time.perf_counter() - start) / len(active)
+        start = time.perf_counter()
+        forecasting.fit_all(active, args.horizon, workers=1)
+        grid_per_series = (time.perf_counter() - start) / len(active)
+        print(f"  statsmodels ExponentialSmoothing: {per_series * 1e3:7.2f} ms/series vs "
+              f"grid search {grid_per_series * 1e3:7.2f} ms/series")
+
+
+if __name__ == '__main__':
+    main()
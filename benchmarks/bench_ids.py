@@ -0,0 +1,76 @@
+"""
+ID Interning Benchmark
+======================
+Memory per row of the hex ID columns and merge time, hex strings vs the shared
+int32 codes produced by retailsmart.ids.
+
+Usage:
+    python benchmarks/bench_ids.py --repeat 5
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_ids.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart import snapshot  # noqa: E402
+from retailsmart.ids import ENTITY_COLUMNS  # noqa: E402
+from retailsmart.paths import TABLES  # noqa: E402
+
+ID_COLUMNS = {column for columns in ENTITY_COLUMNS.values() for column in columns}
+
+MERGES = [
+    ('sales x products on product_id', 'sales', 'products', 'product_id'),
+    ('sales x customers on customer_id', 'sales', 'customers', 'customer_id'),
+    ('reviews x sales on order_id', 'reviews', 'sales', 'order_id'),
+]
+
+
+def time_call(fn, repeat):
+    """Best-of-N wall time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def id_bytes_per_row(df):
+    """Deep bytes per row spent on ID columns"""
+    cols = [c for c in df.columns if c in ID_COLUMNS]
+    if not cols or len(df) == 0:
+        return 0.0
+    return df[cols].memory_usage(deep=True, index=False).sum() / len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark hex vs interned IDs')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    snapshot.refresh_snapshot()
+    snapshot.refresh_interned()
+    raw = {t: snapshot.load_table(t) for t in TABLES}
+    directory = snapshot.current_interned_dir()
+    interned = {t: pd.read_feather(snapshot.interned_file(t, directory)) for t in TABLES}
+
+    print(f"{'table':<10} {'rows':>10} {'hex B/row':>10} {'int B/row':>10} {'total MB hex':>13} {'total MB int':>13}")
+    for t in TABLES:
+        print(f"{t:<10} {len(raw[t]):>10,} {id_bytes_per_row(raw[t]):>10.1f} {id_bytes_per_row(interned[t]):>10.1f} "
+              f"{raw[t].memory_usage(deep=True).sum() / 1e6:>13.1f} {interned[t].memory_usage(deep=True).sum() / 1e6:>13.1f}")
+
+    print()
+    for label, left, right, key in MERGES:
+        hex_time = time_call(lambda: raw[left][[key]].merge(raw[right][[key]].drop_duplicates(), on=key, how='left'), args.repeat)
+        int_time = time_call(lambda: interned[left][[key]].merge(interned[right][[key]].drop_duplicates(), on=key, how='left'), args.repeat)
+        print(f"{label:<36} hex {hex_time * 1e3:8.1f} ms   int32 {int_time * 1e3:8.1f} ms   {hex_time / int_time:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
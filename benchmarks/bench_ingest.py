@@ -0,0 +1,109 @@
+"""
+Streaming Ingest Benchmark
+==========================
+Cleans one raw table two ways, each in a fresh process so peak RSS is
+comparable: the notebook's load-everything path (exact quantiles,
+drop_duplicates) and the chunked streaming path in retailsmart.ingest.
+Reports wall time, rows/s, peak RSS and how far the sketched outlier caps are
+from the exact ones. The streaming path runs again with --check-chunk-rows to
+check that the cleaned CSV does not depend on the chunk size.
+
+Usage:
+    python benchmarks/bench_ingest.py --table sales --chunk-rows 100000
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_ingest.py
+"""
+
+import argparse
+import hashlib
+import multiprocessing as mp
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart import ingest  # noqa: E402
+from retailsmart.paths import TABLES, raw_file  # noqa: E402
+
+
+def clean_in_memory(table, path, out_path):
+    """The notebook path: whole file in memory, exact statistics"""
+    df = pd.read_csv(path, dtype=ingest.raw_dtypes(table, path), low_memory=False)
+    rows_in = len(df)
+    stats = {'medians': {col: df[col].median() for col in ingest.MEDIAN_FILLS[table] if col in df.columns},
+             'caps': {}}
+    if table in ingest.DEDUP_TABLES:
+        df = df.drop_duplicates()
+    for col in ingest.OUTLIER_COLUMNS.get(table, []):
+        q1, q3 = df[col].quantile(0.25), df[col].quantile(0.75)
+        stats['caps'][col] = (q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1))
+    if table == 'sales':
+        stats['purchase_median'] = pd.to_datetime(df['order_purchase_timestamp'], errors='coerce').median()
+    df = ingest.clean_chunk(table, df, stats)
+    df.to_csv(out_path, index=False)
+    return rows_in, len(df), stats['caps']
+
+
+def run_variant(variant, table, path, chunk_rows, queue):
+    with tempfile.TemporaryDirectory() as tmp:
+        out_path = os.path.join(tmp, f'{table}_cleaned.csv')
+        start = time.perf_counter()
+        if variant == 'in-memory':
+            rows_in, rows_out, caps = clean_in_memory(table, path, out_path)
+        else:
+            report = ingest.ingest_table(table, path, out_path, chunk_rows=chunk_rows)
+            rows_in, rows_out, caps = report['rows_in'], report['rows_out'], report['caps']
+        elapsed = time.perf_counter() - start
+        with open(out_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((elapsed, rows_in, rows_out, peak_mb, caps, digest))
+
+
+def measure(variant, table, path, chunk_rows):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_variant, args=(variant, table, path, chunk_rows, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark streaming vs in-memory cleaning')
+    parser.add_argument('--table', default='sales', choices=TABLES)
+    parser.add_argument('--chunk-rows', type=int, default=ingest.DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--check-chunk-rows', type=int, default=None,
+                        help='second streaming chunk size to compare output with (default: chunk-rows / 7)')
+    args = parser.parse_args()
+    check_rows = args.check_chunk_rows or max(1, args.chunk_rows // 7)
+
+    path = raw_file(args.table)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"{args.table}: {path} ({size_mb:,.0f} MB)")
+
+    results, digests = {}, {}
+    for variant in ('in-memory', 'streaming'):
+        elapsed, rows_in, rows_out, peak_mb, caps, digest = measure(variant, args.table, path, args.chunk_rows)
+        results[variant] = caps
+        print(f"  {variant:<10} {rows_in:>11,} in  {rows_out:>11,} out  {elapsed:7.2f}s  "
+              f"{rows_in / elapsed:>10,.0f} rows/s  peak RSS {peak_mb:7,.0f} MB")
+    digests[args.chunk_rows] = digest
+    digests[check_rows] = measure('streaming', args.table, path, check_rows)[-1]
+    print(f"  same cleaned CSV at {args.chunk_rows:,} and {check_rows:,} rows per chunk: "
+          f"{len(set(digests.values())) == 1}")
+
+    for col, exact in results['in-memory'].items():
+        approx = results['streaming'][col]
+        error = max(abs(a - e) / max(abs(e), 1e-9) for a, e in zip(approx, exact))
+        print(f"  cap {col:<12} exact ({exact[0]:.2f}, {exact[1]:.2f})  "
+              f"sketch ({approx[0]:.2f}, {approx[1]:.2f})  max rel. error {error:.2%}")
+
+
+if __name__ == '__main__':
+    main()
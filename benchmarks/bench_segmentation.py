@@ -0,0 +1,109 @@
+"""
+Segmentation Benchmark
+======================
+Fit time and peak RSS of the P3 notebook's segmentation (full-batch KMeans for
+k=1..10 for the elbow plot, then a final KMeans) vs retailsmart.segmentation
+(parallel mini-batch k selection on a subsample, then one MiniBatchKMeans),
+each in a fresh process. Both are scored by inertia on the full standardised
+matrix, and the two labelings at the notebook's k are compared with the
+adjusted Rand index. --scale tiles the customers (with jitter) to show how
+each path grows with the customer base.
+
+Usage:
+    python benchmarks/bench_segmentation.py --scale 5 --workers 4
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_segmentation.py
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart import segmentation  # noqa: E402
+from retailsmart.features import rfm_frame  # noqa: E402
+from retailsmart.snapshot import load_table  # noqa: E402
+
+NOTEBOOK_K = 3
+
+
+def notebook_fit(X):
+    """Elbow over k=1..10 with full-batch KMeans, then the final k=3 fit"""
+    X_scaled = StandardScaler().fit_transform(X)
+    inertia = [KMeans(n_clusters=k, random_state=42).fit(X_scaled).inertia_ for k in range(1, 11)]
+    labels = KMeans(n_clusters=NOTEBOOK_K, random_state=42).fit_predict(X_scaled)
+    return NOTEBOOK_K, labels, inertia
+
+
+def run_variant(variant, X, workers, sample_size, queue):
+    data = pd.DataFrame(X, columns=segmentation.FEATURES)
+    start = time.perf_counter()
+    if variant == 'notebook':
+        k, labels, _ = notebook_fit(X)
+    else:
+        model = segmentation.SegmentModel.fit(data, workers=workers, sample_size=sample_size)
+        k, labels = model.k, model.assign(data)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((elapsed, peak_mb, k, labels))
+
+
+def measure(variant, X, workers, sample_size):
+    ctx = mp.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=run_variant, args=(variant, X, workers, sample_size, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def inertia_of(X_scaled, labels):
+    """Within-cluster sum of squares of a labeling"""
+    total = 0.0
+    for cluster in np.unique(labels):
+        members = X_scaled[labels == cluster]
+        total += ((members - members.mean(axis=0)) ** 2).sum()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark notebook KMeans vs mini-batch segmentation')
+    parser.add_argument('--scale', type=int, default=1, help='tile the customer base this many times')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sample-size', type=int, default=segmentation.DEFAULT_SAMPLE_SIZE)
+    args = parser.parse_args()
+
+    data = segmentation.build_segmentation_data(load_table('customers'), rfm_frame())
+    X = segmentation.feature_matrix(data)
+    if args.scale > 1:
+        rng = np.random.default_rng(0)
+        X = np.vstack([X] + [X * rng.normal(1, 0.01, X.shape) for _ in range(args.scale - 1)])
+    X_scaled = StandardScaler().fit_transform(X)
+    print(f"Customers: {len(X):,} x {X.shape[1]} features")
+
+    results = {}
+    for variant in ('notebook', 'mini-batch'):
+        elapsed, peak_mb, k, labels = measure(variant, X, args.workers, args.sample_size)
+        results[variant] = labels
+        print(f"  {variant:<10} k={k:<3} {elapsed:8.2f}s  peak RSS {peak_mb:7,.0f} MB  "
+              f"inertia {inertia_of(X_scaled, labels):12,.0f}")
+
+    # Same k as the notebook, to compare the partitions themselves
+    frame = pd.DataFrame(X, columns=segmentation.FEATURES)
+    same_k = segmentation.SegmentModel.fit(frame, k=NOTEBOOK_K).assign(frame)
+    print(f"  mini-batch at k={NOTEBOOK_K}: inertia {inertia_of(X_scaled, same_k):12,.0f}  "
+          f"ARI vs notebook {adjusted_rand_score(results['notebook'], same_k):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""
+Shared Dataset Benchmark
+========================
+Memory per dashboard worker, and how long a new worker takes to start.
+Each worker either loads its own copy of the data (private, as app.py does by
+default) or memory-maps the publication of retailsmart.shared (shared, as
+with RETAILSMART_SHARED=1).
+
+- Each worker is a separate Python process. It loads, or attaches to, the
+  interned tables, RFM features and scores, then touches every column once
+  (sums, string lengths) the way KPIs and charts would.
+- --workers processes are started one after another, then one more is
+  added while they are all running. Startup is the wall time from spawning
+  the process to having its data, imports included.
+- Memory comes from /proc/<pid>/smaps_rollup, read once every worker is up:
+  - RSS counts the shared pages in every worker that maps them;
+  - PSS splits them across those workers;
+  - private is what the worker alone holds.
+  Total PSS is what the worker pool really costs.
+
+Usage:
+    python benchmarks/bench_shared.py --workers 4
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_shared.py --workers 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ('private', 'shared')
+START_TIMEOUT = 600.0
+
+
+# ========================
+# WORKER
+# ========================
+def memory_stats():
+    """RSS, PSS and private bytes of this process"""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        from retailsmart.instrumentation import current_rss
+        return {'rss': current_rss(), 'pss': None, 'private': None}
+    return {'rss': fields.get('Rss', 0), 'pss': fields.get('Pss', 0),
+            'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)}
+
+
+def load_private():
+    """What a default dashboard worker holds: its own copy of every dataset"""
+    from retailsmart.features import load_store, rfm_frame
+    from retailsmart.scoring import SCORES_PATH, load_scores
+    from retailsmart.snapshot import load_interned_snapshot
+
+    *tables, _, _ = load_interned_snapshot()
+    frames = tables + [rfm_frame(load_store())]
+    if os.path.exists(SCORES_PATH):
+        frames.append(load_scores())
+    return frames
+
+
+def load_shared():
+    """What a RETAILSMART_SHARED=1 worker holds: views of the publication"""
+    from retailsmart.shared import attach, attach_snapshot
+
+    *tables, _, _ = attach_snapshot()
+    frames = tables + [attach('features')]
+    scores = attach('scores')
+    if scores is not None:
+        frames.append(scores)
+    return frames
+
+
+def touch(frames):
+    """Read every value once, as KPIs and charts over the full tables would"""
+    import pandas as pd
+
+    total = 0.0
+    for df in frames:
+        for name in df.columns:
+            column = df[name]
+            if isinstance(column.dtype, pd.CategoricalDtype):
+                total += float(column.cat.codes.sum())
+            elif pd.api.types.is_numeric_dtype(column.dtype):
+                total += float(column.sum())
+            elif pd.api.types.is_datetime64_any_dtype(column.dtype):
+                total += float(column.notna().sum())
+            else:
+                total += float(column.str.len().sum())
+    return total
+
+
+def run_worker(mode):
+    """Load, touch, report readiness; then answer memory reports until stdin closes"""
+    frames = load_private() if mode == 'private' else load_shared()
+    touch(frames)
+    print(json.dumps({'rows': sum(len(df) for df in frames)}), flush=True)
+    for _ in sys.stdin:
+        print(json.dumps(memory_stats()), flush=True)
+
+
+# ========================
+# DRIVER
+# ========================
+def start_worker(mode):
+    """Spawn a worker and wait until it has its data. Returns (process, startup seconds)"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--worker', mode],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError(f'{mode} worker exited with {process.wait(START_TIMEOUT)}')
+    return process, time.perf_counter() - start
+
+
+def report(process):
+    """Memory stats of a running worker"""
+    process.stdin.write('report\n')
+    process.stdin.flush()
+    return json.loads(process.stdout.readline())
+
+
+def stop(processes):
+    for process in processes:
+        process.stdin.close()
+        process.wait(START_TIMEOUT)
+
+
+def measure(mode, workers):
+    """Start workers one by one, add one more, and read everyone's memory"""
+    processes, startups = [], []
+    try:
+        for _ in range(workers):
+            process, seconds = start_worker(mode)
+            processes.append(process)
+            startups.append(seconds)
+        added, added_seconds = start_worker(mode)
+        processes.append(added)
+        stats = [report(process) for process in processes]
+    finally:
+        stop(processes)
+    return {'startups': startups, 'added_startup': added_seconds, 'stats': stats}
+
+
+def mib(value, width=10):
+    return f"{value / 2**20:{width}.1f}" if value is not None else f"{'n/a':>{width}}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark private vs shared dashboard workers')
+    parser.add_argument('--workers', type=int, default=4, help='workers running before one more is added')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    if 'shared' in args.modes:
+        from retailsmart.shared import SHARED_DIR, publish
+
+        manifest = publish()
+        total = sum(d['bytes'] for d in manifest['datasets'].values())
+        print(f"Published {total / 2**20:,.1f} MiB in {manifest['seconds']:.2f}s -> {SHARED_DIR}")
+
+    results = {mode: measure(mode, args.workers) for mode in args.modes}
+    count = args.workers + 1
+    print(f"\n{'':<10}{'1st start s':>12}{'added s':>10}{'RSS MiB':>10}{'PSS MiB':>10}"
+          f"{'priv MiB':>10}{f'PSS x{count}':>12}")
+    for mode, result in results.items():
+        stats = result['stats']
+        pss = [s['pss'] for s in stats]
+        total_pss = sum(pss) if None not in pss else None
+        print(f"{mode:<10}{result['startups'][0]:12.2f}{result['added_startup']:10.2f}"
+              f"{mib(sum(s['rss'] for s in stats) / count)}{mib(total_pss and total_pss / count)}"
+              f"{mib(stats[-1]['private'])}{mib(total_pss, 12)}")
+    print("\nPer-worker columns are averages over all workers except 'priv', which is the added worker's.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Snapshot Load Benchmark
+=======================
+Compares the dashboard's old cold load (five plain pd.read_csv calls) with
+loading the typed Feather snapshot.
+
+Usage:
+    python benchmarks/bench_snapshot.py --repeat 5
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_snapshot.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart import snapshot  # noqa: E402
+from retailsmart.paths import TABLES  # noqa: E402
+
+
+def time_call(fn, repeat):
+    """Best-of-N wall time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CSV vs snapshot loading')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    _, sources = snapshot.resolve_sources()
+
+    build_time = time_call(lambda: snapshot.refresh_snapshot(force=True), 1)
+    check_time = time_call(snapshot.refresh_snapshot, args.repeat)
+
+    csv_time = time_call(lambda: [pd.read_csv(sources[t]) for t in TABLES], args.repeat)
+    snap_time = time_call(lambda: [snapshot.load_table(t) for t in TABLES], args.repeat)
+
+    csv_mem = sum(pd.read_csv(sources[t]).memory_usage(deep=True).sum() for t in TABLES)
+    snap_mem = sum(snapshot.load_table(t).memory_usage(deep=True).sum() for t in TABLES)
+
+    print(f"Rows per table: { {t: snapshot.read_manifest()['tables'][t]['rows'] for t in TABLES} }")
+    print(f"Snapshot build (one-off):   {build_time:8.3f}s")
+    print(f"Freshness check (no-op):    {check_time:8.3f}s")
+    print(f"Cold load, read_csv x5:     {csv_time:8.3f}s  ({csv_mem / 1e6:,.1f} MB)")
+    print(f"Cold load, snapshot x5:     {snap_time:8.3f}s  ({snap_mem / 1e6:,.1f} MB)")
+    print(f"Speed-up:                   {csv_time / snap_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
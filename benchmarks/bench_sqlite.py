@@ -0,0 +1,128 @@
+"""
+SQLite Store Benchmark
+======================
+Load time: DataFrame.to_sql (the ad-hoc path: default journal, TEXT dates, no
+secondary indexes) vs retailsmart.sqlite_store.build_database (one WAL
+transaction of batched executemany, epoch DATETIMEs, covering indexes).
+
+Query time on both databases for a date-range KPI (from daily_sales in the
+store), one category's daily series and per-customer order histories, plus
+the pandas equivalent of the customer lookup. The KPI answers are checked
+to match.
+
+Usage:
+    python benchmarks/bench_sqlite.py --customers 500
+    RETAILSMART_ROOT=/path/to/data python benchmarks/bench_sqlite.py
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.paths import TABLES  # noqa: E402
+from retailsmart.snapshot import load_snapshot  # noqa: E402
+from retailsmart.sqlite_store import QUERIES, build_database  # noqa: E402
+
+TEXT_QUERIES = {
+    'totals': '''
+        SELECT COALESCE(SUM(total_price), 0), COUNT(DISTINCT order_id), COUNT(*)
+        FROM sales WHERE order_purchase_timestamp >= ? AND order_purchase_timestamp < ?''',
+    'category_series': '''
+        SELECT substr(order_purchase_timestamp, 1, 10), SUM(total_price)
+        FROM sales WHERE category_english = ?
+          AND order_purchase_timestamp >= ? AND order_purchase_timestamp < ?
+        GROUP BY 1 ORDER BY 1''',
+    'customer_history': QUERIES['customer_history'],
+}
+
+
+def time_call(fn, repeat):
+    """Best-of-N wall time in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_with_to_sql(tables, path):
+    conn = sqlite3.connect(path)
+    for name, df in tables.items():
+        df.to_sql(name, conn, index=False)
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SQLite store')
+    parser.add_argument('--customers', type=int, default=500, help='customer lookups per run')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    tables = dict(zip(TABLES, load_snapshot()[:5]))
+    sales = tables['sales']
+    rows = sum(len(df) for df in tables.values())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        naive_path = os.path.join(tmp, 'to_sql.db')
+        store_path = os.path.join(tmp, 'store.db')
+
+        start = time.perf_counter()
+        load_with_to_sql(tables, naive_path)
+        naive_load = time.perf_counter() - start
+        start = time.perf_counter()
+        build_database(tables, store_path)
+        store_load = time.perf_counter() - start
+
+        print(f"Rows loaded:                {rows:,} ({len(sales):,} sales)")
+        print(f"Load, to_sql (no indexes):  {naive_load:8.2f}s  {rows / naive_load:>10,.0f} rows/s")
+        print(f"Load, bulk + indexes:       {store_load:8.2f}s  {rows / store_load:>10,.0f} rows/s")
+
+        naive = sqlite3.connect(naive_path)
+        store = sqlite3.connect(store_path)
+
+        dates = pd.to_datetime(sales['order_purchase_timestamp'])
+        low, high = dates.quantile(0.5).normalize(), dates.max().normalize() + pd.Timedelta(days=1)
+        low_text, high_text = str(low), str(high)
+        low_epoch, high_epoch = int(low.value // 10 ** 9), int(high.value // 10 ** 9)
+        category = sales['category_english'].value_counts().index[0]
+        rng = np.random.default_rng(0)
+        customers = rng.choice(sales['customer_id'].dropna().unique(), args.customers).tolist()
+
+        cases = [
+            ('Range KPI (last half)',
+             lambda: naive.execute(TEXT_QUERIES['totals'], (low_text, high_text)).fetchone(),
+             lambda: store.execute(QUERIES['totals'], (low_epoch, high_epoch)).fetchone()),
+            ('Category daily series',
+             lambda: naive.execute(TEXT_QUERIES['category_series'], (category, low_text, high_text)).fetchall(),
+             lambda: store.execute(QUERIES['category_series'], (category, low_epoch, high_epoch)).fetchall()),
+            (f'{args.customers} customer histories',
+             lambda: [naive.execute(TEXT_QUERIES['customer_history'], (c,)).fetchall() for c in customers],
+             lambda: [store.execute(QUERIES['customer_history'], (c,)).fetchall() for c in customers]),
+        ]
+        assert np.allclose(cases[0][1](), cases[0][2]())
+        for label, run_naive, run_store in cases:
+            before = time_call(run_naive, args.repeat)
+            after = time_call(run_store, args.repeat)
+            print(f"{label:<28}{before * 1e3:9.2f} ms -> {after * 1e3:8.2f} ms  ({before / after:6.1f}x)")
+
+        by_customer = sales[['customer_id', 'order_purchase_timestamp', 'order_id', 'total_price']]
+        pandas_lookup = time_call(
+            lambda: [by_customer[by_customer['customer_id'] == c] for c in customers], 1)
+        print(f"{args.customers} histories, pandas mask: {pandas_lookup * 1e3:9.2f} ms")
+
+        naive.close()
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
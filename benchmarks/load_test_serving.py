@@ -0,0 +1,157 @@
+"""
+Scoring Service Load Test
+=========================
+Latency percentiles and throughput of retailsmart.serving under concurrent
+single-customer lookups.
+
+- Without --url the service is started in a subprocess on a free port
+  against the current RETAILSMART_ROOT, and stopped afterwards.
+- --clients threads each hold one keep-alive connection and send
+  GET /score/<customer_id> back to back; customer IDs are drawn from the
+  snapshot's sales, uniformly from --distinct of them (default: all, so
+  most lookups miss the result cache).
+- Reports p50/p90/p99/max latency as the client sees it, requests per
+  second, errors, and the server's batch sizes and cache hit rate.
+
+Usage:
+    python benchmarks/load_test_serving.py --clients 16 --requests 20000
+    python benchmarks/load_test_serving.py --distinct 1000          # cache-friendly
+    python benchmarks/load_test_serving.py --url http://127.0.0.1:8765
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.snapshot import load_table  # noqa: E402
+
+START_TIMEOUT = 300.0
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get_json(conn, path):
+    conn.request('GET', path)
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def start_server(args):
+    """Run the service in a subprocess; returns (process, base url)"""
+    port = free_port()
+    command = [sys.executable, '-m', 'retailsmart.serving', '--port', str(port), '--reload-seconds', '0',
+               '--max-batch', str(args.max_batch), '--max-wait-ms', str(args.max_wait_ms),
+               '--cache-size', str(args.cache_size)]
+    process = subprocess.Popen(command, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    deadline = time.monotonic() + START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Scoring service exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            get_json(conn, '/health')
+            conn.close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit('Scoring service did not come up')
+
+
+def client(host, port, ids, latencies, errors, offset):
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    for i, customer_id in enumerate(ids):
+        start = time.perf_counter()
+        try:
+            conn.request('GET', f'/score/{customer_id}')
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=30)
+        latencies[offset + i] = time.perf_counter() - start
+    conn.close()
+
+
+def run_load(url, ids, clients):
+    """Send every id, split across client threads. Returns (latencies, errors, seconds)"""
+    parts = urlsplit(url)
+    latencies = np.zeros(len(ids))
+    errors = []
+    chunks = np.array_split(np.arange(len(ids)), clients)
+    threads = [threading.Thread(target=client, args=(parts.hostname, parts.port, ids[chunk], latencies, errors,
+                                                     chunk[0] if len(chunk) else 0))
+               for chunk in chunks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the single-customer scoring service')
+    parser.add_argument('--url', default=None, help='running service (default: start one)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent connections')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--warmup', type=int, default=500, help='untimed requests first')
+    parser.add_argument('--distinct', type=int, default=0, help='distinct customers to draw from (0 = all)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--max-batch', type=int, default=256, help='passed to a started service')
+    parser.add_argument('--max-wait-ms', type=float, default=0.0, help='passed to a started service')
+    parser.add_argument('--cache-size', type=int, default=100_000, help='passed to a started service')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    customer_ids = load_table('sales')['customer_id'].dropna().unique()
+    if args.distinct:
+        customer_ids = rng.choice(customer_ids, min(args.distinct, len(customer_ids)), replace=False)
+    ids = rng.choice(customer_ids, args.warmup + args.requests)
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    try:
+        run_load(url, ids[:args.warmup], args.clients)
+        latencies, errors, seconds = run_load(url, ids[args.warmup:], args.clients)
+        parts = urlsplit(url)
+        _, stats = get_json(http.client.HTTPConnection(parts.hostname, parts.port), '/stats')
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    p50, p90, p99 = np.quantile(latencies, [0.5, 0.9, 0.99]) * 1e3
+    cache = stats['cache']
+    lookups = cache['hits'] + cache['misses']
+    print(f"{args.requests:,} requests, {args.clients} clients, "
+          f"{args.distinct or len(customer_ids):,} distinct customers")
+    print(f"  throughput   {args.requests / seconds:10,.0f} req/s  ({seconds:.2f}s)")
+    print(f"  latency      p50 {p50:.2f} ms  p90 {p90:.2f} ms  p99 {p99:.2f} ms  max {latencies.max() * 1e3:.2f} ms")
+    print(f"  errors       {len(errors):,}")
+    print(f"  server       mean batch {stats['mean_batch']:.1f} rows (largest {stats['largest_batch']}), "
+          f"cache hit rate {cache['hits'] / max(lookups, 1):.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Benchmark Suite
+===============
+Times the dashboard's hot functions and every Phase 1-3 pipeline step on
+synthetic data at several scales, and writes the results to JSON so runs can
+be compared for regressions.
+
+- Data comes from retailsmart.synthetic, generated once per (scale, seed)
+  under --data-dir and reused by later runs.
+- Each scale runs in its own worker process with RETAILSMART_ROOT pointed at
+  its data, so nothing leaks between scales and RSS is per scale.
+- app.py is imported in Streamlit's bare mode and its functions are called
+  unwrapped (inspect.unwrap), so cache hits never stand in for the work.
+- Each benchmark runs --repeat times (fewer once it has used BUDGET_SECONDS)
+  and reports the median and the minimum. Scoring is reported as skipped when
+  the scale's root has no Phase 2 models.
+- --compare flags every (scale, benchmark) whose best time grew by more than
+  --threshold against an earlier results file, and exits 1 if any did. The
+  minimum is compared rather than the median because it is the least noisy.
+
+Usage:
+    python benchmarks/run_benchmarks.py --scales 100k 1m
+    python benchmarks/run_benchmarks.py --scales 100k --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import importlib.util
+import inspect
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from retailsmart import synthetic  # noqa: E402
+
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'retailsmart-bench')
+DEFAULT_SCALES = ('100k',)
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10     # relative slowdown counted as a regression
+MIN_DELTA_SECONDS = 0.005    # ... as long as it is also at least this much slower
+BUDGET_SECONDS = 30.0        # stop repeating a benchmark once its runs add up to this
+PACKAGES = ('numpy', 'pandas', 'pyarrow', 'scipy', 'sklearn', 'plotly', 'streamlit')
+
+
+# ========================
+# WORKER (one scale, in its own process)
+# ========================
+class Runner:
+    """Runs benchmarks in order and collects their records"""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = []
+
+    def run(self, group, name, func, rows=None):
+        """Time func() up to repeat times; returns its last result (None on failure)"""
+        times, result = [], None
+        try:
+            while len(times) < self.repeat and (not times or sum(times) < BUDGET_SECONDS):
+                start = time.perf_counter()
+                result = func()
+                times.append(time.perf_counter() - start)
+        except Exception as e:
+            self.results.append({'group': group, 'name': name, 'status': 'failed',
+                                 'error': f'{type(e).__name__}: {e}'})
+            print(f"  {name:<36} failed: {type(e).__name__}: {e}", flush=True)
+            return None
+        record = {'group': group, 'name': name, 'status': 'ok', 'median_s': statistics.median(times),
+                  'min_s': min(times), 'runs': len(times), 'rss_mb': _rss_mb()}
+        if rows is not None:
+            record['rows'] = int(rows)
+        self.results.append(record)
+        print(f"  {name:<36} {record['median_s'] * 1e3:10.1f} ms  (min {record['min_s'] * 1e3:.1f}, "
+              f"{len(times)} runs)", flush=True)
+        return result
+
+    def skip(self, group, name, reason):
+        self.results.append({'group': group, 'name': name, 'status': 'skipped', 'reason': reason})
+        print(f"  {name:<36} skipped: {reason}", flush=True)
+
+
+def _rss_mb():
+    from retailsmart.instrumentation import current_rss
+    return round(current_rss() / 2 ** 20, 1)
+
+
+def _import_app():
+    spec = importlib.util.spec_from_file_location('retailsmart_app', os.path.join(REPO_ROOT, 'app.py'))
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+
+def run_worker(repeat):
+    """Every benchmark against the data under RETAILSMART_ROOT"""
+    from retailsmart import (basket, campaigns, cohorts, features, forecasting, scoring, segmentation, snapshot,
+                             sqlite_store)
+    from retailsmart.cube import DailyCube
+    from retailsmart.paths import PHASE2_MODELS_DIR
+
+    bench = Runner(repeat)
+
+    # Phase 1: snapshots, feature store, cubes, SQLite
+    bench.run('phase1', 'snapshot.refresh', lambda: snapshot.refresh_snapshot(force=True))
+    bench.run('phase1', 'snapshot.refresh_interned', lambda: snapshot.refresh_interned(force=True))
+    sales, customers, products = (snapshot.load_table(t) for t in ('sales', 'customers', 'products'))
+    bench.run('phase1', 'features.rebuild', lambda: features.refresh_store(rebuild=True), rows=len(sales))
+    rfm = bench.run('phase1', 'features.rfm_frame', features.rfm_frame)
+    cube = bench.run('phase1', 'cube.build', lambda: DailyCube.from_sales(sales, products), rows=len(sales))
+    bench.run('phase1', 'sqlite.build', lambda: sqlite_store.refresh_database(force=True), rows=len(sales))
+    marketing = snapshot.load_table('marketing')
+    campaign_cube = bench.run('phase1', 'campaigns.build',
+                              lambda: campaigns.CampaignCube.from_tables(marketing, sales, customers),
+                              rows=len(marketing))
+    cohort_matrix = bench.run('phase1', 'cohorts.build', lambda: cohorts.CohortMatrix.from_sales(sales, customers),
+                              rows=len(sales))
+
+    # Phase 2: batch scoring needs the trained models
+    if os.path.exists(os.path.join(PHASE2_MODELS_DIR, 'best_churn_model.pkl')):
+        bench.run('phase2', 'scoring.score_customers',
+                  lambda: scoring.score_customers(tables=None, rfm=rfm), rows=len(customers))
+    else:
+        bench.skip('phase2', 'scoring.score_customers', f'no Phase 2 models in {PHASE2_MODELS_DIR}')
+
+    # Phase 3: segmentation, basket rules, forecasts
+    bench.run('phase3', 'segmentation.fit', lambda: segmentation.segment_customers(refit=True),
+              rows=len(customers))
+    for level in basket.LEVEL_COLUMNS:
+        rules = bench.run('phase3', f'basket.mine_{level}', lambda: basket.mine_rules(sales, level, products)[0],
+                          rows=len(sales))
+        if rules is not None:
+            basket.write_rules(rules, level)
+    table = bench.run('phase3', 'forecasting.run',
+                      lambda: forecasting.run_forecasts(tables=(sales, customers, products))[0], rows=len(sales))
+    if table is not None:
+        forecasting.write_forecasts(table)
+
+    # Dashboard: loaders and analysis functions, uncached
+    app = _import_app()
+    data = bench.run('app', 'load_cleaned_data', inspect.unwrap(app.load_cleaned_data))
+    clustering = bench.run('app', 'load_clustering_results', inspect.unwrap(app.load_clustering_results))
+    forecast = bench.run('app', 'load_forecast_results', inspect.unwrap(app.load_forecast_results))
+    rules = bench.run('app', 'load_basket_rules', lambda: inspect.unwrap(app.load_basket_rules)('category'))
+    if os.path.exists(scoring.SCORES_PATH):
+        scores = bench.run('app', 'load_model_predictions', inspect.unwrap(app.load_model_predictions))
+    else:
+        scores = None
+        bench.skip('app', 'load_model_predictions', 'no customer scores')
+    if os.path.exists(app.MODEL_PATH):
+        bench.run('app', 'load_trained_model', inspect.unwrap(app.load_trained_model))
+    else:
+        bench.skip('app', 'load_trained_model', 'no Phase 2 models')
+    if data is None or cube is None:
+        return bench.results
+
+    # Plotly loads its templates on the first figure; keep that out of the first chart's time
+    app.px.line(x=[0, 1], y=[0, 1])
+    customers_i, version = data[0], snapshot.snapshot_version()
+    first, last = cube.days[0].date(), cube.days[-1].date()
+    month = max(first, last - timedelta(days=30))
+    bench.run('app', 'calculate_real_kpis',
+              lambda: inspect.unwrap(app.calculate_real_kpis)(cube, customers_i, version, first, last))
+    bench.run('app', 'calculate_real_kpis.last_30d',
+              lambda: inspect.unwrap(app.calculate_real_kpis)(cube, customers_i, version, month, last))
+    for freq in app.TREND_FREQUENCIES:
+        bench.run('app', f'create_revenue_trend_actual.{freq}',
+                  lambda: inspect.unwrap(app.create_revenue_trend_actual)(cube, version, first, last, freq))
+    bench.run('app', 'create_category_analysis',
+              lambda: inspect.unwrap(app.create_category_analysis)(cube, version, first, last))
+    if scores is not None:
+        bench.run('app', 'create_churn_analysis', lambda: app.create_churn_analysis(scores))
+    if clustering is not None:
+        bench.run('app', 'create_cluster_visualization', lambda: app.create_cluster_visualization(*clustering))
+    if forecast is not None:
+        series = bench.run('app', 'select_series', lambda: forecasting.select_series(forecast))
+        bench.run('app', 'create_forecast_visualization', lambda: app.create_forecast_visualization(series))
+    if rules is not None and not rules.empty:
+        items = list(rules['antecedents'].iloc[0])
+        recommendations = bench.run('app', 'cross_sell', lambda: basket.cross_sell(rules, items))
+        bench.run('app', 'create_cross_sell_chart', lambda: app.create_cross_sell_chart(recommendations))
+    if campaign_cube is not None:
+        by_channel = bench.run('app', 'campaigns.summary_channel', lambda: campaign_cube.summary(by='channel'))
+        by_month = bench.run('app', 'campaigns.summary_month', lambda: campaign_cube.summary(by='month'))
+        bench.run('app', 'create_campaign_channel_chart', lambda: app.create_campaign_channel_chart(by_channel))
+        bench.run('app', 'create_campaign_trend_chart', lambda: app.create_campaign_trend_chart(by_month))
+    if cohort_matrix is not None:
+        retention = bench.run('app', 'cohorts.frame', lambda: cohort_matrix.frame('retention'))
+        bench.run('app', 'create_cohort_heatmap', lambda: app.create_cohort_heatmap(retention, 'retention'))
+
+    analytics = sqlite_store.SqliteAnalytics()
+    bench.run('app', 'sqlite.kpis', lambda: analytics.kpis(first, last))
+    bench.run('app', 'sqlite.series_daily', lambda: analytics.series(first, last, freq='D'))
+    return bench.results
+
+
+# ========================
+# DRIVER
+# ========================
+def ensure_data(data_dir, n_orders, seed):
+    """Generate the scale's CSVs unless an earlier run left them. Returns (root, info)"""
+    root = os.path.join(data_dir, f'{n_orders}-seed{seed}')
+    marker = os.path.join(root, 'synthetic.json')
+    if os.path.exists(marker):
+        with open(marker) as f:
+            return root, json.load(f)
+    print(f"Generating {n_orders:,} orders into {root}", flush=True)
+    start = time.perf_counter()
+    rows = synthetic.generate(root, n_orders, seed=seed)
+    info = {'orders': n_orders, 'seed': seed, 'rows': rows, 'generate_s': time.perf_counter() - start}
+    with open(marker, 'w') as f:
+        json.dump(info, f, indent=2)
+    return root, info
+
+
+def run_scale(root, repeat):
+    """Run the worker for one data root in a fresh interpreter"""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_file = f.name
+    env = dict(os.environ, RETAILSMART_ROOT=root, RETAILSMART_METRICS='0',
+               PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])))
+    try:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', '--repeat', str(repeat),
+                        '--output', result_file], env=env, cwd=root, check=True)
+        with open(result_file) as f:
+            return json.load(f)
+    finally:
+        os.remove(result_file)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _versions():
+    versions = {}
+    for name in PACKAGES:
+        try:
+            versions[name] = __import__(name).__version__
+        except Exception:
+            versions[name] = None
+    return versions
+
+
+def compare(previous, current, threshold=DEFAULT_THRESHOLD):
+    """One row per benchmark present in both runs; regressions have 'regressed' set"""
+    before = {(r['scale'], r['name']): r for r in previous['results'] if r['status'] == 'ok'}
+    rows = []
+    for r in current['results']:
+        old = before.get((r['scale'], r['name']))
+        if r['status'] != 'ok' or old is None:
+            continue
+        ratio = r['min_s'] / max(old['min_s'], 1e-9)
+        rows.append({'scale': r['scale'], 'name': r['name'], 'before_s': old['min_s'],
+                     'after_s': r['min_s'], 'ratio': ratio,
+                     'regressed': ratio > 1 + threshold and r['min_s'] - old['min_s'] > MIN_DELTA_SECONDS})
+    return rows
+
+
+def print_comparison(rows, threshold):
+    print(f"\nAgainst the previous run (regression: > {threshold:.0%} and > {MIN_DELTA_SECONDS * 1e3:.0f} ms slower)")
+    for row in rows:
+        flag = '  REGRESSION' if row['regressed'] else ''
+        print(f"  {row['scale']:>10,}  {row['name']:<36} {row['before_s'] * 1e3:10.1f} -> "
+              f"{row['after_s'] * 1e3:10.1f} ms  {row['ratio']:5.2f}x{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard and pipeline on synthetic data')
+    parser.add_argument('--scales', nargs='+', default=list(DEFAULT_SCALES),
+                        help='order counts, e.g. 100k 1m 10m 50m')
+    parser.add_argument('--seed', type=int, default=synthetic.DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='runs per benchmark')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='where generated data is kept')
+    parser.add_argument('--output', default=None, help='results JSON (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', default=None, help='earlier results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='relative slowdown to flag')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        results = run_worker(args.repeat)
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        with open(args.output, 'w') as f:
+            json.dump({'results': results, 'peak_rss_mb': round(peak_mb, 1)}, f, default=str)
+        return
+
+    created = datetime.now(timezone.utc)
+    report = {
+        'meta': {'created': created.isoformat(timespec='seconds'), 'git_commit': _git_commit(),
+                 'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpu_count': os.cpu_count(), 'packages': _versions(),
+                 'seed': args.seed, 'repeat': args.repeat},
+        'scales': {},
+        'results': [],
+    }
+    for scale in args.scales:
+        n_orders = synthetic.parse_count(scale)
+        root, info = ensure_data(args.data_dir, n_orders, args.seed)
+        print(f"Scale {n_orders:,} orders ({info['rows']['sales']:,} sales rows)", flush=True)
+        start = time.perf_counter()
+        worker = run_scale(root, args.repeat)
+        report['scales'][str(n_orders)] = dict(info, root=root, peak_rss_mb=worker['peak_rss_mb'],
+                                               wall_s=time.perf_counter() - start)
+        report['results'] += [dict(r, scale=n_orders) for r in worker['results']]
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{created:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare(json.load(f), report, args.threshold)
+        print_comparison(rows, args.threshold)
+        if any(row['regressed'] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+RetailSmart Analytics Toolkit
+=============================
+Reusable data and model plumbing behind the Streamlit dashboard (app.py).
+Author: Kanak Baghel
+License: Apache 2.0
+"""
@@ -0,0 +1,268 @@
+"""
+RetailSmart Market Basket Engine
+================================
+Frequent itemsets and association rules straight from the sales table, without
+the dense order x category matrix the P3 notebook built for mlxtend.apriori.
+
+- Transactions are a sparse CSR order x item matrix (one entry per distinct
+  order/item pair), at category or product level.
+- Item and pair supports come from column sums and one sparse X^T X product.
+- Longer itemsets are mined depth-first (Eclat): each item's orders are a
+  packed bitset, an itemset's support is the popcount of the AND of its
+  items' bitsets, and only items forming a frequent pair with every item of
+  the prefix are tried.
+- Rules (antecedent -> consequent, with support, confidence and lift) are
+  written to Parquet in Exported_files/Phase-3/data outputs/.
+
+Usage:
+    python -m retailsmart.basket                              # category level
+    python -m retailsmart.basket --level product --min-support 0.00005
+"""
+
+import argparse
+import itertools
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from retailsmart.cube import CATEGORY_COLUMNS, pick_column
+from retailsmart.paths import PHASE3_OUTPUTS_DIR, atomic_write
+from retailsmart.snapshot import load_table
+
+DEFAULT_MIN_SUPPORT = 0.0001
+DEFAULT_MAX_LEN = 3
+DEFAULT_MIN_LIFT = 1.0
+
+LEVEL_COLUMNS = {'category': 'category_english', 'product': 'product_id'}
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount_rows(words):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:
+    _POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount_rows(words):
+        as_bytes = words.view(np.uint8).reshape(*words.shape[:-1], -1)
+        return _POPCOUNT8[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def rules_path(level):
+    return os.path.join(PHASE3_OUTPUTS_DIR, f'basket_rules_{level}.parquet')
+
+
+# ========================
+# TRANSACTIONS
+# ========================
+class Transactions:
+    """Sparse order x item incidence matrix with the item labels"""
+
+    def __init__(self, matrix, items):
+        self.matrix = matrix.tocsr()
+        self.items = items
+
+    @classmethod
+    def from_sales(cls, sales, level='category', products=None):
+        """One row per order, one column per item (category or product) bought in it"""
+        if level == 'category':
+            item_col = pick_column(sales, CATEGORY_COLUMNS)
+            if item_col is None and products is not None:
+                category_col = pick_column(products, CATEGORY_COLUMNS)
+                items = sales[['product_id']].merge(
+                    products[['product_id', category_col]].drop_duplicates('product_id'),
+                    on='product_id', how='left'
+                )[category_col].to_numpy()
+            else:
+                items = sales[item_col].to_numpy()
+        else:
+            items = sales[LEVEL_COLUMNS[level]].to_numpy()
+
+        # Orders with no known item drop out of the support denominator, as
+        # they did from the notebook's unstacked basket
+        item_codes, labels = pd.factorize(items, sort=True)
+        order_ids = sales['order_id'].to_numpy()
+        keep = (item_codes >= 0) & pd.notna(order_ids)
+        order_codes, _ = pd.factorize(order_ids[keep])
+        item_codes = item_codes[keep]
+
+        # Distinct (order, item) pairs: quantity and repeat lines do not matter
+        n_items = max(len(labels), 1)
+        pairs = np.unique(order_codes.astype(np.int64) * n_items + item_codes)
+        rows, cols = pairs // n_items, pairs % n_items
+        n_orders = int(order_codes.max()) + 1 if len(order_codes) else 0
+        matrix = sparse.csr_matrix(
+            (np.ones(len(pairs), dtype=np.int32), (rows, cols)), shape=(n_orders, len(labels))
+        )
+        return cls(matrix, pd.Index(labels.astype(str)))
+
+    @property
+    def n_orders(self):
+        return self.matrix.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+
+
+# ========================
+# MINING
+# ========================
+def _bitset(order_ids, n_words):
+    """Packed bitset (uint64 words) with the given order positions set"""
+    flags = np.zeros(n_words * 64, dtype=bool)
+    flags[order_ids] = True
+    return np.packbits(flags, bitorder='little').view(np.uint64)
+
+
+def frequent_itemsets(transactions, min_support=DEFAULT_MIN_SUPPORT, max_len=DEFAULT_MAX_LEN):
+    """Frequent itemsets as {tuple of item positions: order count}"""
+    n_orders = transactions.n_orders
+    if n_orders == 0:
+        return {}
+    min_count = max(int(np.ceil(min_support * n_orders)), 1)
+
+    counts = np.asarray(transactions.matrix.sum(axis=0)).ravel()
+    frequent = np.flatnonzero(counts >= min_count)
+    itemsets = {(int(i),): int(counts[i]) for i in frequent}
+    if max_len < 2 or len(frequent) < 2:
+        return itemsets
+
+    # Pair supports for every frequent item at once
+    X = transactions.matrix[:, frequent]
+    co = sparse.triu(X.T @ X, k=1).tocoo()
+    keep = co.data >= min_count
+    pair_a, pair_b, pair_n = frequent[co.row[keep]], frequent[co.col[keep]], co.data[keep]
+    neighbours = {}
+    for a, b, n in zip(pair_a.tolist(), pair_b.tolist(), pair_n.tolist()):
+        a, b = min(a, b), max(a, b)
+        itemsets[(a, b)] = int(n)
+        neighbours.setdefault(a, set()).add(b)
+    if max_len < 3 or not neighbours:
+        return itemsets
+
+    # Eclat over bitsets for 3+ items, built only for items in frequent pairs
+    csc = transactions.matrix.tocsc()
+    n_words = (n_orders + 63) // 64
+    in_pairs = sorted(set(neighbours) | set().union(*neighbours.values()))
+    bits = {i: _bitset(csc.indices[csc.indptr[i]:csc.indptr[i + 1]], n_words) for i in in_pairs}
+
+    def extend(prefix, prefix_bits, candidates):
+        if len(prefix) >= max_len or not candidates:
+            return
+        candidates = sorted(candidates)
+        joint = np.stack([bits[c] for c in candidates]) & prefix_bits
+        supports = _popcount_rows(joint)
+        for k, c in enumerate(candidates):
+            if supports[k] < min_count:
+                continue
+            itemset = prefix + (c,)
+            itemsets[itemset] = int(supports[k])
+            # Every pair inside a frequent itemset must itself be frequent
+            deeper = {d for d in candidates[k + 1:] if d in neighbours.get(c, ())}
+            extend(itemset, joint[k], deeper)
+
+    for a in sorted(neighbours):
+        for b in sorted(neighbours[a]):
+            candidates = neighbours[a] & neighbours.get(b, set())
+            extend((a, b), bits[a] & bits[b], {c for c in candidates if c > b})
+    return itemsets
+
+
+def association_rules(itemsets, n_orders, labels, min_lift=DEFAULT_MIN_LIFT, min_confidence=0.0):
+    """Rules A -> C from every frequent itemset of 2+ items"""
+    records = []
+    for itemset, count in itemsets.items():
+        if len(itemset) < 2:
+            continue
+        support = count / n_orders
+        for size in range(1, len(itemset)):
+            for antecedent in itertools.combinations(itemset, size):
+                consequent = tuple(i for i in itemset if i not in antecedent)
+                antecedent_support = itemsets[antecedent] / n_orders
+                consequent_support = itemsets[consequent] / n_orders
+                confidence = support / antecedent_support
+                lift = confidence / consequent_support
+                if lift < min_lift or confidence < min_confidence:
+                    continue
+                records.append((
+                    [labels[i] for i in antecedent], [labels[i] for i in consequent],
+                    antecedent_support, consequent_support, support, count, confidence, lift,
+                ))
+
+    columns = ['antecedents', 'consequents', 'antecedent_support', 'consequent_support',
+               'support', 'count', 'confidence', 'lift']
+    rules = pd.DataFrame.from_records(records, columns=columns)
+    return rules.sort_values(['lift', 'support'], ascending=False, ignore_index=True)
+
+
+def mine_rules(sales, level='category', products=None, min_support=DEFAULT_MIN_SUPPORT,
+               max_len=DEFAULT_MAX_LEN, min_lift=DEFAULT_MIN_LIFT, min_confidence=0.0):
+    """Sales -> association rules DataFrame, plus timings"""
+    timings = {}
+    start = time.perf_counter()
+    transactions = Transactions.from_sales(sales, level, products)
+    timings['transactions'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    itemsets = frequent_itemsets(transactions, min_support, max_len)
+    timings['itemsets'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rules = association_rules(itemsets, transactions.n_orders, transactions.items, min_lift, min_confidence)
+    timings['rules'] = time.perf_counter() - start
+    return rules, timings
+
+
+def write_rules(rules, level):
+    """Atomically write the rules Parquet file for a level"""
+    path = rules_path(level)
+    with atomic_write(path) as tmp_path:
+        rules.to_parquet(tmp_path, index=False)
+    return path
+
+
+def load_rules(level='category'):
+    return pd.read_parquet(rules_path(level))
+
+
+def cross_sell(rules, items, top_n=10):
+    """Best consequents for a basket: rules whose antecedents are all in `items`"""
+    basket = set(items)
+    matches = rules[rules['antecedents'].map(lambda a: set(a) <= basket)]
+    matches = matches[matches['consequents'].map(lambda c: not set(c) & basket)]
+    return matches.head(top_n)
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Mine market-basket association rules')
+    parser.add_argument('--level', choices=list(LEVEL_COLUMNS), default='category')
+    parser.add_argument('--min-support', type=float, default=DEFAULT_MIN_SUPPORT)
+    parser.add_argument('--max-len', type=int, default=DEFAULT_MAX_LEN)
+    parser.add_argument('--min-lift', type=float, default=DEFAULT_MIN_LIFT)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    sales, products = load_table('sales'), load_table('products')
+    load_seconds = time.perf_counter() - start
+
+    rules, timings = mine_rules(sales, args.level, products, args.min_support, args.max_len, args.min_lift)
+    path = write_rules(rules, args.level)
+
+    print(f"{len(rules):,} {args.level}-level rules -> {path}")
+    print(f"  load         {load_seconds:8.3f}s")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<12} {seconds:8.3f}s")
+    if len(rules):
+        top = rules.head(5)
+        for _, rule in top.iterrows():
+            print(f"  {', '.join(rule['antecedents'])} -> {', '.join(rule['consequents'])}  "
+                  f"conf {rule['confidence']:.3f}  lift {rule['lift']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
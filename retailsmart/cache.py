@@ -0,0 +1,211 @@
+"""
+Artifact Cache
+==============
+A process-wide, memory-bounded LRU cache for the dashboard's loaders and
+derived results. It replaces bare st.cache_data / st.cache_resource, which
+never notice that the pipeline rewrote a file and never let anything go.
+
+- Each entry is keyed on the call's arguments plus a fingerprint of the files
+  it was read from: (path, mtime_ns, size) per file, one os.stat each. A
+  rewritten artifact gives a new key, so the next call reloads it and the
+  stale entry is dropped right away.
+- Entries are sized (DataFrames deep, arrays by nbytes, anything else by its
+  pickle) and the least recently used are evicted once the total passes the
+  budget (RETAILSMART_CACHE_MB, default 1024).
+- Concurrent calls for the same key load once; the others wait for it.
+  Exceptions are not cached.
+- Values are shared, not copied: callers must not mutate them in place.
+
+Usage:
+    @cached(sources=lambda level: [rules_path(level)])
+    def load_basket_rules(level):
+        return load_rules(level)
+
+    ARTIFACT_CACHE.stats()      # hits, misses, evictions, invalidations, bytes
+"""
+
+import functools
+import inspect
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_MB = 1024
+
+
+# ========================
+# FINGERPRINTS AND SIZES
+# ========================
+def fingerprint(paths):
+    """(path, mtime_ns, size) per path; a missing file fingerprints as (path, None, None)"""
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stamps.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stamps.append((path, None, None))
+    return tuple(stamps)
+
+
+def estimate_bytes(value, _seen=None):
+    """Approximate in-memory size of a cached value"""
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (str, bytes, int, float, bool, type(None))):
+        return sys.getsizeof(value)
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_bytes(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_bytes(k, seen) + estimate_bytes(v, seen)
+                                          for k, v in value.items())
+    if type(value).__module__.startswith('retailsmart') and hasattr(value, '__dict__'):
+        return sys.getsizeof(value) + estimate_bytes(vars(value), seen)
+    try:
+        # Models and figures: their pickle is a fair proxy for what they hold
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+# ========================
+# CACHE
+# ========================
+class ArtifactCache:
+    """Thread-safe LRU cache with a byte budget"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (name, args, fingerprint) -> entry dict
+        self._current = {}              # (name, args) -> latest key, to drop stale versions
+        self._loading = {}              # key -> lock held while it loads
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def get_or_load(self, name, args, stamp, loader):
+        """Cached value for name(args) at this fingerprint, calling loader() on a miss"""
+        key = (name, args, stamp)
+        with self._lock:
+            value = self._hit(key)
+            if value is not None:
+                return value[0]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                value = self._hit(key)
+                if value is not None:
+                    return value[0]
+                self.misses += 1
+            try:
+                start = time.perf_counter()
+                result = loader()
+                seconds = time.perf_counter() - start
+                self._store(key, result, seconds)
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return result
+
+    def _hit(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry['hits'] += 1
+        self.hits += 1
+        return (entry['value'],)
+
+    def _store(self, key, value, seconds):
+        nbytes = estimate_bytes(value)
+        with self._lock:
+            # A new fingerprint for the same call makes the old entry unreachable
+            stale = self._current.get(key[:2])
+            if stale is not None and stale != key and stale in self._entries:
+                del self._entries[stale]
+                self.invalidations += 1
+            self._current[key[:2]] = key
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = {'value': value, 'bytes': nbytes, 'seconds': seconds,
+                                  'hits': 0, 'created': time.time()}
+            self._evict()
+
+    def _evict(self):
+        total = sum(entry['bytes'] for entry in self._entries.values())
+        while total > self.max_bytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            if self._current.get(key[:2]) == key:
+                del self._current[key[:2]]
+            total -= entry['bytes']
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._current.clear()
+
+    def stats(self):
+        """Counters and current footprint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(entry['bytes'] for entry in self._entries.values()),
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def entries(self):
+        """One row per cached value, least recently used first"""
+        with self._lock:
+            rows = [{'name': key[0], 'args': ', '.join(map(str, key[1])), 'bytes': entry['bytes'],
+                     'load_seconds': entry['seconds'], 'hits': entry['hits'],
+                     'age_seconds': time.time() - entry['created']}
+                    for key, entry in self._entries.items()]
+        return pd.DataFrame(rows, columns=['name', 'args', 'bytes', 'load_seconds', 'hits', 'age_seconds'])
+
+
+ARTIFACT_CACHE = ArtifactCache(int(float(os.environ.get('RETAILSMART_CACHE_MB', DEFAULT_MAX_MB)) * 2 ** 20))
+
+
+def cached(sources=None, cache=None):
+    """Memoize a function on its arguments and the fingerprint of sources(*args).
+
+    sources receives the keyed arguments and returns the file paths to stat.
+
+    As with st.cache_data, parameters whose names start with an underscore
+    are passed through but left out of the key (e.g. the frames a cube is
+    built from, when a version argument already identifies them).
+    """
+    def decorate(func):
+        params = list(inspect.signature(func).parameters)
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = dict(zip(params, args), **kwargs)
+            key_args = tuple(bound[param] for param in params if param in bound and not param.startswith('_'))
+            stamp = fingerprint(sources(*key_args)) if sources else ()
+            return (cache or ARTIFACT_CACHE).get_or_load(name, key_args, stamp,
+                                                         lambda: func(*args, **kwargs))
+        return wrapper
+    return decorate
@@ -0,0 +1,279 @@
+"""
+RetailSmart Cohort Retention
+============================
+Retention, orders and revenue by acquisition cohort. Every
+customer_unique_id is assigned the month of its first purchase, and each
+later month it buys in is counted against that cohort. Until now churn was
+only the static churn_flag / days_since_last_order columns.
+
+- One pass over the interned sales, with no groupby or merge:
+  - order lines collapse to orders by scattering into arrays indexed by the
+    int32 order codes (revenue through np.bincount);
+  - customer_id codes become customer_unique_id codes through a lookup array;
+  - purchase days become months through a small day -> month table;
+  - the first month per customer is an np.minimum.at;
+  - every cohort x months-since-acquisition cell is filled with np.bincount.
+- Active customers per cell are distinct (customer, month) pairs. Everyone
+  is active in their acquisition month (the cohort size), so np.unique over
+  packed int64 keys only sees the later, repeat orders.
+- Each cohort also counts its repeat customers, those with more than one
+  order.
+
+The matrix is saved to Exported_files/Pipeline/cohorts.npz stamped with the
+snapshot version, and the dashboard's cohort tab renders it as heatmaps.
+Cells a cohort has not reached yet are NaN rather than 0.
+
+Usage:
+    python -m retailsmart.cohorts                    # build and print retention
+    python -m retailsmart.cohorts --metric revenue --max-age 12
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.cube import CUSTOMER_COLUMNS, DATE_COLUMNS, ORDER_COLUMNS, VALUE_COLUMNS, pick_column
+from retailsmart.features import KEY, customer_key_map
+from retailsmart.paths import PIPELINE_DIR, atomic_write
+from retailsmart.snapshot import (current_interned_dir, interned_file, refresh_interned, refresh_snapshot,
+                                  snapshot_version)
+
+MATRIX_PATH = os.path.join(PIPELINE_DIR, 'cohorts.npz')
+
+DAY_NS = 86_400 * 10**9
+METRICS = {
+    'retention': 'Retention (% of cohort active)',
+    'customers': 'Active customers',
+    'orders': 'Orders',
+    'revenue': 'Revenue ($)',
+    'cumulative_revenue_per_customer': 'Cumulative revenue per acquired customer ($)',
+}
+
+
+def _codes(values):
+    """Dense integer codes for an ID column; interned codes pass through"""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.integer):
+        return values
+    return pd.factorize(values)[0]
+
+
+def _month_codes(days):
+    """Months since 1970 for days since 1970, via a day -> month lookup table"""
+    first = days.min()
+    table = np.arange(first, days.max() + 1).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return table[days - first]
+
+
+def person_codes(customer_codes, customers):
+    """customer_unique_id code per customer_id code; unknown customers keep their own"""
+    if customers is None or KEY not in customers.columns:
+        return customer_codes
+    if not (np.issubdtype(customers['customer_id'].dtype, np.integer)
+            and np.issubdtype(customers[KEY].dtype, np.integer)):
+        return None
+    ids = customers['customer_id'].to_numpy()
+    keys = customers[KEY].to_numpy()
+    # Customers missing from the table get codes above every customer_unique_id
+    size = max(int(customer_codes.max(initial=-1)), int(ids.max(initial=-1))) + 1
+    first_spare = int(keys.max(initial=-1)) + 1
+    dtype = np.int32 if first_spare + size < 2**31 else np.int64
+    lookup = np.arange(first_spare, first_spare + size, dtype=dtype)
+    lookup[ids] = keys
+    return lookup[customer_codes]
+
+
+class CohortMatrix:
+    """Acquisition month x months-since-acquisition customer, order and revenue cells"""
+
+    def __init__(self, months, customers, orders, revenue, repeat_customers):
+        self.months = months
+        self.customers = customers
+        self.orders = orders
+        self.revenue = revenue
+        self.repeat_customers = repeat_customers
+
+    # ========================
+    # BUILD
+    # ========================
+    @classmethod
+    def from_sales(cls, sales_df, customers_df=None):
+        """Build the matrix in one pass over the sales lines"""
+        timestamps = pd.to_datetime(sales_df[pick_column(sales_df, DATE_COLUMNS)]).to_numpy()
+        line_orders = _codes(sales_df[pick_column(sales_df, ORDER_COLUMNS)].to_numpy())
+        line_customers = sales_df[pick_column(sales_df, CUSTOMER_COLUMNS)].to_numpy()
+        values = sales_df[pick_column(sales_df, VALUE_COLUMNS)].fillna(0).to_numpy(dtype=np.float64)
+        valid = ~np.isnat(timestamps)
+        if not valid.all():
+            timestamps, line_orders = timestamps[valid], line_orders[valid]
+            line_customers, values = line_customers[valid], values[valid]
+        if not len(timestamps):
+            empty = np.zeros((0, 0), dtype=np.int64)
+            return cls(pd.DatetimeIndex([]), empty, empty, empty.astype(np.float64), np.zeros(0, dtype=np.int64))
+
+        # Lines -> orders: an order has one customer and one purchase timestamp,
+        # so scattering by order code keeps one of each; -1 marks unused codes
+        n_orders = int(line_orders.max()) + 1
+        days = timestamps.view(np.int64) // DAY_NS
+        first_day = days.min()
+        order_days = np.full(n_orders, -1, dtype=np.int32)
+        order_days[line_orders] = days - first_day
+        present = order_days >= 0
+        order_days = order_days[present] + first_day
+        order_revenue = np.bincount(line_orders, weights=values, minlength=n_orders)[present]
+
+        person = None
+        if np.issubdtype(line_customers.dtype, np.integer):
+            order_customers = np.empty(n_orders, dtype=line_customers.dtype)
+            order_customers[line_orders] = line_customers
+            person = person_codes(order_customers[present], customers_df)
+        if person is None:
+            # Hex IDs: map to customer_unique_id by value, then code
+            first_line = np.unique(line_orders, return_index=True)[1]
+            ids = pd.Series(line_customers[first_line])
+            key_map = customer_key_map(customers_df) if customers_df is not None else pd.Series(dtype=object)
+            person = _codes(ids.map(key_map).fillna(ids).to_numpy())
+
+        month = _month_codes(order_days)
+        first_month = month.min()
+        month -= first_month
+        n_months = int(month.max()) + 1
+
+        # Acquisition month per customer, then each order's cohort cell
+        n_people = int(person.max()) + 1
+        cohort_of = np.full(n_people, n_months, dtype=np.int64)
+        np.minimum.at(cohort_of, person, month)
+        cohort = cohort_of[person]
+        age = month - cohort
+        cell = cohort * n_months + age
+        n_cells = n_months * n_months
+        shape = (n_months, n_months)
+
+        orders = np.bincount(cell, minlength=n_cells).reshape(shape)
+        revenue = np.bincount(cell, weights=order_revenue, minlength=n_cells).reshape(shape)
+
+        # Everyone is active in their acquisition month; only later months
+        # need distinct (customer, month) pairs, and those orders are few
+        acquired = cohort_of[cohort_of < n_months]
+        later = age > 0
+        active = np.unique(person[later] * n_months + age[later])
+        active_person, active_age = np.divmod(active, n_months)
+        customers = np.bincount(cohort_of[active_person] * n_months + active_age, minlength=n_cells)
+        customers[np.arange(n_months) * n_months] += np.bincount(acquired, minlength=n_months)
+        customers = customers.reshape(shape)
+
+        order_counts = np.bincount(person, minlength=n_people)
+        repeat_customers = np.bincount(cohort_of[order_counts > 1], minlength=n_months)
+
+        months = pd.date_range(pd.Timestamp(np.datetime64(int(first_month), 'M')), periods=n_months, freq='MS')
+        return cls(months, customers, orders, revenue, repeat_customers)
+
+    # ========================
+    # PERSISTENCE
+    # ========================
+    def save(self, path, version=''):
+        """Write the cells to one .npz"""
+        with atomic_write(path, suffix='.tmp.npz') as tmp_path:
+            np.savez(tmp_path, months=self.months.values, customers=self.customers, orders=self.orders,
+                     revenue=self.revenue, repeat_customers=self.repeat_customers, version=np.array(version))
+
+    @classmethod
+    def load(cls, path, version=None):
+        """Read a saved matrix; None if it is missing or stamped with another version"""
+        try:
+            data = np.load(path)
+        except OSError:
+            return None
+        if version is not None and str(data['version']) != version:
+            return None
+        return cls(pd.DatetimeIndex(data['months']), data['customers'], data['orders'], data['revenue'],
+                   data['repeat_customers'])
+
+    # ========================
+    # VIEWS
+    # ========================
+    @property
+    def sizes(self):
+        """Customers acquired per cohort month"""
+        return self.customers[:, 0] if len(self.months) else np.zeros(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.customers, self.orders, self.revenue, self.repeat_customers))
+
+    def frame(self, metric='retention', max_age=None):
+        """Cohort x months-since-acquisition table; cells not reached yet are NaN"""
+        if metric not in METRICS:
+            raise ValueError(f"metric must be one of {list(METRICS)}")
+        sizes = self.sizes.astype(np.float64)
+        if metric == 'retention':
+            values = self.customers / np.where(sizes > 0, sizes, np.nan)[:, None]
+        elif metric == 'cumulative_revenue_per_customer':
+            values = np.cumsum(self.revenue, axis=1) / np.where(sizes > 0, sizes, np.nan)[:, None]
+        else:
+            values = getattr(self, metric).astype(np.float64)
+
+        n = len(self.months)
+        reached = np.arange(n)[None, :] <= (n - 1 - np.arange(n))[:, None]
+        table = pd.DataFrame(np.where(reached, values, np.nan), index=self.months.strftime('%Y-%m'),
+                             columns=pd.RangeIndex(n, name='months_since_acquisition'))
+        table.index.name = 'cohort'
+        table = table[sizes > 0]
+        return table if max_age is None else table.iloc[:, :max_age + 1]
+
+    def summary(self):
+        """One row per cohort: size, repeat customers, orders and revenue"""
+        sizes = self.sizes
+        table = pd.DataFrame({
+            'customers': sizes,
+            'repeat_customers': self.repeat_customers,
+            'repeat_rate': self.repeat_customers / np.where(sizes > 0, sizes, np.nan),
+            'orders': self.orders.sum(axis=1),
+            'revenue': self.revenue.sum(axis=1),
+        }, index=pd.Index(self.months.strftime('%Y-%m'), name='cohort'))
+        table['revenue_per_customer'] = table['revenue'] / table['customers'].where(table['customers'] > 0)
+        return table[sizes > 0]
+
+
+# ========================
+# BUILD
+# ========================
+def build_matrix(path=MATRIX_PATH):
+    """Build the matrix from the interned snapshot and save it stamped with the snapshot version"""
+    refresh_snapshot()
+    refresh_interned()
+    directory = current_interned_dir()
+    sales = pd.read_feather(interned_file('sales', directory))
+    customers = pd.read_feather(interned_file('customers', directory), columns=['customer_id', KEY])
+    start = time.perf_counter()
+    matrix = CohortMatrix.from_sales(sales, customers)
+    seconds = time.perf_counter() - start
+    matrix.save(path, version=snapshot_version())
+    return matrix, {'sales_rows': len(sales), 'orders': int(matrix.orders.sum()), 'seconds': seconds}
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Cohort retention and revenue matrix')
+    parser.add_argument('--metric', choices=list(METRICS), default='retention', help='table to print')
+    parser.add_argument('--max-age', type=int, default=12, help='months since acquisition to print')
+    args = parser.parse_args()
+
+    matrix, report = build_matrix()
+    print(f"{report['sales_rows']:,} sales rows ({report['orders']:,} orders) -> {len(matrix.months)} cohorts "
+          f"in {report['seconds']:.3f}s ({report['orders'] / max(report['seconds'], 1e-9):,.0f} orders/s) "
+          f"-> {MATRIX_PATH}")
+    table = matrix.frame(args.metric, args.max_age)
+    print(f"\n{METRICS[args.metric]}:")
+    print((table * 100 if args.metric == 'retention' else table).round(1).to_string())
+    print()
+    print(matrix.summary().round(3).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Chart and Table Downsampling
+============================
+Keeps what the dashboard sends to the browser proportional to what a chart
+or table can show, not to the size of the data behind it. Plotly figures and
+st.dataframe payloads are serialized whole, so a daily or per-customer view
+would otherwise ship every row as JSON/Arrow.
+
+- lttb: Largest-Triangle-Three-Buckets, which keeps the points that carry a
+  line's visual shape (peaks, dips, turns) within a point budget.
+- minmax_decimate: the min and max of each bucket, so no spike disappears.
+  Fully vectorised, so cheaper than LTTB on very long series.
+- top_n_other: the N largest slices of a pie plus one "Other" slice.
+- page_slice: one page of a table instead of head(100).
+- figure_payload_bytes / frame_payload_bytes: what a chart or table costs
+  on the wire.
+
+Usage:
+    points = downsample_frame(daily, 'date', 'revenue', max_points=1000)
+    pie = top_n_other(category_sales, 'category_english', 'revenue', n=10)
+    rows, n_pages = page_slice(sales, page=3, page_size=100)
+"""
+
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+DEFAULT_POINT_BUDGET = int(os.environ.get('RETAILSMART_POINT_BUDGET', 1000))
+DEFAULT_TOP_N = 10
+DEFAULT_PAGE_SIZE = 100
+OTHER_LABEL = 'Other'
+
+
+# ========================
+# TIME SERIES
+# ========================
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb(x, y, n_out):
+    """Indices of the n_out points Largest-Triangle-Three-Buckets keeps"""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=float)
+
+    # First and last points are always kept; the rest fall into n_out - 2
+    # buckets, each contributing the point forming the largest triangle with
+    # the previous pick and the next bucket's average
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        next_hi = edges[b + 2] if b + 2 < len(edges) else n
+        cx, cy = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[b + 1] = a
+    return keep
+
+
+def minmax_decimate(y, n_out):
+    """Indices of the min and max of (n_out - 2) // 2 equal buckets, plus both ends"""
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    # Equal buckets as rows of a NaN-padded matrix: one argmin/argmax per row
+    size = math.ceil(n / ((n_out - 2) // 2))
+    rows = np.full(math.ceil(n / size) * size, np.nan)
+    rows[:n] = y
+    rows = rows.reshape(-1, size)
+    offsets = np.arange(len(rows)) * size
+    picks = np.concatenate([offsets + np.nanargmin(rows, axis=1), offsets + np.nanargmax(rows, axis=1), [0, n - 1]])
+    return np.unique(picks)
+
+
+def downsample_frame(df, x, y, max_points=DEFAULT_POINT_BUDGET, method='lttb'):
+    """Rows of df to plot for a y-over-x line within max_points"""
+    if len(df) <= max_points:
+        return df
+    if method == 'lttb':
+        keep = lttb(df[x].to_numpy(), df[y].to_numpy(), max_points)
+    elif method == 'minmax':
+        keep = minmax_decimate(df[y].to_numpy(), max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method '{method}' (use 'lttb' or 'minmax')")
+    return df.iloc[keep]
+
+
+# ========================
+# CATEGORIES AND TABLES
+# ========================
+def top_n_other(df, label, value, n=DEFAULT_TOP_N, other_label=OTHER_LABEL):
+    """The n - 1 largest rows by value plus one row summing the rest"""
+    if len(df) <= n:
+        return df
+    ranked = df.sort_values(value, ascending=False)
+    head, rest = ranked.iloc[:n - 1], ranked.iloc[n - 1:]
+    other = pd.DataFrame({label: [other_label], value: [rest[value].sum()]})
+    return pd.concat([head[[label, value]], other], ignore_index=True)
+
+
+def page_slice(df, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """(rows of the 1-based page, number of pages)"""
+    n_pages = max(1, math.ceil(len(df) / page_size))
+    page = min(max(1, page), n_pages)
+    return df.iloc[(page - 1) * page_size:page * page_size], n_pages
+
+
+# ========================
+# PAYLOAD SIZES
+# ========================
+def figure_payload_bytes(fig):
+    """Size of the JSON st.plotly_chart sends for a figure"""
+    return len(fig.to_json().encode())
+
+
+def frame_payload_bytes(df):
+    """Size of the Arrow IPC stream st.dataframe sends for a frame"""
+    table = pa.Table.from_pandas(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
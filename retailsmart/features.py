@@ -0,0 +1,302 @@
+"""
+RetailSmart RFM Feature Store
+=============================
+One persistent table of running per-customer aggregates, keyed by
+customer_unique_id, that the dashboard, the scoring engine and the segmentation
+all read instead of recomputing RFM from the full sales history.
+
+The store keeps only mergeable aggregates (first/last order timestamp, distinct
+orders, line items, total spend, sum of squared order spend, campaign counts,
+spend, conversions and response-rate sums), so new sales and marketing rows
+fold in as deltas. The source CSVs are treated as append-only: the store file
+remembers, in its Parquet metadata, the byte size already folded and a hash of
+that prefix, and a refresh reads and parses only the bytes past it. If a source
+was rewritten rather than appended to, the store is rebuilt from scratch.
+
+A refresh never rebuilds the sales snapshot: the customer_id ->
+customer_unique_id map comes from the customers snapshot (or its CSV), so after
+an append the cost is one hash of the file plus the new rows. Aggregates and
+watermarks are written together in one atomic swap, and a lock file keeps a
+dashboard refresh and a pipeline run from folding the same delta twice.
+
+Orders are assumed to arrive whole within one delta (all lines of an order are
+appended together), which is how the exports are produced.
+
+Usage:
+    python -m retailsmart.features            # fold new rows
+    python -m retailsmart.features --rebuild  # recompute from scratch
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from retailsmart.paths import FEATURES_DIR, atomic_write, file_lock
+from retailsmart.snapshot import is_fresh, read_appended, read_manifest, resolve_sources, snapshot_file
+
+STORE_PATH = os.path.join(FEATURES_DIR, 'rfm_store.parquet')
+# Parquet key-value metadata entry holding the per-source watermarks
+STATE_KEY = b'retailsmart.rfm_state'
+
+KEY = 'customer_unique_id'
+
+# Aggregates that combine by addition
+SUM_COLUMNS = [
+    'order_count', 'item_count', 'total_spend', 'spend_sq_sum',
+    'campaign_count', 'campaign_spend', 'conversions', 'response_rate_sum',
+]
+MIN_COLUMNS = ['first_order_ts']
+MAX_COLUMNS = ['last_order_ts']
+STORE_COLUMNS = MIN_COLUMNS + MAX_COLUMNS + SUM_COLUMNS
+
+
+# ========================
+# DELTA AGGREGATION
+# ========================
+def empty_store():
+    store = pd.DataFrame({
+        'first_order_ts': pd.Series(dtype='datetime64[ns]'),
+        'last_order_ts': pd.Series(dtype='datetime64[ns]'),
+        **{col: pd.Series(dtype='float64') for col in SUM_COLUMNS},
+    })
+    store.index.name = KEY
+    return store
+
+
+def customer_key_map(customers):
+    """customer_id -> customer_unique_id (falls back to customer_id itself)"""
+    if KEY not in customers.columns:
+        return pd.Series(customers['customer_id'].to_numpy(), index=customers['customer_id'])
+    return customers.drop_duplicates('customer_id').set_index('customer_id')[KEY]
+
+
+def load_key_map(customers_path, customer_ids=None):
+    """customer_key_map of the customers source, reading only its two ID columns.
+
+    Uses the customers snapshot when it matches the source; otherwise parses
+    just those columns of the CSV. Other tables' snapshots are left alone.
+    customer_ids limits the map to the customers a delta mentions, which are
+    picked out before any IDs become Python strings.
+    """
+    fresh, _ = is_fresh(read_manifest()['tables'].get('customers'), customers_path)
+    if fresh:
+        path = snapshot_file('customers')
+        with pa.memory_map(path) as source:
+            names = pa.ipc.open_file(source).schema.names
+        columns = [col for col in ('customer_id', KEY) if col in names]
+        customers = feather.read_table(path, columns=columns, memory_map=True)
+    else:
+        names = pd.read_csv(customers_path, nrows=0).columns
+        columns = [col for col in ('customer_id', KEY) if col in names]
+        customers = pa_csv.read_csv(customers_path, convert_options=pa_csv.ConvertOptions(
+            include_columns=columns, column_types={col: pa.string() for col in columns}))
+    if customer_ids is not None:
+        wanted = pa.array(pd.unique(np.asarray(customer_ids, dtype=object)), type=pa.string(), from_pandas=True)
+        customers = customers.filter(pc.is_in(customers['customer_id'], value_set=wanted))
+    return customer_key_map(customers.to_pandas())
+
+
+def aggregate_sales(sales, key_map):
+    """Per-customer_unique_id aggregates for a batch of sales rows"""
+    keys = sales['customer_id'].map(key_map).fillna(sales['customer_id'])
+    lines = pd.DataFrame({
+        KEY: keys.to_numpy(),
+        'order_id': sales['order_id'].to_numpy(),
+        'ts': pd.to_datetime(sales['order_purchase_timestamp']).to_numpy(),
+        'spend': sales['total_price'].fillna(0).to_numpy(),
+    })
+
+    orders = lines.groupby([KEY, 'order_id'], sort=False).agg(
+        ts=('ts', 'min'), spend=('spend', 'sum'), items=('spend', 'size')
+    ).reset_index()
+    orders['spend_sq'] = orders['spend'] ** 2
+
+    delta = orders.groupby(KEY, sort=False).agg(
+        first_order_ts=('ts', 'min'),
+        last_order_ts=('ts', 'max'),
+        order_count=('order_id', 'size'),
+        item_count=('items', 'sum'),
+        total_spend=('spend', 'sum'),
+        spend_sq_sum=('spend_sq', 'sum'),
+    )
+    return delta.astype({col: 'float64' for col in SUM_COLUMNS if col in delta.columns})
+
+
+def aggregate_marketing(marketing, key_map):
+    """Per-customer_unique_id campaign aggregates for a batch of marketing rows"""
+    keys = marketing['customer_id'].map(key_map).fillna(marketing['customer_id'])
+    delta = pd.DataFrame({
+        KEY: keys.to_numpy(),
+        'spend': marketing['spend'].fillna(0).to_numpy(),
+        'conversions': marketing['conversions'].fillna(0).to_numpy(),
+        'response_rate': marketing['response_rate'].fillna(0).to_numpy(),
+    }).groupby(KEY, sort=False).agg(
+        campaign_count=('spend', 'size'),
+        campaign_spend=('spend', 'sum'),
+        conversions=('conversions', 'sum'),
+        response_rate_sum=('response_rate', 'sum'),
+    )
+    return delta.astype('float64')
+
+
+def fold(store, delta):
+    """Merge a delta into the store.
+
+    Customers already in the store are updated through an index lookup and
+    vectorised column updates; customers seen for the first time are appended.
+    Nothing is re-aggregated, so the cost tracks the delta, not the history.
+    """
+    if delta.empty:
+        return store
+
+    positions = store.index.get_indexer(delta.index)
+    known = positions >= 0
+
+    if known.any():
+        rows = positions[known]
+        seen = delta.loc[known]
+        for col in delta.columns:
+            values = store[col].to_numpy().copy()
+            if col in MIN_COLUMNS:
+                values[rows] = np.fmin(values[rows], seen[col].to_numpy())
+            elif col in MAX_COLUMNS:
+                values[rows] = np.fmax(values[rows], seen[col].to_numpy())
+            else:
+                values[rows] += seen[col].to_numpy()
+            store[col] = values
+
+    new = delta.loc[~known]
+    if not new.empty:
+        new = new.reindex(columns=STORE_COLUMNS).astype(store.dtypes.to_dict())
+        new = new.fillna({col: 0.0 for col in SUM_COLUMNS})
+        store = pd.concat([store, new])
+        store.index.name = KEY
+    return store
+
+
+# ========================
+# PERSISTENCE / REFRESH
+# ========================
+def read_store(path=STORE_PATH):
+    """Read (store, state): the aggregates and the watermarks they cover"""
+    if not os.path.exists(path):
+        return empty_store(), {}
+    table = pq.read_table(path)
+    state = json.loads((table.schema.metadata or {}).get(STATE_KEY, b'{}'))
+    return table.to_pandas(), state
+
+
+def load_store(path=STORE_PATH):
+    """Read the store, or an empty one"""
+    return read_store(path)[0]
+
+
+def save_store(store, state, path=STORE_PATH):
+    """Write the aggregates and their watermarks in one file, swapped in whole"""
+    table = pa.Table.from_pandas(store)
+    metadata = dict(table.schema.metadata or {})
+    metadata[STATE_KEY] = json.dumps(state, sort_keys=True).encode()
+    with atomic_write(path) as tmp_path:
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+
+
+def refresh_store(rebuild=False, path=STORE_PATH, sources=None):
+    """Fold newly appended sales and marketing rows into the store.
+
+    sources overrides the resolved source CSVs ({table: path}). Returns
+    (store, report) where report holds rows folded per source.
+    """
+    sources = sources or resolve_sources()[1]
+    # Held across read -> fold -> write so concurrent refreshes queue up
+    # instead of both folding the same delta
+    with file_lock(path + '.lock'):
+        store, state = (empty_store(), {}) if rebuild else read_store(path)
+        deltas = {table: read_appended(table, sources[table], state[table]) if table in state else None
+                  for table in ('sales', 'marketing')}
+        full_rebuild = any(delta is None for delta in deltas.values())
+        if full_rebuild:
+            store = empty_store()
+            deltas = {table: read_appended(table, sources[table]) for table in deltas}
+
+        report = {table: len(rows) for table, (rows, _) in deltas.items()}
+        report['full_rebuild'] = full_rebuild
+        if not full_rebuild and not report['sales'] and not report['marketing']:
+            return store, report
+
+        mentioned = None if full_rebuild else np.concatenate(
+            [rows['customer_id'].to_numpy(dtype=object) for rows, _ in deltas.values()])
+        key_map = load_key_map(sources['customers'], mentioned)
+        for table, aggregate in (('sales', aggregate_sales), ('marketing', aggregate_marketing)):
+            rows, watermark = deltas[table]
+            if len(rows):
+                store = fold(store, aggregate(rows, key_map))
+            state[table] = watermark
+        save_store(store, state, path)
+    return store, report
+
+
+# ========================
+# READ VIEW
+# ========================
+def rfm_frame(store=None, as_of=None):
+    """Recency / frequency / monetary view of the store, one row per customer_unique_id"""
+    store = load_store() if store is None else store
+    as_of = pd.Timestamp(as_of) if as_of is not None else store['last_order_ts'].max()
+
+    orders = store['order_count'].replace(0, np.nan)
+    mean_spend = store['total_spend'] / orders
+    variance = (store['spend_sq_sum'] / orders - mean_spend ** 2).clip(lower=0)
+    campaigns = store['campaign_count'].replace(0, np.nan)
+
+    return pd.DataFrame({
+        'recency': (as_of - store['last_order_ts']).dt.days,
+        'frequency': store['order_count'],
+        'monetary': store['total_spend'],
+        'avg_spend': mean_spend.fillna(0),
+        'spend_std': np.sqrt(variance).fillna(0),
+        'tenure_days': (as_of - store['first_order_ts']).dt.days,
+        'campaigns': store['campaign_count'],
+        'conversions': store['conversions'],
+        'response_rate': (store['response_rate_sum'] / campaigns).fillna(0),
+    }, index=store.index)
+
+
+def rfm_for_customers(customer_ids, customers, rfm=None):
+    """RFM rows aligned to a list of customer_ids (NaN where the store has no entry).
+
+    customers supplies the customer_id -> customer_unique_id mapping and must
+    use the same ID representation (hex or interned codes) as customer_ids.
+    """
+    rfm = rfm_frame() if rfm is None else rfm
+    keys = pd.Series(customer_ids).map(customer_key_map(customers))
+    return rfm.reindex(keys.to_numpy()).reset_index(drop=True)
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Refresh the RFM feature store')
+    parser.add_argument('--rebuild', action='store_true', help='recompute from the full history')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store, report = refresh_store(rebuild=args.rebuild)
+    elapsed = time.perf_counter() - start
+
+    mode = 'full rebuild' if report['full_rebuild'] else 'incremental'
+    print(f"RFM store: {len(store):,} customers ({mode}) -> {STORE_PATH}")
+    print(f"  folded {report['sales']:,} sales rows and {report['marketing']:,} marketing rows in {elapsed:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
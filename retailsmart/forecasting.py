@@ -0,0 +1,410 @@
+"""
+RetailSmart Hierarchical Demand Forecasting
+===========================================
+Monthly orders and revenue forecasts for every category_english x
+customer_state series, their category totals and the grand total. The P3
+notebook only forecast the grand total.
+
+- All series are built in one vectorized pass: month, category and state
+  codes index a dense (series x month) array filled with np.bincount.
+  Distinct orders are counted per (series, month) cell.
+- Each series gets a lightweight exponential-smoothing model. Additive
+  Holt-Winters with a damped trend is used when there are two full years of
+  history, damped Holt otherwise, and the recent mean for series with only a
+  handful of active months. Smoothing parameters are picked by one-step SSE
+  over a small grid, evaluated for all grid points at once in numpy. Series
+  are fitted in chunks on a process pool.
+- Forecasts are reconciled top-down with forecast proportions, so every
+  category's states sum to the category and the categories sum to the total
+  (--reconcile bottom_up sums the bottom series instead).
+- The result is one long Parquet table (level, category, state, date,
+  is_forecast, orders, revenue) in Exported_files/Phase-3/data outputs/,
+  which the dashboard filters by category and state.
+
+Order counts above the bottom level are sums of their children, so an order
+spanning several categories counts once per category.
+
+Usage:
+    python -m retailsmart.forecasting                       # 12 months ahead, all cores
+    python -m retailsmart.forecasting --horizon 6 --workers 4
+    python -m retailsmart.forecasting --reconcile bottom_up
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.cube import CATEGORY_COLUMNS, DATE_COLUMNS, VALUE_COLUMNS, pick_column
+from retailsmart.paths import PHASE3_OUTPUTS_DIR, atomic_write
+from retailsmart.snapshot import load_table, refresh_snapshot
+
+FORECAST_PATH = os.path.join(PHASE3_OUTPUTS_DIR, 'forecast_hierarchy.parquet')
+LEGACY_FORECAST_PATH = os.path.join(PHASE3_OUTPUTS_DIR, 'forecast_results.csv')
+
+MEASURES = ('orders', 'revenue')
+LEVELS = ('total', 'category', 'category_state')
+ALL_LABEL = 'All'
+
+DEFAULT_HORIZON = 12
+SEASON = 12
+MIN_ACTIVE_MONTHS = 6
+CHUNK_SIZE = 64
+
+ALPHAS = np.array([0.1, 0.3, 0.5, 0.7, 0.9])
+BETAS = np.array([0.01, 0.1, 0.3])
+PHIS = np.array([0.8, 0.9, 0.98, 1.0])
+GAMMAS = np.array([0.05, 0.2, 0.4])
+
+
+# ========================
+# SERIES
+# ========================
+class SeriesSet:
+    """Monthly orders/revenue for every node of total > category > category x state"""
+
+    def __init__(self, months, nodes, orders, revenue):
+        self.months = months
+        self.nodes = nodes
+        self.orders = orders
+        self.revenue = revenue
+
+    @classmethod
+    def from_sales(cls, sales, customers, products=None):
+        """Build every bottom series in one pass, then sum up the hierarchy"""
+        date_col = pick_column(sales, DATE_COLUMNS)
+        value_col = pick_column(sales, VALUE_COLUMNS)
+        timestamps = pd.to_datetime(sales[date_col])
+        valid = timestamps.notna().to_numpy()
+        if not valid.any():
+            return cls.empty()
+        sales = sales.loc[valid]
+        month_values = timestamps[valid].to_numpy().astype('datetime64[M]')
+
+        category_col = pick_column(sales, CATEGORY_COLUMNS)
+        if category_col is None and products is not None:
+            category_col = pick_column(products, CATEGORY_COLUMNS)
+            categories = sales[['product_id']].merge(
+                products[['product_id', category_col]].drop_duplicates('product_id'),
+                on='product_id', how='left'
+            )[category_col]
+        else:
+            categories = sales[category_col]
+        state_col = pick_column(customers, ('customer_state', 'state'))
+        states = sales['customer_id'].map(
+            customers.drop_duplicates('customer_id').set_index('customer_id')[state_col]
+        )
+
+        first, last = month_values.min(), month_values.max()
+        months = pd.DatetimeIndex(np.arange(first, last + 1).astype('datetime64[ns]'))
+        month_codes = (month_values - first).astype(np.int64)
+        category_codes, category_labels = pd.factorize(
+            pd.Series(categories.to_numpy()).astype(object).fillna('unknown'), sort=True)
+        state_codes, state_labels = pd.factorize(
+            pd.Series(states.to_numpy()).astype(object).fillna('unknown'), sort=True)
+
+        # Only category x state pairs that ever sold become series
+        pair_codes = category_codes.astype(np.int64) * len(state_labels) + state_codes
+        observed, series_codes = np.unique(pair_codes, return_inverse=True)
+        n_series, n_months = len(observed), len(months)
+        cells = series_codes.astype(np.int64) * n_months + month_codes
+
+        revenue = np.bincount(cells, weights=sales[value_col].fillna(0).to_numpy(dtype=np.float64),
+                              minlength=n_series * n_months).reshape(n_series, n_months)
+        # Lines without an order id (code -1) add revenue but no order
+        order_codes, _ = pd.factorize(sales['order_id'])
+        has_order = order_codes >= 0
+        n_codes = int(order_codes.max()) + 1 if has_order.any() else 1
+        distinct_cells = np.unique(cells[has_order] * n_codes + order_codes[has_order]) // n_codes
+        orders = np.bincount(distinct_cells, minlength=n_series * n_months).astype(np.float64)
+        orders = orders.reshape(n_series, n_months)
+
+        bottom = pd.DataFrame({
+            'level': 'category_state',
+            'category': category_labels[observed // len(state_labels)],
+            'state': state_labels[observed % len(state_labels)],
+        })
+        return cls.from_bottom(months, bottom, orders, revenue)
+
+    @classmethod
+    def empty(cls):
+        """No months and no series beyond the (all-zero) total"""
+        bottom = pd.DataFrame({'level': [], 'category': [], 'state': []}, dtype=object)
+        return cls.from_bottom(pd.DatetimeIndex([]), bottom, np.zeros((0, 0)), np.zeros((0, 0)))
+
+    @classmethod
+    def from_bottom(cls, months, bottom, orders, revenue):
+        """Stack total, category and bottom rows; parents index into the same rows"""
+        category_codes, category_labels = pd.factorize(bottom['category'], sort=True)
+        n_categories = len(category_labels)
+
+        def rollup(values):
+            by_category = np.zeros((n_categories, values.shape[1]))
+            np.add.at(by_category, category_codes, values)
+            return np.vstack([values.sum(axis=0, keepdims=True), by_category, values])
+
+        nodes = pd.concat([
+            pd.DataFrame({'level': ['total'], 'category': [ALL_LABEL], 'state': [ALL_LABEL]}),
+            pd.DataFrame({'level': 'category', 'category': category_labels, 'state': ALL_LABEL}),
+            bottom[['level', 'category', 'state']],
+        ], ignore_index=True)
+        nodes['parent'] = np.concatenate([[-1], np.zeros(n_categories, dtype=np.int64),
+                                          1 + category_codes]).astype(np.int64)
+        return cls(months, nodes, rollup(orders), rollup(revenue))
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+# ========================
+# MODELS
+# ========================
+def _grid(*axes):
+    return [axis.ravel() for axis in np.meshgrid(*axes, indexing='ij')]
+
+
+def _holt_winters(y, horizon, season):
+    """Additive Holt-Winters, damped trend, over the whole parameter grid at once"""
+    alpha, beta, phi, gamma = _grid(ALPHAS, BETAS, PHIS, GAMMAS)
+    # Initial states from the first season: its mean and the year-on-year
+    # slope, moved to the season's last month; seasonal terms are detrended
+    first_mean = y[:season].mean()
+    slope = (y[season:2 * season].mean() - first_mean) / season
+    offsets = np.arange(season) - (season - 1) / 2
+    level = np.full(len(alpha), first_mean + slope * (season - 1) / 2)
+    trend = np.full(len(alpha), slope)
+    seasonal = np.tile(y[:season] - (first_mean + slope * offsets), (len(alpha), 1))
+    sse = np.zeros(len(alpha))
+    for t in range(season, len(y)):
+        value = y[t]
+        s = seasonal[:, t % season]
+        error = value - (level + phi * trend + s)
+        sse += error * error
+        new_level = alpha * (value - s) + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        seasonal[:, t % season] = gamma * (value - new_level) + (1 - gamma) * s
+        level = new_level
+
+    best = np.argmin(sse)
+    steps = np.arange(1, horizon + 1)
+    damping = np.cumsum(phi[best] ** steps)
+    season_idx = (len(y) + steps - 1) % season
+    return level[best] + damping * trend[best] + seasonal[best, season_idx]
+
+
+def _holt(y, horizon):
+    """Damped-trend Holt over the parameter grid at once"""
+    alpha, beta, phi = _grid(ALPHAS, BETAS, PHIS)
+    level = np.full(len(alpha), y[0])
+    trend = np.full(len(alpha), y[1] - y[0] if len(y) > 1 else 0.0)
+    sse = np.zeros(len(alpha))
+    for value in y[1:]:
+        error = value - (level + phi * trend)
+        sse += error * error
+        new_level = alpha * value + (1 - alpha) * (level + phi * trend)
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = new_level
+
+    best = np.argmin(sse)
+    damping = np.cumsum(phi[best] ** np.arange(1, horizon + 1))
+    return level[best] + damping * trend[best]
+
+
+def fit_series(y, horizon=DEFAULT_HORIZON, season=SEASON):
+    """Forecast one series. Returns (non-negative forecast, model name)"""
+    if np.count_nonzero(y) < MIN_ACTIVE_MONTHS or len(y) < 3:
+        return np.full(horizon, y[-season:].mean() if len(y) else 0.0), 'mean'
+    if len(y) >= 2 * season:
+        forecast, model = _holt_winters(y, horizon, season), 'holt_winters'
+    else:
+        forecast, model = _holt(y, horizon), 'holt'
+    return np.clip(forecast, 0, None), model
+
+
+def _fit_chunk(args):
+    Y, horizon = args
+    results = [fit_series(y, horizon) for y in Y]
+    return np.array([r[0] for r in results]).reshape(len(Y), horizon), [r[1] for r in results]
+
+
+def fit_all(Y, horizon=DEFAULT_HORIZON, workers=None, chunk_size=CHUNK_SIZE):
+    """Forecast every row of Y, in chunks on a process pool (one worker: in-process)"""
+    workers = workers or os.cpu_count() or 1
+    chunks = [(Y[start:start + chunk_size], horizon) for start in range(0, len(Y), chunk_size)]
+    if workers == 1 or len(chunks) == 1:
+        results = [_fit_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_fit_chunk, chunks))
+    forecasts = np.vstack([r[0] for r in results]) if results else np.empty((0, horizon))
+    models = [model for r in results for model in r[1]]
+    return forecasts, models
+
+
+# ========================
+# RECONCILIATION
+# ========================
+def reconcile(forecasts, history, nodes, method='top_down'):
+    """Make every node's forecast equal the sum of its children's.
+
+    top_down keeps the total's forecast and splits each parent across its
+    children in proportion to their own forecasts (by recent history when the
+    children all forecast zero). bottom_up sums the bottom series.
+    """
+    forecasts = forecasts.copy()
+    parents = nodes['parent'].to_numpy()
+    levels = nodes['level'].to_numpy()
+
+    if method == 'bottom_up':
+        for parent_level, child_level in reversed(list(zip(LEVELS, LEVELS[1:]))):
+            children = np.flatnonzero(levels == child_level)
+            forecasts[levels == parent_level] = 0
+            np.add.at(forecasts, parents[children], forecasts[children])
+        return forecasts
+
+    for child_level in LEVELS[1:]:
+        children = np.flatnonzero(levels == child_level)
+        parent_rows = parents[children]
+        child_sum = np.zeros_like(forecasts)
+        np.add.at(child_sum, parent_rows, forecasts[children])
+        child_sum = child_sum[parent_rows]
+
+        # Fallback shares: last season's actuals, else an even split
+        recent = history[children, -SEASON:].sum(axis=1)
+        recent_sum = np.bincount(parent_rows, weights=recent, minlength=len(nodes))[parent_rows]
+        siblings = np.bincount(parent_rows, minlength=len(nodes))[parent_rows]
+        fallback = np.where(recent_sum > 0, recent / np.maximum(recent_sum, 1e-12), 1.0 / siblings)
+
+        share = np.divide(forecasts[children], child_sum,
+                          out=np.repeat(fallback[:, None], forecasts.shape[1], axis=1), where=child_sum > 0)
+        forecasts[children] = share * forecasts[parent_rows]
+    return forecasts
+
+
+# ========================
+# PIPELINE
+# ========================
+def forecast_table(series, forecasts):
+    """Long actual + forecast table, one row per node and month"""
+    horizon = forecasts['orders'].shape[1]
+    if len(series.months):
+        future = pd.date_range(series.months[-1], periods=horizon + 1, freq='MS')[1:]
+    else:
+        future = pd.DatetimeIndex([])  # no history, so no dates to forecast
+    dates = series.months.append(future)
+    n_nodes, n_dates = len(series), len(dates)
+
+    table = pd.DataFrame({
+        col: pd.Categorical(np.repeat(series.nodes[col].to_numpy(), n_dates))
+        for col in ('level', 'category', 'state')
+    })
+    table['date'] = np.tile(dates.to_numpy(), n_nodes)
+    table['is_forecast'] = np.tile(np.arange(n_dates) >= len(series.months), n_nodes)
+    for measure in MEASURES:
+        table[measure] = np.hstack([getattr(series, measure), forecasts[measure][:, :len(future)]]).ravel()
+    return table
+
+
+def run_forecasts(horizon=DEFAULT_HORIZON, workers=None, method='top_down', tables=None):
+    """Sales -> reconciled forecast table. Returns (table, report)"""
+    timings = {}
+    start = time.perf_counter()
+    if tables is None:
+        refresh_snapshot()
+        tables = load_table('sales'), load_table('customers'), load_table('products')
+    series = SeriesSet.from_sales(*tables)
+    timings['series'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Y = np.vstack([series.orders, series.revenue])
+    fitted, models = fit_all(Y, horizon, workers)
+    timings['fit'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    forecasts = {}
+    for k, measure in enumerate(MEASURES):
+        rows = slice(k * len(series), (k + 1) * len(series))
+        forecasts[measure] = reconcile(fitted[rows], getattr(series, measure), series.nodes, method)
+    table = forecast_table(series, forecasts)
+    timings['reconcile'] = time.perf_counter() - start
+
+    report = {
+        'series': len(Y),
+        'bottom_series': int((series.nodes['level'] == 'category_state').sum()),
+        'months': len(series.months),
+        'models': pd.Series(models).value_counts().to_dict(),
+        'series_per_s': len(Y) / max(timings['fit'], 1e-9),
+        'timings': timings,
+    }
+    return table, report
+
+
+def write_forecasts(table, path=FORECAST_PATH):
+    """Atomically write the forecast Parquet table"""
+    with atomic_write(path) as tmp_path:
+        table.to_parquet(tmp_path, index=False)
+    return path
+
+
+def load_forecasts(path=FORECAST_PATH, legacy_path=LEGACY_FORECAST_PATH):
+    """The forecast table, or the notebook's total-only CSV in the same shape"""
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    legacy = pd.read_csv(legacy_path, parse_dates=['date'])
+    is_forecast = legacy['actual_orders'].isna()
+    return pd.DataFrame({
+        'level': 'total', 'category': ALL_LABEL, 'state': ALL_LABEL,
+        'date': legacy['date'],
+        'is_forecast': is_forecast,
+        'orders': legacy['actual_orders'].where(~is_forecast, legacy['forecasted_orders']),
+        'revenue': legacy['actual_revenue'].where(~is_forecast, legacy['forecasted_revenue']),
+    })
+
+
+def select_series(table, category=None, state=None):
+    """Monthly actual/forecast for a category and/or state (None = all).
+
+    Reconciled forecasts are coherent, so any slice is the sum of its bottom
+    series; the total-only table can only answer the unfiltered view.
+    """
+    if category is None and state is None:
+        rows = table[table['level'] == 'total']
+    else:
+        rows = table[table['level'] == 'category_state']
+        if category is not None:
+            rows = rows[rows['category'] == category]
+        if state is not None:
+            rows = rows[rows['state'] == state]
+    return rows.groupby(['date', 'is_forecast'], as_index=False)[list(MEASURES)].sum()
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Forecast every category x state series')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='months ahead')
+    parser.add_argument('--workers', type=int, default=None, help='process pool size (default: all cores)')
+    parser.add_argument('--reconcile', choices=['top_down', 'bottom_up'], default='top_down')
+    parser.add_argument('--compare-serial', action='store_true', help='also time the fits in-process')
+    args = parser.parse_args()
+
+    table, report = run_forecasts(args.horizon, args.workers, args.reconcile)
+    path = write_forecasts(table)
+
+    print(f"{report['series']:,} series ({report['bottom_series']:,} category x state, "
+          f"{report['months']} months) -> {path}")
+    for stage, seconds in report['timings'].items():
+        print(f"  {stage:<10} {seconds:8.3f}s")
+    print(f"  fits: {report['series_per_s']:,.0f} series/s  models {report['models']}")
+
+    if args.compare_serial:
+        _, serial = run_forecasts(args.horizon, 1, args.reconcile)
+        print(f"  serial fits: {serial['timings']['fit']:.3f}s  {serial['series_per_s']:,.0f} series/s")
+
+
+if __name__ == '__main__':
+    main()
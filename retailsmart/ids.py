@@ -0,0 +1,238 @@
+"""
+RetailSmart ID Interning
+========================
+customer_id, customer_unique_id, product_id and order_id are 32-character MD5
+hex strings. Held as Python objects they cost ~80 bytes per cell and make every
+merge hash strings. This module maps each of them to a dense int32 code.
+
+Each entity has one shared dictionary (sorted 16-byte binary keys), so the same
+product_id gets the same code in sales and products and joins run on integers.
+Codes decode back to hex for display. Missing or malformed IDs map to -1.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.paths import atomic_write
+
+KEY_DTYPE = np.dtype('V16')
+CODE_DTYPE = np.int32
+MISSING_CODE = -1
+
+# Entity -> the columns (in any table) that hold its IDs
+ENTITY_COLUMNS = {
+    'customer': ('customer_id',),
+    'customer_unique': ('customer_unique_id',),
+    'product': ('product_id',),
+    'order': ('order_id',),
+}
+
+
+# ========================
+# HEX <-> BINARY
+# ========================
+def hex_to_keys(values):
+    """Convert hex strings to 16-byte keys.
+
+    Returns (keys, valid) where valid flags the values that were 32-char hex.
+    """
+    values = pd.Series(values, copy=False)
+    if values.dtype != object:
+        values = values.astype(object)
+    valid = values.str.len().eq(32).to_numpy(dtype=bool)
+    keys = np.zeros(len(values), dtype=KEY_DTYPE)
+    if not valid.any():
+        return keys, valid
+
+    candidates = values.to_numpy(dtype=object)[valid]
+    try:
+        # One C-level conversion for the whole column
+        keys[valid] = np.frombuffer(bytes.fromhex(''.join(candidates)), dtype=KEY_DTYPE)
+    except ValueError:
+        # Some value is not hex: fall back to converting one by one
+        converted = np.zeros(len(candidates), dtype=KEY_DTYPE)
+        ok = np.ones(len(candidates), dtype=bool)
+        for i, value in enumerate(candidates):
+            try:
+                converted[i] = np.frombuffer(bytes.fromhex(value), dtype=KEY_DTYPE)[0]
+            except ValueError:
+                ok[i] = False
+        keys[valid] = converted
+        valid[np.flatnonzero(valid)[~ok]] = False
+    return keys, valid
+
+
+def keys_to_hex(keys):
+    """Convert 16-byte keys back to 32-char hex strings"""
+    blob = np.ascontiguousarray(keys).tobytes().hex()
+    return np.array([blob[i:i + 32] for i in range(0, len(blob), 32)], dtype=object)
+
+
+# ========================
+# DICTIONARIES
+# ========================
+class IdDictionary:
+    """Sorted unique 16-byte keys for one entity; a code is the key's position"""
+
+    def __init__(self, keys):
+        self.keys = keys
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a dictionary covering every valid ID in the given columns"""
+        parts = []
+        for column in columns:
+            keys, valid = hex_to_keys(column)
+            parts.append(keys[valid])
+        keys = np.unique(np.concatenate(parts)) if parts else np.zeros(0, dtype=KEY_DTYPE)
+        return cls(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes
+
+    def encode(self, values):
+        """Hex strings -> int32 codes (-1 for missing or unknown IDs)"""
+        return self.encode_keys(*hex_to_keys(values))
+
+    def encode_keys(self, keys, valid):
+        """16-byte keys -> int32 codes, honouring the validity mask"""
+        codes = np.full(len(keys), MISSING_CODE, dtype=CODE_DTYPE)
+        if len(self.keys) == 0 or not valid.any():
+            return codes
+
+        positions = np.searchsorted(self.keys, keys[valid])
+        positions = np.minimum(positions, len(self.keys) - 1)
+        found = self.keys[positions] == keys[valid]
+        codes[np.flatnonzero(valid)[found]] = positions[found]
+        return codes
+
+    def decode(self, codes):
+        """int32 codes -> hex strings (None for -1)"""
+        codes = np.asarray(codes)
+        out = np.full(len(codes), None, dtype=object)
+        present = codes >= 0
+        if present.any():
+            out[present] = keys_to_hex(self.keys[codes[present]])
+        return out
+
+
+class IdRegistry:
+    """One IdDictionary per entity, shared by every table"""
+
+    def __init__(self, dictionaries=None):
+        self.dictionaries = dict(dictionaries or {})
+
+    def column_entity(self, column):
+        """Entity owning a column name, or None"""
+        for entity, columns in ENTITY_COLUMNS.items():
+            if column in columns and entity in self.dictionaries:
+                return entity
+        return None
+
+    def encode(self, entity, values):
+        return self.dictionaries[entity].encode(values)
+
+    def decode(self, entity, codes):
+        return self.dictionaries[entity].decode(codes)
+
+    def decode_frame(self, df):
+        """Copy of df with interned ID columns turned back into hex, for display"""
+        out = df.copy()
+        for column in out.columns:
+            entity = self.column_entity(column)
+            if entity is not None and pd.api.types.is_integer_dtype(out[column]):
+                out[column] = self.decode(entity, out[column].to_numpy())
+        return out
+
+    def summary(self):
+        """Entity -> (distinct IDs, dictionary bytes)"""
+        return {entity: (len(d), d.nbytes) for entity, d in self.dictionaries.items()}
+
+
+# ========================
+# INTERNING
+# ========================
+def intern_tables(tables):
+    """Replace hex ID columns with shared int32 codes.
+
+    tables is a {name: DataFrame} mapping. Returns (interned_tables, registry);
+    the input frames are left untouched. Columns that do not hold clean hex IDs
+    are skipped rather than mangled.
+    """
+    registry = IdRegistry()
+    plan = {}
+
+    for entity, column_names in ENTITY_COLUMNS.items():
+        located = []
+        for name, df in tables.items():
+            for column in column_names:
+                if column not in df.columns:
+                    continue
+                series = df[column]
+                if not (series.dtype == object or isinstance(series.dtype, pd.CategoricalDtype)):
+                    continue
+                # Convert each column once and reuse the keys for both the
+                # dictionary build and the encoding
+                keys, valid = hex_to_keys(series)
+                present = series.notna().to_numpy()
+                if not valid.any() or (valid != present).any():
+                    continue
+                located.append((name, column, keys, valid))
+        if not located:
+            continue
+
+        dictionary = IdDictionary(np.unique(np.concatenate([keys[valid] for _, _, keys, valid in located])))
+        registry.dictionaries[entity] = dictionary
+        for name, column, keys, valid in located:
+            plan.setdefault(name, []).append((column, dictionary.encode_keys(keys, valid)))
+
+    interned = {}
+    for name, df in tables.items():
+        if name not in plan:
+            interned[name] = df
+            continue
+        df = df.copy(deep=False)
+        for column, codes in plan[name]:
+            df[column] = codes
+        interned[name] = df
+
+    return interned, registry
+
+
+def registry_file(directory, entity):
+    """.npy path of one entity's dictionary"""
+    return os.path.join(directory, f'{entity}.keys.npy')
+
+
+def save_registry(registry, directory):
+    """Persist each entity dictionary as a raw .npy of 16-byte keys.
+
+    Each file is swapped in whole, and dictionaries for entities the registry
+    no longer has are removed, so load_registry never picks up a stale one.
+    Tables and dictionaries that must match are best written to a fresh
+    directory (see snapshot.refresh_interned).
+    """
+    os.makedirs(directory, exist_ok=True)
+    for entity in ENTITY_COLUMNS:
+        path = registry_file(directory, entity)
+        if entity in registry.dictionaries:
+            with atomic_write(path, suffix='.tmp.npy') as tmp_path:
+                np.save(tmp_path, registry.dictionaries[entity].keys)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def load_registry(directory, mmap_mode=None):
+    """Load the dictionaries written by save_registry"""
+    dictionaries = {}
+    for entity in ENTITY_COLUMNS:
+        path = registry_file(directory, entity)
+        if os.path.exists(path):
+            dictionaries[entity] = IdDictionary(np.load(path, mmap_mode=mmap_mode))
+    return IdRegistry(dictionaries)
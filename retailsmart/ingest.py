@@ -0,0 +1,271 @@
+"""
+RetailSmart Streaming Ingest
+============================
+Applies the Phase 1 cleaning rules (P1 notebook / Data_Cleaning.sql) to the
+raw exports in Exported_files/raw data/ in bounded-size chunks and writes the
+Phase 1 cleaned CSVs directly, so raw files no longer have to fit in memory.
+
+Two passes per table:
+
+1. Statistics: the CSV is parsed once in chunks. Duplicate rows are dropped
+   using 64-bit row hashes in a HashedKeySet (8 bytes per distinct row);
+   medians for the fillna rules and Q1/Q3 for treat_outliers come from
+   reservoir quantile sketches (approximate, fixed size), with quartiles taken
+   after de-duplication as in the notebook. Each de-duplicated chunk is
+   spilled to a temporary Feather file.
+2. Cleaning: fill nulls -> cap outliers -> standardise text -> parse dates ->
+   derive fields, chunk by chunk from the spill, appended to the cleaned CSV
+   (written to a temp file and swapped in at the end). Each cleaned chunk is
+   also folded into the table's data-quality profile (retailsmart.profiling),
+   which is saved against the new file so later refreshes only read appends.
+
+Duplicates are judged on the raw rows rather than after the fills; the two only
+differ when a null fills to exactly the value of an otherwise identical row.
+Peak memory is one chunk plus the sketches and the key set, independent of
+file size otherwise. Every column is read with a declared type (numbers as
+float64, the rest as text), so rows hash and the cleaned CSV serialises the
+same whatever --chunk-rows is. Number columns that hold only whole values,
+with no nulls, across the whole file are written back as integers, as the
+notebook's int64 columns are.
+
+Usage:
+    python -m retailsmart.ingest                          # every raw file present
+    python -m retailsmart.ingest --tables sales marketing --chunk-rows 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.paths import TABLES, atomic_write, cleaned_file, raw_file
+from retailsmart.profiling import TableProfile, save_profile
+from retailsmart.sketches import DEFAULT_SAMPLE_SIZE, HashedKeySet, ReservoirQuantiles, row_hashes
+from retailsmart.snapshot import TABLE_DTYPES, source_watermark
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+
+# Per-table rules from the P1 notebook
+CONSTANT_FILLS = {
+    'customers': {'total_orders': 0, 'total_spent': 0, 'last_order': 'unknown'},
+    'products': {'category_english': 'unknown'},
+    'sales': {'category_english': 'unknown', 'payment_type': 'unknown'},
+    'marketing': {},
+    'reviews': {'review_comment_message': ''},
+}
+MEDIAN_FILLS = {
+    'customers': ['days_since_last_order'],
+    'products': ['product_name_lenght', 'product_description_lenght', 'product_photos_qty'],
+    'sales': ['payment_value'],
+    'marketing': [],
+    'reviews': [],
+}
+DEDUP_TABLES = ('sales', 'marketing')
+OUTLIER_COLUMNS = {'sales': ['price', 'total_price'], 'marketing': ['spend']}
+DATE_COLUMNS = {'sales': ['order_purchase_timestamp', 'order_delivered_customer_date'], 'marketing': ['start_date']}
+
+SPEND_BINS = [0, 2000, 4000, 6000, 8000, np.inf]
+SPEND_LABELS = ['0-2K', '2-4K', '4-6K', '6-8K', '8K+']
+
+
+def raw_dtypes(table, path):
+    """Read dtype for every column of a raw file, from the snapshot's declared schema.
+
+    Each chunk would otherwise infer its own types: an integer column with a
+    null parses as float in that chunk only, which changes its row hashes
+    (missing duplicates across chunks) and its text in the cleaned CSV. So
+    declared numbers are always float64 and everything else is text.
+    """
+    declared = TABLE_DTYPES[table]
+    header = pd.read_csv(path, nrows=0).columns
+    return {col: str if declared.get(col, str) in (str, 'category') else np.float64 for col in header}
+
+
+def read_chunks(table, path, chunk_rows):
+    return pd.read_csv(path, dtype=raw_dtypes(table, path), chunksize=chunk_rows, low_memory=False)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ========================
+# PASS 1: STATISTICS
+# ========================
+def collect_stats(table, path, spill_dir, chunk_rows=DEFAULT_CHUNK_ROWS, sample_size=DEFAULT_SAMPLE_SIZE):
+    """Medians and IQR caps for a table, spilling de-duplicated chunks to spill_dir"""
+    medians = {col: ReservoirQuantiles(sample_size) for col in MEDIAN_FILLS[table]}
+    quartiles = {col: ReservoirQuantiles(sample_size) for col in OUTLIER_COLUMNS.get(table, [])}
+    purchase_dates = ReservoirQuantiles(sample_size) if table == 'sales' else None
+    seen = HashedKeySet() if table in DEDUP_TABLES else None
+    integral = None
+    rows_in = 0
+    spilled = []
+
+    for i, chunk in enumerate(read_chunks(table, path, chunk_rows)):
+        rows_in += len(chunk)
+        if integral is None:
+            integral = dict.fromkeys(chunk.select_dtypes('number').columns, True)
+        for col in integral:
+            values = chunk[col].to_numpy()
+            integral[col] = integral[col] and bool(np.all(np.floor(values) == values))
+        # Medians for fillna are taken before de-duplication (notebook order)
+        for col, sketch in medians.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col].to_numpy(dtype=np.float64, na_value=np.nan))
+
+        if seen is not None:
+            chunk = chunk[seen.add_new(row_hashes(chunk))]
+        for col, sketch in quartiles.items():
+            if col in chunk.columns:
+                sketch.update(chunk[col].to_numpy(dtype=np.float64, na_value=np.nan))
+        if purchase_dates is not None and 'order_purchase_timestamp' in chunk.columns:
+            stamps = pd.to_datetime(chunk['order_purchase_timestamp'], errors='coerce')
+            purchase_dates.update(stamps[stamps.notna()].astype('int64').to_numpy())
+
+        spill_path = os.path.join(spill_dir, f'{i:06d}.feather')
+        chunk.reset_index(drop=True).to_feather(spill_path)
+        spilled.append(spill_path)
+
+    stats = {
+        'medians': {col: sketch.median() for col, sketch in medians.items()},
+        'caps': {},
+        # Whole numbers with no nulls throughout: pandas would have read these
+        # as int64, so they are written back without a trailing .0
+        'integral': [col for col, whole in (integral or {}).items() if whole],
+        'rows_in': rows_in,
+        'spilled': spilled,
+        'dedup_keys_mb': seen.nbytes / 1e6 if seen is not None else 0,
+    }
+    for col, sketch in quartiles.items():
+        q1, q3 = sketch.quantile([0.25, 0.75])
+        iqr = q3 - q1
+        stats['caps'][col] = (q1 - 1.5 * iqr, q3 + 1.5 * iqr)
+    if purchase_dates is not None and purchase_dates.count:
+        stats['purchase_median'] = pd.Timestamp(int(purchase_dates.median()))
+    return stats
+
+
+# ========================
+# PASS 2: CLEANING
+# ========================
+def clean_chunk(table, chunk, stats):
+    """Apply the Phase 1 rules (after de-duplication) to one chunk"""
+    if table == 'customers':
+        if 'customer_city' in chunk.columns:
+            chunk = chunk.drop(columns=['city'], errors='ignore')
+        chunk = chunk.rename(columns={'customer_city': 'city', 'customer_state': 'state'})
+
+    fills = {col: value for col, value in CONSTANT_FILLS[table].items() if col in chunk.columns}
+    fills.update({col: value for col, value in stats['medians'].items() if col in chunk.columns})
+    chunk = chunk.fillna(fills)
+
+    for col, (lower, upper) in stats['caps'].items():
+        if col in chunk.columns:
+            chunk[col] = chunk[col].astype(np.float64).clip(lower, upper)
+
+    if table == 'customers':
+        chunk['city'] = chunk['city'].str.title()
+        chunk['state'] = chunk['state'].str.upper()
+    elif table == 'marketing':
+        chunk['channel'] = chunk['channel'].str.lower().str.strip()
+
+    for col in DATE_COLUMNS.get(table, []):
+        if col in chunk.columns:
+            chunk[col] = pd.to_datetime(chunk[col], errors='coerce')
+
+    if table == 'sales':
+        if 'purchase_median' in stats:
+            chunk['order_purchase_timestamp'] = chunk['order_purchase_timestamp'].fillna(stats['purchase_median'])
+        chunk['order_delivered_customer_date'] = chunk['order_delivered_customer_date'].astype(object).fillna('Not delivered')
+        chunk['year'] = chunk['order_purchase_timestamp'].dt.year
+        chunk['month'] = chunk['order_purchase_timestamp'].dt.month
+        chunk['weekday'] = chunk['order_purchase_timestamp'].dt.weekday
+    elif table == 'marketing':
+        chunk['spend_band'] = pd.cut(chunk['spend'], bins=SPEND_BINS, labels=SPEND_LABELS)
+
+    # Capped columns stay float, as clip() leaves them in the notebook
+    whole = [col for col in stats['integral']
+             if col in chunk.columns and col not in stats['caps'] and chunk[col].notna().all()]
+    return chunk.astype(dict.fromkeys(whole, np.int64))
+
+
+def ingest_table(table, path=None, out_path=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 sample_size=DEFAULT_SAMPLE_SIZE):
+    """Stream one raw table into its cleaned CSV; returns a report dict"""
+    path = path or raw_file(table)
+    out_path = out_path or cleaned_file(table)
+    start = time.perf_counter()
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    rows_out = 0
+    profile = TableProfile(table)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(out_path)) as spill_dir:
+        stats = collect_stats(table, path, spill_dir, chunk_rows, sample_size)
+        with atomic_write(out_path) as tmp_path, open(tmp_path, 'w', newline='') as out:
+            for i, spill_path in enumerate(stats['spilled']):
+                cleaned = clean_chunk(table, pd.read_feather(spill_path), stats)
+                rows_out += len(cleaned)
+                cleaned.to_csv(out, index=False, header=(i == 0))
+                profile.update(cleaned)
+                os.remove(spill_path)
+    profile.watermark = source_watermark(out_path, rows_out)
+    save_profile(profile)
+    rows_in = stats['rows_in']
+
+    elapsed = time.perf_counter() - start
+    return {
+        'table': table,
+        'rows_in': rows_in,
+        'rows_out': rows_out,
+        'duplicates': rows_in - rows_out,
+        'seconds': elapsed,
+        'rows_per_s': rows_in / elapsed if elapsed > 0 else 0,
+        'caps': stats['caps'],
+        'dedup_keys_mb': stats['dedup_keys_mb'],
+        'output': out_path,
+    }
+
+
+def ingest_all(tables=None, chunk_rows=DEFAULT_CHUNK_ROWS, sample_size=DEFAULT_SAMPLE_SIZE):
+    """Ingest every requested raw table that exists; returns a list of reports"""
+    tables = tables or [t for t in TABLES if os.path.exists(raw_file(t))]
+    return [ingest_table(t, chunk_rows=chunk_rows, sample_size=sample_size) for t in tables]
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Stream raw exports into the Phase 1 cleaned CSVs')
+    parser.add_argument('--tables', nargs='+', choices=TABLES, help='default: every raw file present')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--sample-size', type=int, default=DEFAULT_SAMPLE_SIZE, help='quantile sketch size')
+    args = parser.parse_args()
+
+    reports = ingest_all(args.tables, args.chunk_rows, args.sample_size)
+    if not reports:
+        print("No raw files found")
+        return
+    for r in reports:
+        print(f"{r['table']:<10} {r['rows_in']:>11,} rows in  {r['rows_out']:>11,} out  "
+              f"{r['duplicates']:>8,} dups  {r['seconds']:7.2f}s  {r['rows_per_s']:>10,.0f} rows/s")
+    peak = peak_rss_mb()
+    if peak is not None:
+        print(f"Peak RSS: {peak:,.0f} MB (chunk size {args.chunk_rows:,} rows)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""
+Hot-Path Instrumentation
+========================
+Timing spans for the dashboard's loaders, analysis functions and chart
+builders, aggregated across every session of the server process.
+
+- span('name') is a context manager, timed('name') the decorator form.
+  Spans nest; each records its parent, so a render breaks down into stages.
+- Durations go into a bounded ring buffer per stage (the last
+  RETAILSMART_SPAN_WINDOW, default 2000), from which stage_summary() reports
+  p50/p90/p99. A span costs under 10 µs (two perf_counter calls, a lock,
+  two appends), so it is on by default.
+- RETAILSMART_TRACE_MEMORY=rss adds the process RSS at the end of each span;
+  =tracemalloc also records each span's Python allocation peak. tracemalloc
+  slows allocation-heavy code down noticeably, so it is for investigations,
+  not production.
+- Spans are appended to Exported_files/Metrics/spans.jsonl in batches (every
+  256 spans or 10 s) by a background writer thread, so request threads never
+  wait on the file; whatever is left is written at exit. Past
+  RETAILSMART_SPANS_MB (default 64) the file is rotated to spans.jsonl.1,
+  so the two never hold much more than twice that. A forked worker starts
+  with an empty buffer rather than re-writing its parent's spans. Recorders
+  built with spans_path=None keep only the in-memory percentiles.
+- After export_prometheus(), each batch also rewrites
+  Exported_files/Metrics/retailsmart.prom with the summaries in Prometheus
+  text exposition format, for a node-exporter textfile collector. Only the
+  dashboard turns this on, so CLI runs never overwrite the server's file.
+- RETAILSMART_METRICS=0 turns recording off entirely.
+
+Usage:
+    @timed('load.scores')
+    def load_scores(): ...
+
+    with span('render'):
+        ...
+    print(stage_summary())
+"""
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.paths import EXPORT_DIR, atomic_write
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+METRICS_DIR = os.path.join(EXPORT_DIR, 'Metrics')
+SPANS_PATH = os.path.join(METRICS_DIR, 'spans.jsonl')
+PROMETHEUS_PATH = os.path.join(METRICS_DIR, 'retailsmart.prom')
+
+ENABLED = os.environ.get('RETAILSMART_METRICS', '1') != '0'
+MEMORY_MODE = os.environ.get('RETAILSMART_TRACE_MEMORY', '')     # '', 'rss' or 'tracemalloc'
+WINDOW = int(os.environ.get('RETAILSMART_SPAN_WINDOW', 2000))
+FLUSH_EVERY = 256           # spans buffered before an append to spans.jsonl
+FLUSH_SECONDS = 10.0        # ... or this long since the last append
+SPANS_MAX_BYTES = int(float(os.environ.get('RETAILSMART_SPANS_MB', 64)) * 2 ** 20)
+QUANTILES = (0.5, 0.9, 0.99)
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Resident set size in bytes (peak RSS where /proc is unavailable, else None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        if resource is None:
+            return None
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ========================
+# RECORDER
+# ========================
+_RECORDERS = weakref.WeakSet()     # reset in forked children
+
+
+class Recorder:
+    """Thread-safe per-stage span store with a JSONL sink"""
+
+    def __init__(self, window=WINDOW, spans_path=SPANS_PATH, prometheus_path=None, memory=MEMORY_MODE,
+                 max_bytes=SPANS_MAX_BYTES):
+        self.window = window
+        self.spans_path = spans_path
+        self.prometheus_path = prometheus_path
+        self.memory = memory
+        self.max_bytes = max_bytes
+        self._durations = defaultdict(lambda: deque(maxlen=self.window))
+        self._memory = defaultdict(lambda: deque(maxlen=self.window))
+        self._totals = defaultdict(lambda: [0, 0.0])      # stage -> [count, seconds], never windowed
+        self._local = threading.local()
+        self._after_fork()
+        _RECORDERS.add(self)
+        if memory == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _after_fork(self):
+        """Fresh buffer, locks and writer (a forked child inherits none of the parent's threads)"""
+        self._pending = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+
+    def _start_writer(self):
+        """Start the background writer and the exit flush; called under _lock"""
+        self._writer = threading.Thread(target=self._write_loop, args=(weakref.ref(self),),
+                                        name='retailsmart-spans', daemon=True)
+        self._writer.start()
+        atexit.register(_flush_at_exit, weakref.ref(self))
+
+    @staticmethod
+    def _write_loop(ref):
+        while True:
+            recorder = ref()
+            if recorder is None:
+                return
+            wake = recorder._wake
+            del recorder
+            wake.wait(FLUSH_SECONDS)
+            wake.clear()
+            recorder = ref()
+            if recorder is None:
+                return
+            recorder.flush()
+            del recorder
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **attrs):
+        return _Span(self, name, attrs)
+
+    def record(self, name, parent, start_wall, seconds, memory_bytes=None, attrs=None):
+        event = {'stage': name, 'parent': parent, 'start': round(start_wall, 6),
+                 'ms': round(seconds * 1e3, 3), 'thread': threading.current_thread().name}
+        if memory_bytes is not None:
+            event['memory_bytes'] = memory_bytes
+        if attrs:
+            event.update(attrs)
+        with self._lock:
+            self._durations[name].append(seconds)
+            totals = self._totals[name]
+            totals[0] += 1
+            totals[1] += seconds
+            if memory_bytes is not None:
+                self._memory[name].append(memory_bytes)
+            if self.spans_path:
+                self._pending.append(event)
+                if self._writer is None:
+                    self._start_writer()
+                if len(self._pending) >= FLUSH_EVERY:
+                    self._wake.set()
+
+    def flush(self):
+        """Append buffered spans to the JSONL file and refresh the Prometheus textfile"""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            try:
+                if pending:
+                    self._append(pending)
+                if self.prometheus_path:
+                    self.write_prometheus(self.prometheus_path)
+            except OSError:
+                pass  # metrics must never take the dashboard down
+
+    def _append(self, events):
+        """Append to spans.jsonl, first rotating it to spans.jsonl.1 once past max_bytes"""
+        os.makedirs(os.path.dirname(self.spans_path), exist_ok=True)
+        try:
+            full = os.path.getsize(self.spans_path) >= self.max_bytes
+        except OSError:
+            full = False
+        if full:
+            os.replace(self.spans_path, self.spans_path + '.1')
+        with open(self.spans_path, 'a') as f:
+            f.write(''.join(json.dumps(event) + '\n' for event in events))
+
+    def summary(self):
+        """One row per stage: window percentiles in ms, lifetime count and total"""
+        with self._lock:
+            stages = {name: (np.array(d), self._totals[name], np.array(self._memory.get(name, ())))
+                      for name, d in self._durations.items()}
+        rows = []
+        for name, (durations, (count, total), memory) in sorted(stages.items()):
+            p50, p90, p99 = np.quantile(durations, QUANTILES) * 1e3
+            row = {'stage': name, 'count': count, 'p50_ms': p50, 'p90_ms': p90, 'p99_ms': p99,
+                   'max_ms': durations.max() * 1e3, 'total_s': total}
+            if len(memory):
+                row['memory_mb_p90'] = np.quantile(memory, 0.9) / 2 ** 20
+            rows.append(row)
+        return pd.DataFrame(rows, columns=['stage', 'count', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'total_s']
+                            + (['memory_mb_p90'] if self.memory else []))
+
+    def prometheus_text(self):
+        """Stage summaries in Prometheus text exposition format"""
+        summary = self.summary()
+        lines = ['# HELP retailsmart_stage_seconds Dashboard stage latency',
+                 '# TYPE retailsmart_stage_seconds summary']
+        for row in summary.itertuples(index=False):
+            label = row.stage.replace('\\', '\\\\').replace('"', '\\"')
+            for q, value in zip(QUANTILES, (row.p50_ms, row.p90_ms, row.p99_ms)):
+                lines.append(f'retailsmart_stage_seconds{{stage="{label}",quantile="{q}"}} {value / 1e3:.6f}')
+            lines.append(f'retailsmart_stage_seconds_sum{{stage="{label}"}} {row.total_s:.6f}')
+            lines.append(f'retailsmart_stage_seconds_count{{stage="{label}"}} {row.count}')
+        rss = current_rss() if self.memory else None
+        if rss is not None:
+            lines += ['# HELP retailsmart_process_resident_bytes Resident set size',
+                      '# TYPE retailsmart_process_resident_bytes gauge',
+                      f'retailsmart_process_resident_bytes {rss}']
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path=PROMETHEUS_PATH):
+        """Atomically rewrite the Prometheus textfile"""
+        with atomic_write(path) as tmp_path, open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._memory.clear()
+            self._totals.clear()
+            self._pending = []
+
+
+class _Span:
+    __slots__ = ('recorder', 'name', 'attrs', 'start', 'start_wall', 'parent', 'traced')
+
+    def __init__(self, recorder, name, attrs):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self.traced = self.recorder.memory == 'tracemalloc' and tracemalloc.is_tracing()
+        if self.traced:
+            tracemalloc.reset_peak()
+        self.start_wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.recorder._stack().pop()
+        memory_bytes = None
+        if self.traced:
+            memory_bytes = tracemalloc.get_traced_memory()[1]
+        elif self.recorder.memory == 'rss':
+            memory_bytes = current_rss()
+        attrs = dict(self.attrs, error=exc[0].__name__) if exc[0] is not None else self.attrs
+        self.recorder.record(self.name, self.parent, self.start_wall, seconds, memory_bytes, attrs)
+        return False
+
+
+def _flush_at_exit(ref):
+    recorder = ref()
+    if recorder is not None:
+        recorder.flush()
+
+
+def _reset_after_fork():
+    for recorder in list(_RECORDERS):
+        recorder._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+RECORDER = Recorder()
+_NULL_SPAN = _NullSpan()
+
+
+# ========================
+# PUBLIC API
+# ========================
+def span(name, **attrs):
+    """Time a block as stage `name`; attrs are written to the JSONL record"""
+    return RECORDER.span(name, **attrs) if ENABLED else _NULL_SPAN
+
+
+def timed(name=None):
+    """Decorator form of span; the stage defaults to the function's name"""
+    def decorate(func):
+        stage = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def stage_summary():
+    """Per-stage latency percentiles across every session of this process"""
+    return RECORDER.summary()
+
+
+def export_prometheus(path=PROMETHEUS_PATH):
+    """Rewrite the Prometheus textfile on every flush from now on"""
+    RECORDER.prometheus_path = path
+
+
+def flush():
+    """Write buffered spans (and the Prometheus textfile, if exported) now"""
+    if ENABLED:
+        RECORDER.flush()
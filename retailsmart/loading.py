@@ -0,0 +1,65 @@
+"""
+Concurrent Artifact Loading
+===========================
+Runs independent loaders (file reads, unpickling, Parquet decoding) on a
+thread pool and records how long each took. Most of that work releases the
+GIL in pyarrow, numpy or the OS, so a cold start costs roughly the slowest
+artifact rather than the sum of all of them.
+
+Loaders raise on failure; the error is returned with the result instead of
+being swallowed, so the caller decides how to report it.
+
+Usage:
+    results = load_concurrently({'scores': load_scores, 'rules': load_rules})
+    scores = results['scores'].value        # None if results['scores'].error
+    print(timings_frame(results))
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+DEFAULT_WORKERS = 8
+
+
+class LoadResult:
+    """Outcome of one loader: value or error, and wall time"""
+
+    def __init__(self, value=None, error=None, seconds=0.0):
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def timed_load(loader):
+    """Call loader() and wrap its value or exception in a LoadResult"""
+    start = time.perf_counter()
+    try:
+        return LoadResult(value=loader(), seconds=time.perf_counter() - start)
+    except Exception as e:
+        return LoadResult(error=e, seconds=time.perf_counter() - start)
+
+
+def load_concurrently(loaders, workers=DEFAULT_WORKERS, initializer=None):
+    """Run {name: zero-argument loader} concurrently. Returns {name: LoadResult}.
+
+    initializer runs once in each worker thread (e.g. to attach a framework's
+    per-thread context before the loaders use it).
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(loaders))), initializer=initializer) as pool:
+        futures = {name: pool.submit(timed_load, loader) for name, loader in loaders.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def timings_frame(results):
+    """One row per artifact: seconds and status"""
+    return pd.DataFrame({
+        'artifact': list(results),
+        'seconds': [r.seconds for r in results.values()],
+        'status': ['ok' if r.ok else f'missing ({type(r.error).__name__})' for r in results.values()],
+    })
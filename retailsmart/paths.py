@@ -0,0 +1,136 @@
+"""
+Project Paths
+=============
+Single place for every file location used by the dashboard and the tooling.
+Set RETAILSMART_ROOT to point the whole project at another checkout or data drop.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+PROJECT_ROOT = os.environ.get(
+    'RETAILSMART_ROOT',
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+DATASETS_DIR = os.path.join(PROJECT_ROOT, 'Datasets')
+EXPORT_DIR = os.path.join(PROJECT_ROOT, 'Exported_files')
+
+RAW_DATA_DIR = os.path.join(EXPORT_DIR, 'raw data')
+PHASE1_DIR = os.path.join(EXPORT_DIR, 'Phase-1')
+PHASE1_CLEANED_DIR = os.path.join(PHASE1_DIR, 'Cleaned Files')
+SQLITE_DIR = os.path.join(PHASE1_DIR, 'Sqlite_files')
+PHASE2_DIR = os.path.join(EXPORT_DIR, 'Phase-2')
+PHASE2_MODELS_DIR = os.path.join(PHASE2_DIR, 'Models')
+PHASE2_SCORES_DIR = os.path.join(PHASE2_DIR, 'Scores')
+PHASE3_DIR = os.path.join(EXPORT_DIR, 'Phase-3')
+PHASE3_OUTPUTS_DIR = os.path.join(PHASE3_DIR, 'data outputs')
+PHASE3_MODELS_DIR = os.path.join(PHASE3_DIR, 'Models')
+
+SNAPSHOT_DIR = os.path.join(EXPORT_DIR, 'Snapshots')
+FEATURES_DIR = os.path.join(EXPORT_DIR, 'Features')
+PROFILES_DIR = os.path.join(EXPORT_DIR, 'Profiles')
+PIPELINE_DIR = os.path.join(EXPORT_DIR, 'Pipeline')
+# Published for multi-process serving; point it at /dev/shm to keep it in RAM
+SHARED_DIR = os.environ.get('RETAILSMART_SHARED_DIR', os.path.join(EXPORT_DIR, 'Shared'))
+
+TABLES = ('customers', 'sales', 'products', 'marketing', 'reviews')
+
+# mkstemp creates files readable by their owner only; written artifacts get
+# the usual umask-based mode instead. Read once, at import.
+_UMASK = os.umask(0o022)
+os.umask(_UMASK)
+
+
+def cleaned_file(table):
+    """Phase 1 cleaned CSV for a table"""
+    return os.path.join(PHASE1_CLEANED_DIR, f'{table}_cleaned.csv')
+
+
+def raw_file(table):
+    """Raw export under Exported_files/raw data/ for a table"""
+    return os.path.join(RAW_DATA_DIR, f'{table}.csv')
+
+
+def dataset_file(table):
+    """Raw Datasets/ CSV for a table"""
+    return os.path.join(DATASETS_DIR, f'{table}.csv')
+
+
+# ========================
+# ATOMIC WRITES / LOCKS
+# ========================
+def temp_path(path, suffix='.tmp'):
+    """Unique temp file next to path, to be written and then os.replace'd onto it.
+
+    Every writer gets its own file, so a dashboard refresh and a pipeline run
+    building the same artifact can never swap in each other's half-written one.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=suffix, prefix=os.path.basename(path) + '.', dir=directory)
+    os.close(fd)
+    os.chmod(tmp_path, 0o666 & ~_UMASK)
+    return tmp_path
+
+
+def temp_dir(path):
+    """Unique new directory named after path, to be filled and then published.
+
+    Used for layers of several files that must change together: readers follow
+    a pointer file, which is switched to the new directory in one os.replace.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    created = tempfile.mkdtemp(prefix=os.path.basename(path) + '.', dir=directory)
+    os.chmod(created, 0o777 & ~_UMASK)
+    return created
+
+
+@contextmanager
+def atomic_write(path, suffix='.tmp'):
+    """Yield a temp_path for path; replace path with it on success, remove it on error"""
+    tmp_path = temp_path(path, suffix)
+    try:
+        yield tmp_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path (created if missing) for the block.
+
+    For read-modify-write cycles that must not interleave across processes,
+    e.g. a dashboard refresh and a pipeline run folding the same delta.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # gave up after ~10s; keep waiting
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
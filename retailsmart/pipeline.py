@@ -0,0 +1,396 @@
+"""
+RetailSmart Precompute Pipeline
+===============================
+One command that materialises every dashboard artifact ahead of time, so the
+Streamlit app only has to read files: cleaned tables, snapshots, the RFM
+store, the daily cube and data-quality profiles, the SQLite store, churn/CLV
+scores, segments, basket rules, forecasts, campaign attribution and cohort
+retention.
+
+- Stages form a DAG. A stage's key is the SHA-256 of its name, code version,
+  parameters and the contents of its input files (upstream outputs included). A stage whose
+  key matches the last successful run and whose outputs still exist is
+  skipped, so editing one source only reruns what depends on it.
+- File hashes are cached by (size, mtime) in the manifest, so unchanged
+  inputs are not re-read.
+- Stages whose dependencies are done run in parallel on a process pool.
+- Exported_files/Pipeline/manifest.json records, per stage, its key, a short
+  version, the SHA-256 of every output, wall time and a summary. The
+  pipeline_version over all stages is what the dashboard keys its caches on.
+
+Usage:
+    python -m retailsmart.pipeline                         # run what changed
+    python -m retailsmart.pipeline --dry-run               # show the plan
+    python -m retailsmart.pipeline --only forecasting      # a stage and its upstream
+    python -m retailsmart.pipeline --force scoring --workers 2
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import pandas as pd
+
+from retailsmart import (basket, campaigns, cohorts, features, forecasting, ingest, profiling, scoring,
+                         segmentation, snapshot, sqlite_store)
+from retailsmart.cube import DailyCube
+from retailsmart.paths import PHASE2_MODELS_DIR, PIPELINE_DIR, TABLES, atomic_write, cleaned_file, raw_file
+
+MANIFEST_PATH = os.path.join(PIPELINE_DIR, 'manifest.json')
+CUBE_PATH = os.path.join(PIPELINE_DIR, 'daily_cube.npz')
+
+SCHEMA_VERSION = 1
+MODEL_FILES = ['best_churn_model.pkl', 'clv_model.pkl', 'scaler.pkl', 'label_encoder.pkl', 'feature_metadata.pkl']
+
+
+# ========================
+# STAGE FUNCTIONS
+# ========================
+# Module-level so they can be sent to the process pool. Each returns a small
+# JSON-serialisable summary for the manifest; force also bypasses the
+# module's own freshness check (snapshot, SQLite, RFM store, segment model).
+def _raw_tables():
+    return [t for t in TABLES if os.path.exists(raw_file(t))]
+
+
+def run_ingest(force=False):
+    reports = ingest.ingest_all()
+    return {r['table']: {'rows_in': int(r['rows_in']), 'rows_out': int(r['rows_out'])} for r in reports}
+
+
+def run_snapshot(force=False):
+    kind, rebuilt = snapshot.refresh_snapshot(force)
+    snapshot.refresh_interned(force)
+    return {'source': kind, 'rebuilt': [table for table, done in rebuilt.items() if done]}
+
+
+def run_features(force=False):
+    store, report = features.refresh_store(rebuild=force)
+    return {'customers': len(store), **{k: int(v) for k, v in report.items()}}
+
+
+def run_quality(force=False):
+    """Fold appended source rows into the data-quality profiles, the dashboard's data-quality panel"""
+    report = profiling.refresh_profiles(force)
+    return {table: {'rows_folded': int(entry['rows_folded']), 'rebuilt': bool(entry['rebuilt'])}
+            for table, entry in report.items()}
+
+
+def run_cube(force=False):
+    cube = DailyCube.from_sales(snapshot.load_table('sales'), snapshot.load_table('products'))
+    cube.save(CUBE_PATH, version=snapshot.snapshot_version())
+    return {'days': len(cube.days), 'categories': len(cube.categories), 'mb': round(cube.nbytes / 1e6, 1)}
+
+
+def run_sqlite(force=False):
+    rebuilt = sqlite_store.refresh_database(force)
+    return {'rebuilt': bool(rebuilt), 'duplicate_keys': sqlite_store.duplicate_keys()}
+
+
+def run_scoring(force=False):
+    scores, timings = scoring.score_customers()
+    scoring.write_scores(scores)
+    return {'customers': len(scores), 'seconds': round(sum(timings.values()), 3)}
+
+
+def run_segmentation(force=False):
+    assignments, _, report = segmentation.segment_customers(refit=force)
+    return {'customers': len(assignments), 'k': int(report['k']), 'assigned': int(report['assigned']),
+            'incremental': bool(report['incremental'])}
+
+
+def run_basket(force=False):
+    sales, products = snapshot.load_table('sales'), snapshot.load_table('products')
+    summary = {}
+    for level in basket.LEVEL_COLUMNS:
+        rules, _ = basket.mine_rules(sales, level, products)
+        basket.write_rules(rules, level)
+        summary[level] = len(rules)
+    return summary
+
+
+def run_campaigns(force=False):
+    cube, report = campaigns.build_cube()
+    return {'touches': report['touches'], 'months': len(cube.months), 'seconds': round(report['seconds'], 3)}
+
+
+def run_cohorts(force=False):
+    matrix, report = cohorts.build_matrix()
+    return {'cohorts': len(matrix.months), 'orders': report['orders'], 'seconds': round(report['seconds'], 3)}
+
+
+def run_forecasting(force=False):
+    table, report = forecasting.run_forecasts()
+    forecasting.write_forecasts(table)
+    return {'series': report['series'], 'series_per_s': round(report['series_per_s'])}
+
+
+# ========================
+# DAG
+# ========================
+def _snapshot_files(*tables):
+    return [snapshot.snapshot_file(t) for t in tables or TABLES]
+
+
+def _interned_files():
+    directory = snapshot.current_interned_dir()
+    return [snapshot.interned_file(t, directory) for t in TABLES] + [snapshot.INTERNED_CURRENT_PATH]
+
+
+class Stage:
+    """A named step: dependencies, a run function, and its input/output files.
+
+    inputs and outputs are callables so paths that depend on upstream results
+    (e.g. which source CSVs the snapshot resolves to) are read at run time.
+    version is part of the key: bump it when a code change alters what the
+    stage writes, so existing outputs are rebuilt instead of reused.
+    """
+
+    def __init__(self, name, deps, run, inputs, outputs, params=None, version=1):
+        self.name = name
+        self.deps = deps
+        self.run = run
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.version = version
+
+
+STAGES = [
+    Stage('ingest', [], run_ingest,
+          inputs=lambda: [raw_file(t) for t in _raw_tables()],
+          outputs=lambda: [cleaned_file(t) for t in _raw_tables()],
+          params={'chunk_rows': ingest.DEFAULT_CHUNK_ROWS}),
+    Stage('snapshot', ['ingest'], run_snapshot,
+          inputs=lambda: sorted(snapshot.resolve_sources()[1].values()),
+          outputs=lambda: _snapshot_files() + _interned_files()),
+    Stage('features', ['snapshot'], run_features,
+          inputs=lambda: _snapshot_files('customers', 'sales', 'marketing'),
+          outputs=lambda: [features.STORE_PATH]),
+    Stage('quality', ['ingest'], run_quality,
+          inputs=lambda: sorted(snapshot.resolve_sources()[1].values()),
+          outputs=lambda: [profiling.profile_path(t) for t in TABLES]),
+    Stage('cube', ['snapshot'], run_cube,
+          inputs=lambda: _snapshot_files('sales', 'products'),
+          outputs=lambda: [CUBE_PATH]),
+    Stage('sqlite', ['snapshot'], run_sqlite,
+          inputs=lambda: _snapshot_files(),
+          outputs=lambda: [sqlite_store.DB_PATH]),
+    Stage('scoring', ['snapshot', 'features'], run_scoring,
+          inputs=lambda: _interned_files() + [features.STORE_PATH]
+          + [os.path.join(PHASE2_MODELS_DIR, name) for name in MODEL_FILES],
+          outputs=lambda: [scoring.SCORES_PATH]),
+    Stage('segmentation', ['snapshot', 'features'], run_segmentation,
+          inputs=lambda: _snapshot_files('customers') + [features.STORE_PATH],
+          outputs=lambda: [segmentation.ASSIGNMENTS_PATH, segmentation.SUMMARY_PATH, segmentation.MODEL_PATH]),
+    Stage('basket', ['snapshot'], run_basket,
+          inputs=lambda: _snapshot_files('sales', 'products'),
+          outputs=lambda: [basket.rules_path(level) for level in basket.LEVEL_COLUMNS],
+          params={'min_support': basket.DEFAULT_MIN_SUPPORT, 'max_len': basket.DEFAULT_MAX_LEN}),
+    Stage('forecasting', ['snapshot'], run_forecasting,
+          inputs=lambda: _snapshot_files('sales', 'customers', 'products'),
+          outputs=lambda: [forecasting.FORECAST_PATH],
+          params={'horizon': forecasting.DEFAULT_HORIZON}),
+    Stage('campaigns', ['snapshot'], run_campaigns,
+          inputs=lambda: _interned_files(),
+          outputs=lambda: [campaigns.CUBE_PATH],
+          params={'windows': list(campaigns.ATTRIBUTION_WINDOWS)}),
+    Stage('cohorts', ['snapshot'], run_cohorts,
+          inputs=lambda: _interned_files(),
+          outputs=lambda: [cohorts.MATRIX_PATH]),
+]
+STAGE_NAMES = [stage.name for stage in STAGES]
+
+
+def select_stages(only=None):
+    """The requested stages plus everything upstream of them, in DAG order"""
+    if not only:
+        return list(STAGES)
+    by_name = {stage.name: stage for stage in STAGES}
+    wanted, pending = set(), list(only)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(by_name[name].deps)
+    return [stage for stage in STAGES if stage.name in wanted]
+
+
+# ========================
+# MANIFEST / HASHING
+# ========================
+def _write_json(path, payload):
+    with atomic_write(path) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def read_manifest():
+    """Load the pipeline manifest, or an empty one"""
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    if manifest.get('schema_version') != SCHEMA_VERSION:
+        manifest = {'schema_version': SCHEMA_VERSION, 'files': {}, 'stages': {}}
+    return manifest
+
+
+def file_digest(path, cache):
+    """SHA-256 of a file, reusing the cached digest while size and mtime match"""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    entry = cache.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+    digest = snapshot.file_sha256(path)
+    cache[path] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    return digest
+
+
+def stage_key(stage, cache):
+    """Hash of the stage's name, code version, parameters and input file contents"""
+    digest = hashlib.sha256()
+    header = {'stage': stage.name, 'version': stage.version, 'params': stage.params}
+    digest.update(json.dumps(header, sort_keys=True).encode())
+    for path in stage.inputs():
+        digest.update(f'{path}\0{file_digest(path, cache)}\0'.encode())
+    return digest.hexdigest()
+
+
+def pipeline_version(manifest=None):
+    """Short digest over every stage's version"""
+    manifest = manifest or read_manifest()
+    digest = hashlib.sha256()
+    for name in STAGE_NAMES:
+        digest.update(manifest['stages'].get(name, {}).get('version', '').encode())
+    return digest.hexdigest()[:12]
+
+
+# ========================
+# SCHEDULER
+# ========================
+def _is_current(stage, key, manifest):
+    record = manifest['stages'].get(stage.name)
+    return (record is not None and record['key'] == key
+            and all(os.path.exists(path) for path in stage.outputs()))
+
+
+def _timed(run, force=False):
+    start = time.perf_counter()
+    summary = run(force)
+    return summary, time.perf_counter() - start
+
+
+def run_pipeline(only=None, force=None, workers=None, dry_run=False, log=print):
+    """Run every stale stage, independent ones in parallel. Returns {stage: status}"""
+    stages = select_stages(only)
+    force = set(STAGE_NAMES if force == ['all'] else force or [])
+    manifest = read_manifest()
+    cache = manifest['files']
+    status = {}
+    pending = {stage.name: stage for stage in stages}
+    selected = set(pending)
+    workers = workers or min(os.cpu_count() or 1, len(stages))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and not dry_run else None
+    running = {}
+
+    def finish(stage, key, summary, seconds):
+        record = {
+            'key': key,
+            'version': key[:12],
+            'outputs': {path: file_digest(path, cache) for path in stage.outputs()},
+            'seconds': round(seconds, 3),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'summary': summary,
+        }
+        manifest['stages'][stage.name] = record
+        status[stage.name] = 'ran'
+        _write_json(MANIFEST_PATH, manifest)
+        log(f"  {stage.name:<13} ran      {seconds:8.2f}s  v{record['version']}  {summary}")
+
+    try:
+        while pending or running:
+            blocked = [s for s in pending.values() if any(status.get(d) == 'failed' for d in s.deps)]
+            for stage in blocked:
+                status[stage.name] = 'failed'
+                del pending[stage.name]
+                log(f"  {stage.name:<13} blocked  (upstream failed)")
+
+            ready = [s for s in pending.values()
+                     if all(status.get(d) in ('ran', 'skipped', 'stale') or d not in selected for d in s.deps)]
+            for stage in ready:
+                del pending[stage.name]
+                try:
+                    key = stage_key(stage, cache)
+                except FileNotFoundError as e:
+                    status[stage.name] = 'failed'
+                    log(f"  {stage.name:<13} failed   {e}")
+                    continue
+                if stage.name not in force and _is_current(stage, key, manifest):
+                    status[stage.name] = 'skipped'
+                    log(f"  {stage.name:<13} skipped  v{key[:12]} (inputs unchanged)")
+                elif dry_run:
+                    # Downstream keys are computed from the current files, so
+                    # stages below a stale one may show as current here
+                    status[stage.name] = 'stale'
+                    log(f"  {stage.name:<13} stale    (would run)")
+                elif pool is None:
+                    try:
+                        finish(stage, key, *_timed(stage.run, stage.name in force))
+                    except Exception as e:
+                        status[stage.name] = 'failed'
+                        log(f"  {stage.name:<13} failed   {type(e).__name__}: {e}")
+                else:
+                    running[stage.name] = (stage, key, pool.submit(_timed, stage.run, stage.name in force))
+
+            if not running:
+                if pending and not ready and not blocked:
+                    raise RuntimeError(f'Unresolvable stage dependencies: {sorted(pending)}')
+                continue
+            done, _ = wait([future for _, _, future in running.values()], return_when=FIRST_COMPLETED)
+            for name, (stage, key, future) in list(running.items()):
+                if future not in done:
+                    continue
+                del running[name]
+                try:
+                    finish(stage, key, *future.result())
+                except Exception as e:
+                    status[name] = 'failed'
+                    log(f"  {name:<13} failed   {type(e).__name__}: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if not dry_run:
+            manifest['pipeline_version'] = pipeline_version(manifest)
+            _write_json(MANIFEST_PATH, manifest)
+    return status
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Precompute every dashboard artifact')
+    parser.add_argument('--only', nargs='+', choices=STAGE_NAMES, help='run these stages and their upstream')
+    parser.add_argument('--force', nargs='+', choices=STAGE_NAMES + ['all'], help='rerun even if unchanged')
+    parser.add_argument('--workers', type=int, default=None, help='parallel stages (default: all cores)')
+    parser.add_argument('--dry-run', action='store_true', help='only report which stages are stale')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    status = run_pipeline(args.only, args.force, args.workers, args.dry_run)
+    counts = pd.Series(status).value_counts().to_dict()
+    print(f"{len(status)} stages in {time.perf_counter() - start:.2f}s: {counts}  "
+          f"pipeline version {read_manifest().get('pipeline_version', '-')}")
+    if 'failed' in status.values():
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
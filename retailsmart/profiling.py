@@ -0,0 +1,404 @@
+"""
+RetailSmart Data-Quality Profiler
+=================================
+Per-table, per-column quality profiles of the source CSVs, computed in one
+vectorised pass per chunk and stored, so the dashboard reads counts instead of
+running isnull() over every table on each rerun.
+
+Each column keeps mergeable state only:
+
+- null count (empty strings and the 'Not delivered' / 'unknown' date fills
+  count as null)
+- approximate distinct count (HyperLogLog, ~0.8% error)
+- min / max, and a reservoir quantile sketch for numeric and date columns,
+  from which quartiles and the Phase 1 treat_outliers IQR outlier count are
+  estimated
+- invalid dates: unparseable, outside VALID_DATES, or (sales) delivered
+  before purchased
+
+Each table also counts duplicate rows (the Phase 1 drop_duplicates rule) and
+duplicate primary keys exactly, through HashedKeySets of 64-bit hashes.
+
+The ingest writes a profile as it streams the cleaned CSVs out. After that,
+a refresh treats sources as append-only, like the RFM feature store: only
+bytes past the stored watermark are parsed and folded in. The watermark keeps
+the SHA-256 of every byte already profiled, so a source edited anywhere in
+those bytes counts as rewritten and is profiled from scratch. Each profile is
+one file, Exported_files/Profiles/<table>.npz, holding the sketch state and
+the counts and watermark (as JSON), so the key sets and the watermark they
+match are always swapped in together.
+
+Usage:
+    python -m retailsmart.profiling            # fold appended rows
+    python -m retailsmart.profiling --force    # profile from scratch
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.paths import PROFILES_DIR, TABLES, atomic_write
+from retailsmart.sketches import HashedKeySet, HyperLogLog, ReservoirQuantiles, value_hashes
+from retailsmart.snapshot import TABLE_DATES, TABLE_DTYPES, is_append_of, resolve_sources, source_watermark
+
+DEFAULT_CHUNK_ROWS = 200_000
+QUANTILE_SAMPLE_SIZE = 4096          # rank error ~1.5%, 32 KB per column
+KEY_COLUMNS = {
+    'customers': ['customer_id'],
+    'products': ['product_id'],
+    'marketing': ['campaign_id'],
+    'reviews': ['review_id'],
+}
+DATE_NULLS = ('Not delivered', 'unknown')      # Phase 1 fills, not bad dates
+VALID_DATES = (pd.Timestamp('2000-01-01'), pd.Timestamp('2100-01-01'))
+DATE_ORDER = {'sales': [('order_purchase_timestamp', 'order_delivered_customer_date')]}
+HASH_MULTIPLIER = np.uint64(0x100000001B3)
+
+SUMMARY_COLUMNS = ['rows', 'missing', 'duplicate_rows', 'duplicate_keys', 'invalid_dates', 'outliers']
+
+
+def profile_path(table):
+    """Path of a table's profile"""
+    return os.path.join(PROFILES_DIR, f'{table}.npz')
+
+
+# ========================
+# COLUMN NORMALISATION
+# ========================
+# Chunks come from two places (the ingest's in-memory cleaned frames and the
+# CSVs re-read later), so every column is brought to one representation first;
+# otherwise the same row would hash differently depending on its path.
+def _column_kind(table, column, series):
+    if column in TABLE_DATES.get(table, []):
+        return 'datetime'
+    return 'numeric' if pd.api.types.is_numeric_dtype(series) else 'text'
+
+
+def _normalise(kind, series):
+    """(values, null mask, invalid mask) in the kind's canonical form"""
+    if kind == 'datetime':
+        text = series.astype(object)
+        filled = text.notna() & ~text.isin(DATE_NULLS) & (text.astype(str).str.strip() != '')
+        values = pd.to_datetime(text.where(filled), errors='coerce')
+        null = values.isna().to_numpy()
+        invalid = (filled & values.isna()).to_numpy() | ((values < VALID_DATES[0]) | (values >= VALID_DATES[1])).to_numpy()
+        return values.to_numpy(dtype='datetime64[ns]'), null, invalid
+    if kind == 'numeric':
+        values = pd.to_numeric(series, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, np.isnan(values), None
+    values = series.astype(object)
+    null = (values.isna() | (values.astype(str) == '')).to_numpy()
+    return values.where(~null, '').astype(str).to_numpy(dtype=object), null, None
+
+
+# ========================
+# PROFILES
+# ========================
+class ColumnProfile:
+    """Mergeable quality state of one column"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.nulls = 0
+        self.invalid = 0
+        self.minimum = self.maximum = None
+        self.distinct = HyperLogLog()
+        self.quantiles = ReservoirQuantiles(QUANTILE_SAMPLE_SIZE) if kind != 'text' else None
+
+    def update(self, values, null, invalid):
+        """Fold one normalised chunk; returns the per-row value hashes"""
+        hashes = value_hashes(values.view(np.int64) if self.kind == 'datetime' else values)
+        self.nulls += int(null.sum())
+        if invalid is not None:
+            self.invalid += int(invalid.sum())
+        present = ~null
+        self.distinct.update_hashes(hashes[present])
+        if self.quantiles is not None and present.any():
+            numbers = values[present].view(np.int64).astype(np.float64) if self.kind == 'datetime' else values[present]
+            self.quantiles.update(numbers)
+            low, high = float(numbers.min()), float(numbers.max())
+            self.minimum = low if self.minimum is None else min(self.minimum, low)
+            self.maximum = high if self.maximum is None else max(self.maximum, high)
+        return hashes
+
+    def outliers(self, rows):
+        """Estimated values outside the 1.5 x IQR caps treat_outliers applies"""
+        if self.kind != 'numeric' or not self.quantiles.count:
+            return 0
+        n = min(self.quantiles.count, self.quantiles.size)
+        sample = self.quantiles.sample[:n]
+        q1, q3 = np.quantile(sample, [0.25, 0.75])
+        outside = ((sample < q1 - 1.5 * (q3 - q1)) | (sample > q3 + 1.5 * (q3 - q1))).mean()
+        return int(round(outside * (rows - self.nulls)))
+
+    def _display(self, value):
+        # Strings throughout, so numeric and date columns share one dtype
+        if value is None:
+            return None
+        if self.kind == 'datetime':
+            return str(pd.Timestamp(int(value)).round('s'))
+        return f'{value:.6g}'
+
+    def describe(self, rows):
+        q = self.quantiles.quantile([0.25, 0.5, 0.75]) if self.quantiles is not None else [None] * 3
+        return {
+            'kind': self.kind,
+            'nulls': self.nulls,
+            'null_pct': 100 * self.nulls / rows if rows else 0.0,
+            'distinct': int(round(self.distinct.count())),
+            'min': self._display(self.minimum),
+            'p25': self._display(q[0]),
+            'median': self._display(q[1]),
+            'p75': self._display(q[2]),
+            'max': self._display(self.maximum),
+            'invalid': self.invalid,
+            'outliers': self.outliers(rows),
+        }
+
+
+class TableProfile:
+    """Row-level counts plus one ColumnProfile per column"""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = 0
+        self.duplicate_rows = 0
+        self.duplicate_keys = 0
+        self.columns = {}
+        self.row_keys = HashedKeySet()
+        self.primary_keys = HashedKeySet() if table in KEY_COLUMNS else None
+        self.watermark = None
+
+    def update(self, chunk):
+        """Fold one chunk of rows in a single vectorised pass per column"""
+        if chunk.empty:
+            return
+        hashes, normalised = {}, {}
+        for column in chunk.columns:
+            if column not in self.columns:
+                self.columns[column] = ColumnProfile(_column_kind(self.table, column, chunk[column]))
+            profile = self.columns[column]
+            normalised[column] = _normalise(profile.kind, chunk[column])
+            hashes[column] = profile.update(*normalised[column])
+
+        for earlier, later in DATE_ORDER.get(self.table, []):
+            if earlier in normalised and later in normalised:
+                before = normalised[later][0] < normalised[earlier][0]      # NaT compares False
+                self.columns[later].invalid += int(before.sum())
+
+        row_hash = np.zeros(len(chunk), dtype=np.uint64)
+        for column in chunk.columns:
+            row_hash = row_hash * HASH_MULTIPLIER ^ hashes[column]
+        self.duplicate_rows += int((~self.row_keys.add_new(row_hash)).sum())
+
+        if self.primary_keys is not None:
+            key_columns = [c for c in KEY_COLUMNS[self.table] if c in chunk.columns]
+            if key_columns:
+                key_hash = np.zeros(len(chunk), dtype=np.uint64)
+                present = np.ones(len(chunk), dtype=bool)
+                for column in key_columns:
+                    key_hash = key_hash * HASH_MULTIPLIER ^ hashes[column]
+                    present &= ~normalised[column][1]
+                self.duplicate_keys += int((~self.primary_keys.add_new(key_hash[present])).sum())
+        self.rows += len(chunk)
+
+    def summary(self):
+        """One row of table-level counts"""
+        return {
+            'rows': self.rows,
+            'missing': sum(c.nulls for c in self.columns.values()),
+            'duplicate_rows': self.duplicate_rows,
+            'duplicate_keys': self.duplicate_keys if self.primary_keys is not None else None,
+            'invalid_dates': sum(c.invalid for c in self.columns.values()),
+            'outliers': sum(c.outliers(self.rows) for c in self.columns.values()),
+        }
+
+    def describe(self):
+        """One row per column"""
+        return pd.DataFrame.from_dict({name: c.describe(self.rows) for name, c in self.columns.items()},
+                                      orient='index')
+
+
+# ========================
+# PERSISTENCE
+# ========================
+def _sorted_keys(key_set):
+    return np.sort(np.concatenate(key_set.runs)) if key_set.runs else np.zeros(0, dtype=np.uint64)
+
+
+def save_profile(profile):
+    """Write a profile's sketches, counts and watermark as one file, atomically"""
+    path = profile_path(profile.table)
+    os.makedirs(PROFILES_DIR, exist_ok=True)
+    names = list(profile.columns)
+    arrays = {'row_keys': _sorted_keys(profile.row_keys)}
+    if profile.primary_keys is not None:
+        arrays['primary_keys'] = _sorted_keys(profile.primary_keys)
+    if names:
+        arrays['distinct'] = np.stack([profile.columns[name].distinct.registers for name in names])
+    for i, name in enumerate(names):
+        sketch = profile.columns[name].quantiles
+        if sketch is not None:
+            arrays[f'quantiles_{i}'] = sketch.sample[:min(sketch.count, sketch.size)]
+
+    state = {
+        'table': profile.table,
+        'rows': profile.rows,
+        'duplicate_rows': profile.duplicate_rows,
+        'duplicate_keys': profile.duplicate_keys,
+        'watermark': profile.watermark,
+        'columns': [{'name': name, 'kind': c.kind, 'nulls': c.nulls, 'invalid': c.invalid,
+                     'min': c.minimum, 'max': c.maximum,
+                     'quantile_count': c.quantiles.count if c.quantiles is not None else 0}
+                    for name, c in profile.columns.items()],
+        'summary': profile.summary(),
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    arrays['state'] = np.array(json.dumps(state))
+    with atomic_write(path, suffix='.tmp.npz') as tmp_path:
+        np.savez(tmp_path, **arrays)
+    # Counts used to live in a separate <table>.json next to the npz
+    legacy_path = os.path.join(PROFILES_DIR, f'{profile.table}.json')
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def _read_state(table):
+    """Counts and watermark of a stored profile; npz members load lazily, so no sketch is read"""
+    try:
+        with np.load(profile_path(table)) as arrays:
+            return json.loads(arrays['state'][()])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def load_profile(table):
+    """The stored profile with its sketches, or None"""
+    try:
+        with np.load(profile_path(table)) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        state = json.loads(arrays['state'][()])
+    except (OSError, ValueError, KeyError):
+        return None
+    profile = TableProfile(table)
+    profile.rows = state['rows']
+    profile.duplicate_rows = state['duplicate_rows']
+    profile.duplicate_keys = state['duplicate_keys']
+    profile.watermark = state['watermark']
+    profile.row_keys.runs = [arrays['row_keys']]
+    if profile.primary_keys is not None and 'primary_keys' in arrays:
+        profile.primary_keys.runs = [arrays['primary_keys']]
+    for i, entry in enumerate(state['columns']):
+        column = ColumnProfile(entry['kind'])
+        column.nulls, column.invalid = entry['nulls'], entry['invalid']
+        column.minimum, column.maximum = entry['min'], entry['max']
+        column.distinct.registers = arrays['distinct'][i].copy()
+        if column.quantiles is not None:
+            sample = arrays[f'quantiles_{i}']
+            # Continue the stream with a fresh random state so appended rows
+            # do not replay the same slot choices
+            column.quantiles = ReservoirQuantiles(QUANTILE_SAMPLE_SIZE, seed=entry['quantile_count'])
+            column.quantiles.sample[:len(sample)] = sample
+            column.quantiles.count = entry['quantile_count']
+        profile.columns[entry['name']] = column
+    return profile
+
+
+def is_current(state, path):
+    """True if a stored profile covers exactly the current source file.
+
+    Path, size and modification time must all match: a source rewritten in
+    place to the same size is caught by its mtime without hashing it.
+    """
+    watermark = (state or {}).get('watermark')
+    if not watermark or watermark['path'] != path or not os.path.exists(path):
+        return False
+    stat = os.stat(path)
+    return stat.st_size == watermark['size'] and stat.st_mtime_ns == watermark.get('mtime_ns')
+
+
+def quality_summary():
+    """Table-level counts from the stored profiles, or None unless all are current.
+
+    Reads only each profile's JSON state; the sketches stay on disk.
+    """
+    _, sources = resolve_sources()
+    rows = {}
+    for table in TABLES:
+        state = _read_state(table)
+        if not is_current(state, sources[table]):
+            return None
+        rows[table] = state['summary']
+    return pd.DataFrame.from_dict(rows, orient='index')[SUMMARY_COLUMNS]
+
+
+# ========================
+# REFRESH
+# ========================
+def read_chunks(table, path, offset=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Source CSV rows from a byte offset (a row boundary), dates left as text"""
+    dtypes = {col: dtype for col, dtype in TABLE_DTYPES[table].items() if col not in TABLE_DATES[table]}
+    with open(path, 'rb') as f:
+        header = pd.read_csv(f, nrows=0).columns
+        f.seek(offset or 0)
+        if not offset:
+            f.readline()
+        yield from pd.read_csv(f, header=None, names=header, dtype=dtypes, chunksize=chunk_rows,
+                               low_memory=False)
+
+
+def refresh_profile(table, path, force=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Bring one table's profile up to date with its source. Returns (rows folded, rebuilt)"""
+    profile = None if force else load_profile(table)
+    rebuilt = profile is None or not is_append_of(profile.watermark, path)
+    if rebuilt:
+        profile, offset = TableProfile(table), 0
+    else:
+        offset = profile.watermark['size']
+        if os.path.getsize(path) == offset:
+            return 0, False
+    before = profile.rows
+    for chunk in read_chunks(table, path, offset, chunk_rows):
+        profile.update(chunk)
+    profile.watermark = source_watermark(path, profile.rows)
+    save_profile(profile)
+    return profile.rows - before, rebuilt
+
+
+def refresh_profiles(force=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Profile every source table, incrementally where possible. Returns {table: report}"""
+    _, sources = resolve_sources()
+    report = {}
+    for table in TABLES:
+        start = time.perf_counter()
+        folded, rebuilt = refresh_profile(table, sources[table], force, chunk_rows)
+        report[table] = {'rows_folded': folded, 'rebuilt': rebuilt, 'seconds': time.perf_counter() - start}
+    return report
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Build or update the data-quality profiles')
+    parser.add_argument('--force', action='store_true', help='profile every table from scratch')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--table', choices=TABLES, help='print this table\'s column profile')
+    args = parser.parse_args()
+
+    for table, entry in refresh_profiles(args.force, args.chunk_rows).items():
+        action = 'rebuilt' if entry['rebuilt'] else 'appended' if entry['rows_folded'] else 'current'
+        print(f"{table:<10} {action:<9} {entry['rows_folded']:>11,} rows  {entry['seconds']:7.2f}s")
+    print()
+    print(quality_summary().to_string())
+    if args.table:
+        print()
+        print(load_profile(args.table).describe().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+RetailSmart Batch Scoring Engine
+================================
+Scores the whole customer base with the Phase 2 models shipped in
+Exported_files/Phase-2/Models/ and writes churn probability and predicted CLV
+to a Parquet file the dashboard (and Power BI) can read directly.
+
+Feature engineering mirrors the Phase 2 notebook (sales + products + customers
++ marketing aggregated per customer_id, RFM quintile scores, label encodings,
+StandardScaler), but without the many-to-many merge: the row multiplicities the
+notebook's joins introduced are reproduced arithmetically.
+
+The feature matrix is one contiguous float32 array; it is scored in fixed-size
+batches on a thread pool (XGBoost releases the GIL during prediction). The
+output also carries recency/frequency/monetary from the RFM feature store.
+
+Usage:
+    python -m retailsmart.scoring                    # score and write Parquet
+    python -m retailsmart.scoring --batch-size 20000 --workers 8
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from retailsmart.features import refresh_store, rfm_for_customers, rfm_frame
+from retailsmart.paths import PHASE2_MODELS_DIR, PHASE2_SCORES_DIR, atomic_write
+from retailsmart.snapshot import load_interned_snapshot
+
+SCORES_PATH = os.path.join(PHASE2_SCORES_DIR, 'customer_scores.parquet')
+
+DEFAULT_BATCH_SIZE = 10000
+CHURN_THRESHOLD = 0.5
+
+
+# ========================
+# MODEL BUNDLE
+# ========================
+class ModelBundle:
+    """The Phase 2 pickles, loaded once"""
+
+    def __init__(self, models_dir=PHASE2_MODELS_DIR):
+        self.churn_model = joblib.load(os.path.join(models_dir, 'best_churn_model.pkl'))
+        clv_search = joblib.load(os.path.join(models_dir, 'clv_model.pkl'))
+        self.clv_model = getattr(clv_search, 'best_estimator_', clv_search)
+        self.scaler = joblib.load(os.path.join(models_dir, 'scaler.pkl'))
+        self.state_encoder = joblib.load(os.path.join(models_dir, 'label_encoder.pkl'))
+        self.metadata = joblib.load(os.path.join(models_dir, 'feature_metadata.pkl'))
+
+        self.churn_features = list(getattr(self.churn_model, 'feature_names_in_', self.metadata['features']))
+        self.clv_features = list(getattr(clv_search, 'feature_names_in_', self.churn_features))
+        self.scaled_features = list(self.scaler.feature_names_in_)
+
+        # One column order for the shared float32 matrix
+        self.columns = list(dict.fromkeys(self.churn_features + self.clv_features + self.scaled_features))
+        self.churn_index = np.array([self.columns.index(c) for c in self.churn_features])
+        self.clv_index = np.array([self.columns.index(c) for c in self.clv_features])
+
+        # CLV was trained on the scaled total_spent, so predictions are unscaled
+        target = self.scaled_features.index('total_spent')
+        self.clv_mean = float(self.scaler.mean_[target])
+        self.clv_scale = float(self.scaler.scale_[target])
+
+    def set_threads(self, n):
+        """Threads each XGBoost prediction may use"""
+        self.churn_model.get_booster().set_param({'nthread': n})
+        self.clv_model.get_booster().set_param({'nthread': n})
+
+    def predict_batch(self, X):
+        """Churn probability and CLV for one contiguous float32 batch"""
+        churn_X = np.ascontiguousarray(X[:, self.churn_index])
+        clv_X = np.ascontiguousarray(X[:, self.clv_index])
+        churn_prob = self.churn_model.get_booster().inplace_predict(churn_X)
+        clv_scaled = self.clv_model.get_booster().inplace_predict(clv_X)
+        return churn_prob.astype(np.float32), (clv_scaled * self.clv_scale + self.clv_mean).astype(np.float32)
+
+
+# ========================
+# FEATURE ENGINEERING
+# ========================
+def _mode_per_key(keys, values):
+    """Most frequent value per key; ties go to the smallest value like Series.mode()[0]"""
+    df = pd.DataFrame({'key': keys, 'value': values}).dropna()
+    if df.empty:
+        return pd.Series(dtype=object)
+    df['value'] = df['value'].astype(str)
+    counts = df.groupby(['key', 'value'], observed=True).size().reset_index(name='n')
+    counts = counts.sort_values(['key', 'n', 'value'], ascending=[True, False, True])
+    return counts.drop_duplicates('key').set_index('key')['value']
+
+
+def _label_encode(values, classes=None):
+    """LabelEncoder semantics: codes are positions in the sorted class list"""
+    values = pd.Series(values).astype(str)
+    classes = np.sort(values.unique()) if classes is None else np.asarray(classes).astype(str)
+    codes = np.searchsorted(classes, values.to_numpy())
+    codes = np.minimum(codes, len(classes) - 1)
+    unknown = classes[codes] != values.to_numpy()
+    return np.where(unknown, np.nan, codes).astype(np.float64)
+
+
+def _rank_quintile(values, ascending_labels=True):
+    """pd.qcut(rank(method='first'), 5) as 1..5 (or 5..1)"""
+    ranks = pd.Series(values).rank(method='first')
+    scores = pd.qcut(ranks, 5, labels=False) + 1
+    return scores if ascending_labels else 6 - scores
+
+
+def build_feature_frame(customers, sales, products, marketing, state_classes=None):
+    """Per-customer_id model features, as in the Phase 2 notebook"""
+    state_col = 'state' if 'state' in customers.columns else 'customer_state'
+    per_customer = customers.drop_duplicates('customer_id').set_index('customer_id')
+
+    # Sales side (left table of the notebook's merges): only customers with sales get scored
+    items = sales[['customer_id', 'product_id', 'freight_value', 'payment_value',
+                   'payment_type', 'order_purchase_timestamp']]
+    product_category = products.drop_duplicates('product_id').set_index('product_id')['category_english']
+    items = items.assign(category=items['product_id'].map(product_category))
+
+    grouped = items.groupby('customer_id', sort=True)
+    features = pd.DataFrame({
+        'n_items': grouped.size(),
+        'freight_value': grouped['freight_value'].mean(),
+        'payment_value': grouped['payment_value'].mean(),
+    })
+    ids = features.index
+
+    campaigns = marketing.groupby('customer_id')
+    n_campaigns = campaigns.size().reindex(ids).fillna(0).to_numpy()
+    multiplier = features['n_items'].to_numpy() * np.maximum(n_campaigns, 1)
+
+    customer_rows = per_customer.reindex(ids)
+    # Sums over the notebook's joined rows repeat each customer value once per
+    # (sale line x campaign) combination
+    features['total_spent'] = customer_rows['total_spent'].to_numpy() * multiplier
+    features['total_orders'] = customer_rows['total_orders'].to_numpy() * multiplier
+    features['days_since_last_order'] = customer_rows['days_since_last_order'].to_numpy()
+    features['churn_flag'] = customer_rows['churn_flag'].astype('float64').to_numpy()
+    features['spend'] = campaigns['spend'].mean().reindex(ids).fillna(0).to_numpy()
+    features['conversions'] = (campaigns['conversions'].sum().reindex(ids).fillna(0) * features['n_items']).to_numpy()
+    features['response_rate'] = campaigns['response_rate'].mean().reindex(ids).fillna(0).to_numpy()
+    features['num_campaigns'] = n_campaigns * features['n_items'].to_numpy()
+
+    category = _mode_per_key(items['customer_id'], items['category']).reindex(ids).fillna('Unknown')
+    payment = _mode_per_key(items['customer_id'], items['payment_type']).reindex(ids).fillna('Unknown')
+    channel = _mode_per_key(marketing['customer_id'], marketing['channel']).reindex(ids).fillna('None')
+    state = customer_rows[state_col].astype(object).fillna('Unknown')
+
+    features['R'] = features['days_since_last_order']
+    features['F'] = features['total_orders']
+    features['M'] = features['total_spent']
+    features['R_score'] = _rank_quintile(features['R'].to_numpy(), ascending_labels=False).to_numpy()
+    features['F_score'] = _rank_quintile(features['F'].to_numpy()).to_numpy()
+    features['M_score'] = _rank_quintile(features['M'].to_numpy()).to_numpy()
+
+    features['tenure'] = 365 - features['days_since_last_order']
+    # The notebook assigns one dataset-wide mode month to every customer
+    months = pd.to_datetime(items['order_purchase_timestamp']).dt.month.dropna()
+    features['month_of_last_purchase'] = float(months.mode()[0]) if len(months) else 0.0
+
+    features['payment_type_encoded'] = _label_encode(payment)
+    features['channel_encoded'] = _label_encode(channel)
+    features['category_english_encoded'] = _label_encode(category)
+    features['category_encoded'] = features['category_english_encoded']
+    features['state_encoded'] = _label_encode(state, state_classes)
+
+    orders = features['total_orders'].replace(0, np.nan)
+    features['avg_order_value'] = (features['total_spent'] / orders).fillna(0)
+    features['marketing_engagement_score'] = features['conversions'] / (features['spend'] + 1)
+
+    # Same NaN policy as the notebook: column mean, or 0 for all-NaN columns
+    features = features.drop(columns='n_items')
+    features = features.fillna(features.mean()).fillna(0)
+    return features
+
+
+def build_feature_matrix(features, bundle):
+    """Scale and lay out the features as one C-contiguous float32 array"""
+    scaled = features.copy()
+    cols = bundle.scaled_features
+    scaled[cols] = (scaled[cols].to_numpy(dtype=np.float64) - bundle.scaler.mean_) / bundle.scaler.scale_
+    return np.ascontiguousarray(scaled[bundle.columns].to_numpy(dtype=np.float32))
+
+
+# ========================
+# BATCH SCORING
+# ========================
+def score_matrix(X, bundle, batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """Score X in fixed-size batches across a thread pool"""
+    workers = workers or os.cpu_count() or 1
+    bounds = [(i, min(i + batch_size, len(X))) for i in range(0, len(X), batch_size)]
+    churn_prob = np.empty(len(X), dtype=np.float32)
+    clv = np.empty(len(X), dtype=np.float32)
+
+    def run(bound):
+        start, stop = bound
+        churn_prob[start:stop], clv[start:stop] = bundle.predict_batch(X[start:stop])
+
+    if workers == 1:
+        bundle.set_threads(os.cpu_count() or 1)
+        for bound in bounds:
+            run(bound)
+    else:
+        # Parallelism comes from the pool; one thread per prediction avoids oversubscription
+        bundle.set_threads(1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, bounds))
+    return churn_prob, clv
+
+
+def score_customers(tables=None, bundle=None, batch_size=DEFAULT_BATCH_SIZE, workers=None, rfm=None):
+    """Build features for every customer with sales and score them.
+
+    rfm is the feature store's rfm_frame(); when omitted the store is refreshed.
+    Returns (scores DataFrame, timings dict).
+    """
+    timings = {}
+    start = time.perf_counter()
+    if tables is None:
+        customers, sales, products, marketing, _, _, registry = load_interned_snapshot()
+    else:
+        customers, sales, products, marketing, registry = tables
+    bundle = bundle or ModelBundle()
+    timings['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features = build_feature_frame(customers, sales, products, marketing,
+                                   state_classes=bundle.state_encoder.classes_)
+    X = build_feature_matrix(features, bundle)
+    timings['features'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    churn_prob, clv = score_matrix(X, bundle, batch_size=batch_size, workers=workers)
+    timings['score'] = time.perf_counter() - start
+
+    customer_ids = features.index.to_numpy()
+    if registry is not None and pd.api.types.is_integer_dtype(features.index):
+        customer_ids = registry.decode('customer', customer_ids)
+    scores = pd.DataFrame({
+        'customer_id': customer_ids,
+        'churn_prob': churn_prob,
+        'churn_pred': (churn_prob > CHURN_THRESHOLD).astype(np.int8),
+        'predicted_clv': clv,
+    })
+
+    # Recency / frequency / monetary from the shared feature store, stored next
+    # to the scores. The model inputs above keep the notebook definitions the
+    # models were trained on.
+    start = time.perf_counter()
+    if rfm is None:
+        rfm = rfm_frame(refresh_store()[0])
+    id_columns = [col for col in ('customer_id', 'customer_unique_id') if col in customers.columns]
+    hex_customers = customers[id_columns] if registry is None else registry.decode_frame(customers[id_columns])
+    context = rfm_for_customers(customer_ids, hex_customers, rfm)
+    for col in ('recency', 'frequency', 'monetary'):
+        scores[col] = context[col].to_numpy()
+    timings['rfm'] = time.perf_counter() - start
+    return scores, timings
+
+
+def write_scores(scores, path=SCORES_PATH):
+    """Atomically write the scores Parquet file"""
+    with atomic_write(path) as tmp_path:
+        scores.to_parquet(tmp_path, index=False)
+    return path
+
+
+def load_scores(path=SCORES_PATH):
+    """Read the scores written by write_scores"""
+    return pd.read_parquet(path)
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Score churn and CLV for every customer')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help='thread pool size (default: all cores)')
+    parser.add_argument('--compare-serial', action='store_true', help='also time a single-threaded run')
+    args = parser.parse_args()
+
+    scores, timings = score_customers(batch_size=args.batch_size, workers=args.workers)
+    path = write_scores(scores)
+
+    n = len(scores)
+    print(f"Scored {n:,} customers -> {path}")
+    for stage, seconds in timings.items():
+        print(f"  {stage:<9} {seconds:8.3f}s")
+    print(f"  throughput (scoring only): {n / max(timings['score'], 1e-9):,.0f} customers/s")
+    print(f"  throughput (end to end):   {n / max(sum(timings.values()), 1e-9):,.0f} customers/s")
+
+    if args.compare_serial:
+        _, serial = score_customers(batch_size=args.batch_size, workers=1)
+        print(f"  single-threaded scoring:   {n / max(serial['score'], 1e-9):,.0f} customers/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+"""
+RetailSmart Online Scoring Service
+==================================
+Churn probability and predicted CLV for one customer at a time, for CRM
+lookups, from the same Phase 2 models and features as the batch scorer.
+
+- Features are built once for every customer (build_feature_frame, as in
+  retailsmart.scoring) and kept as one scaled float32 matrix. RFM quintiles
+  are ranks over the whole base, so a customer's row cannot be rebuilt on
+  its own; precomputing them all is also what keeps a lookup in microseconds.
+- Rows are found through the snapshot's interned customer dictionary: the hex
+  customer_id becomes a 16-byte key, a binary search gives its int32 code,
+  and one int32 array maps codes to rows. No per-customer Python objects.
+- Concurrent requests are micro-batched: one thread feeds the models
+  everything that queued up while the previous batch was predicting (up to
+  --max-batch rows, optionally waiting --max-wait-ms for more), so load turns
+  into bigger model calls rather than a longer queue.
+- Recent answers are kept in an LRU cache (--cache-size), cleared whenever
+  the features are rebuilt.
+- A watcher rebuilds the features in the background when the snapshot
+  version changes and swaps them in; requests never wait for it.
+- Request and batch latencies go to the service's own in-memory recorder for
+  /stats; they are not appended to spans.jsonl, which at thousands of
+  requests a second would grow by megabytes a minute.
+
+HTTP (keep-alive, JSON):
+    GET /score/<customer_id>    {"customer_id", "churn_prob", "churn_pred", "predicted_clv", ...}
+    GET /health                 customers indexed and data version
+    GET /stats                  requests, cache hits, batch sizes, latency percentiles
+
+Usage:
+    python -m retailsmart.serving --port 8765
+    python -m retailsmart.serving --lookup 06b8999e2fba1a1fbc88172c00ba8bc7
+    python benchmarks/load_test_serving.py --clients 16 --requests 20000
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
+
+from retailsmart.ids import KEY_DTYPE
+from retailsmart.instrumentation import Recorder
+from retailsmart.scoring import CHURN_THRESHOLD, ModelBundle, build_feature_frame, build_feature_matrix
+from retailsmart.snapshot import load_interned_snapshot, snapshot_version
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 256
+DEFAULT_MAX_WAIT_MS = 0.0     # greedy: batch whatever queued during the last prediction
+DEFAULT_CACHE_SIZE = 100_000
+DEFAULT_RELOAD_SECONDS = 60.0
+
+
+# ========================
+# FEATURE INDEX
+# ========================
+class FeatureIndex:
+    """Scaled model features for every scorable customer, addressable by hex customer_id"""
+
+    def __init__(self, X, row_of_code, dictionary, version):
+        self.X = X
+        self.row_of_code = row_of_code
+        self.dictionary = dictionary
+        self.version = version
+
+    @classmethod
+    def build(cls, bundle):
+        customers, sales, products, marketing, _, _, registry = load_interned_snapshot()
+        version = snapshot_version()
+        features = build_feature_frame(customers, sales, products, marketing,
+                                       state_classes=bundle.state_encoder.classes_)
+        X = build_feature_matrix(features, bundle)
+        dictionary = registry.dictionaries['customer']
+        row_of_code = np.full(len(dictionary), -1, dtype=np.int32)
+        row_of_code[features.index.to_numpy()] = np.arange(len(features), dtype=np.int32)
+        return cls(X, row_of_code, dictionary, version)
+
+    def __len__(self):
+        return len(self.X)
+
+    def row(self, customer_id):
+        """Feature row position for a hex customer_id, or -1 if it has none"""
+        if len(customer_id) != 32:
+            return -1
+        try:
+            key = np.frombuffer(bytes.fromhex(customer_id), dtype=KEY_DTYPE)
+        except ValueError:
+            return -1
+        code = self.dictionary.encode_keys(key, np.ones(1, dtype=bool))[0]
+        return int(self.row_of_code[code]) if code >= 0 else -1
+
+
+# ========================
+# MICRO-BATCHING AND CACHE
+# ========================
+class MicroBatcher:
+    """Funnels concurrent single-row predictions into batched model calls"""
+
+    def __init__(self, predict, max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT_MS / 1e3, recorder=None):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.recorder = recorder or Recorder(spans_path=None)
+        self.batches = self.rows = self.largest = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name='scoring-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, x):
+        """Future of (churn_prob, predicted_clv) for one float32 feature row"""
+        future = Future()
+        self._queue.put((x, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                with self.recorder.span('serving.predict'):
+                    churn_prob, clv = self.predict(np.stack([x for x, _ in batch]))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(batch)
+            self.largest = max(self.largest, len(batch))
+            for i, (_, future) in enumerate(batch):
+                future.set_result((float(churn_prob[i]), float(clv[i])))
+
+
+class ResultCache:
+    """Thread-safe LRU of recent answers"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# ========================
+# SERVICE
+# ========================
+class ScoringService:
+    """Feature index + models + batcher + cache behind one score() call"""
+
+    def __init__(self, bundle=None, max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        self.bundle = bundle or ModelBundle()
+        # Batches are small; one thread per prediction keeps latency flat
+        self.bundle.set_threads(1)
+        self.index = FeatureIndex.build(self.bundle)
+        self.cache = ResultCache(cache_size)
+        # Percentiles for /stats only: no JSONL sink on the request path
+        self.recorder = Recorder(spans_path=None)
+        self.batcher = MicroBatcher(self.bundle.predict_batch, max_batch, max_wait_ms / 1e3, self.recorder)
+        self.requests = self.unknown = 0
+        self.started = time.time()
+        self._reload_lock = threading.Lock()
+
+    def score(self, customer_id):
+        """Scores for one customer, or None if the customer has no sales to score"""
+        with self.recorder.span('serving.score'):
+            self.requests += 1
+            index = self.index          # one consistent index even if a reload swaps it
+            cached = self.cache.get(customer_id)
+            if cached is not None:
+                return dict(cached, cached=True)
+            row = index.row(customer_id)
+            if row < 0:
+                self.unknown += 1
+                return None
+            churn_prob, clv = self.batcher.submit(index.X[row]).result()
+            result = {'customer_id': customer_id, 'churn_prob': churn_prob,
+                      'churn_pred': int(churn_prob > CHURN_THRESHOLD), 'predicted_clv': clv,
+                      'data_version': index.version}
+            if index is self.index:
+                self.cache.put(customer_id, result)
+            return dict(result, cached=False)
+
+    def reload(self, force=False):
+        """Rebuild the features if the snapshot changed; True if they were swapped"""
+        with self._reload_lock:
+            if not force and snapshot_version() == self.index.version:
+                return False
+            index = FeatureIndex.build(self.bundle)
+            self.index = index
+            self.cache.clear()
+            return True
+
+    def watch(self, interval=DEFAULT_RELOAD_SECONDS):
+        """Check for a new snapshot every interval seconds on a daemon thread"""
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Feature reload failed: {type(e).__name__}: {e}", flush=True)
+        threading.Thread(target=run, name='scoring-reload', daemon=True).start()
+
+    def stats(self):
+        batcher = self.batcher
+        latency = self.recorder.summary()
+        return {
+            'customers': len(self.index),
+            'data_version': self.index.version,
+            'uptime_s': time.time() - self.started,
+            'requests': self.requests,
+            'unknown': self.unknown,
+            'cache': {'entries': len(self.cache), 'hits': self.cache.hits, 'misses': self.cache.misses},
+            'batches': batcher.batches,
+            'mean_batch': batcher.rows / batcher.batches if batcher.batches else 0.0,
+            'largest_batch': batcher.largest,
+            'latency_ms': latency.set_index('stage')[['count', 'p50_ms', 'p90_ms', 'p99_ms']].to_dict('index'),
+        }
+
+
+# ========================
+# HTTP
+# ========================
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'      # keep-alive: a CRM client reuses one connection
+    # Headers and body go out as two writes; with Nagle on, the body waits for
+    # the client's delayed ACK and every answer takes ~40 ms
+    disable_nagle_algorithm = True
+    service = None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip('/')
+        if path.startswith('/score/'):
+            result = self.service.score(unquote(path[len('/score/'):]))
+            if result is None:
+                self._send(404, {'error': 'unknown customer_id or no sales to score'})
+            else:
+                self._send(200, result)
+        elif path == '/health':
+            self._send(200, {'status': 'ok', 'customers': len(self.service.index),
+                             'data_version': self.service.index.version})
+        elif path == '/stats':
+            self._send(200, self.service.stats())
+        else:
+            self._send(404, {'error': f'no route {path}'})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # one stderr line per request would cost more than the prediction
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default listen backlog of 5 drops connection bursts, and a dropped
+    # SYN is only retried after a second
+    request_queue_size = 128
+
+
+def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Serve until interrupted"""
+    handler = type('BoundScoringHandler', (ScoringHandler,), {'service': service})
+    server = ScoringServer((host, port), handler)
+    print(f"Scoring {len(service.index):,} customers on http://{host}:{port} "
+          f"(data version {service.index.version})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Serve churn/CLV scores for single customers')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help='rows per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='how long a batch waits for more requests (default: only what is queued)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE, help='cached answers (0 disables)')
+    parser.add_argument('--reload-seconds', type=float, default=DEFAULT_RELOAD_SECONDS,
+                        help='snapshot version check interval (0 disables)')
+    parser.add_argument('--lookup', nargs='+', metavar='CUSTOMER_ID', help='print scores and exit')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    service = ScoringService(max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, cache_size=args.cache_size)
+    print(f"Indexed {len(service.index):,} customers in {time.perf_counter() - start:.1f}s", flush=True)
+
+    if args.lookup:
+        for customer_id in args.lookup:
+            start = time.perf_counter()
+            result = service.score(customer_id)
+            elapsed = (time.perf_counter() - start) * 1e3
+            print(json.dumps(result or {'customer_id': customer_id, 'error': 'unknown'}), f"# {elapsed:.2f} ms")
+        return
+
+    if args.reload_seconds > 0:
+        service.watch(args.reload_seconds)
+    serve(service, args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
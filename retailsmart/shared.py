@@ -0,0 +1,337 @@
+"""
+RetailSmart Shared Datasets
+===========================
+A serving mode for running several dashboard processes behind a load
+balancer without each one loading and holding its own copy of the data.
+
+One loader process publishes these as uncompressed Arrow IPC files:
+- the interned customers, sales, products, marketing and reviews tables;
+- the RFM features;
+- the churn/CLV scores;
+- the ID dictionaries.
+
+Every app.py worker started with RETAILSMART_SHARED=1 memory-maps them
+read-only. Their pages live once in the OS page cache and are shared by all
+workers, so adding a worker costs its own Python heap, not another copy of
+the tables.
+
+- Attaching copies almost nothing. Numeric and datetime columns, and
+  categorical codes, become read-only NumPy views of the mapping. Text
+  columns become Arrow-backed strings over the same buffers. Only the
+  categories and nullable-integer masks are copied.
+- The frames are built without consolidating their blocks, so pandas does
+  not copy the columns into 2-D blocks either.
+- Each publication is a directory named after the snapshot version and
+  publish time. CURRENT names the newest and is replaced atomically, and
+  the dashboard's artifact cache reloads when it changes. Workers still
+  mapping an older publication keep reading it until then, and only the
+  last --keep publications are left on disk.
+- Set RETAILSMART_SHARED_DIR to move the publications, e.g. onto /dev/shm to
+  keep them in RAM whatever the disk.
+
+Usage:
+    python -m retailsmart.shared                       # publish once
+    python -m retailsmart.shared --watch 30            # republish when the data changes
+    python -m retailsmart.shared --serve 4             # publish, then run dashboard workers on ports 8501-8504
+    RETAILSMART_SHARED=1 streamlit run app.py          # one worker attached to the publication
+    python benchmarks/bench_shared.py --workers 4      # RSS per worker and startup time, private vs shared
+"""
+
+import argparse
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from retailsmart.cache import fingerprint
+from retailsmart.features import STORE_PATH, refresh_store, rfm_frame
+from retailsmart.ids import load_registry, save_registry
+from retailsmart.instrumentation import span
+from retailsmart.paths import SHARED_DIR, TABLES, atomic_write
+from retailsmart.scoring import SCORES_PATH, load_scores
+from retailsmart.snapshot import load_interned_snapshot, refresh_snapshot, snapshot_version
+
+ENABLED = os.environ.get('RETAILSMART_SHARED', '0') != '0'
+CURRENT_PATH = os.path.join(SHARED_DIR, 'CURRENT')
+MANIFEST_NAME = 'manifest.json'
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+
+DATASETS = TABLES + ('features', 'scores')
+INDEX_COLUMN = '__index__'
+METADATA_KEY = b'retailsmart'
+DEFAULT_KEEP = 2
+DEFAULT_BASE_PORT = 8501
+
+
+# ========================
+# FRAME <-> ARROW
+# ========================
+# Columns are written so each one can be read back without a copy: plain
+# NumPy arrays keep NaN/NaT as values instead of Arrow nulls, datetimes are
+# stored as their int64 view and categoricals as codes plus a category list.
+def _arrow_column(values):
+    """(Arrow array, metadata) for one column, stored in a form that reads back zero-copy"""
+    dtype = values.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+        return pa.array(values.to_numpy()), {'kind': 'numpy'}
+    if isinstance(dtype, np.dtype) and dtype.kind in 'mM':
+        return pa.array(values.to_numpy().view(np.int64)), {'kind': 'datetime', 'dtype': str(dtype)}
+    if isinstance(dtype, pd.CategoricalDtype) and dtype.categories.dtype == object:
+        return pa.array(values.cat.codes.to_numpy()), {'kind': 'category', 'ordered': bool(dtype.ordered),
+                                                      'categories': dtype.categories.tolist()}
+    array = pa.array(values, from_pandas=True)
+    if dtype == object and pa.types.is_string(array.type):
+        return array, {'kind': 'string'}
+    return array, {'kind': 'arrow', 'dtype': str(dtype)}
+
+
+def _pandas_column(column, meta):
+    """Inverse of _arrow_column over a memory-mapped Arrow column"""
+    kind = meta['kind']
+    if kind in ('numpy', 'datetime', 'category'):
+        if column.num_chunks == 1:
+            values = column.chunk(0).to_numpy(zero_copy_only=True)
+        else:
+            values = column.to_numpy()
+        if kind == 'datetime':
+            return values.view(meta['dtype'])
+        if kind == 'category':
+            return pd.Categorical.from_codes(values, categories=meta['categories'], ordered=meta['ordered'])
+        return values
+    if kind == 'string':
+        return pd.arrays.ArrowStringArray(column)
+    # Nullable integers and anything else pandas knows how to rebuild from Arrow
+    dtype = pd.api.types.pandas_dtype(meta['dtype'])
+    if hasattr(dtype, '__from_arrow__'):
+        return dtype.__from_arrow__(column)
+    return column.to_pandas().to_numpy()
+
+
+def write_frame(df, path):
+    """Write a DataFrame as one uncompressed Arrow IPC file"""
+    arrays, names, columns = [], [], {}
+    index = None
+    if not isinstance(df.index, pd.RangeIndex):
+        array, meta = _arrow_column(df.index.to_series())
+        arrays.append(array)
+        names.append(INDEX_COLUMN)
+        index = dict(meta, name=df.index.name)
+    for name in df.columns:
+        array, columns[name] = _arrow_column(df[name])
+        arrays.append(array)
+        names.append(str(name))
+
+    metadata = {METADATA_KEY: json.dumps({'columns': columns, 'index': index, 'rows': len(df)})}
+    table = pa.Table.from_arrays(arrays, names=names, metadata=metadata)
+    with atomic_write(path) as tmp_path:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return os.path.getsize(path)
+
+
+def read_frame(path):
+    """Memory-map a file written by write_frame; the frame's columns are views of the mapping"""
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    meta = json.loads(table.schema.metadata[METADATA_KEY])
+    data = {name: _pandas_column(table.column(name), column_meta) for name, column_meta in meta['columns'].items()}
+    index = pd.RangeIndex(meta['rows'])
+    if meta['index'] is not None:
+        index = pd.Index(_pandas_column(table.column(INDEX_COLUMN), meta['index']), name=meta['index']['name'])
+    # copy=False keeps one block per column instead of consolidating into copies
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+# ========================
+# PUBLISH
+# ========================
+def publication_file(directory, name):
+    """Arrow file for one dataset in a publication"""
+    return os.path.join(directory, f'{name}.arrow')
+
+
+def source_stamp():
+    """What a publication was built from: snapshot version plus the feature store and scores files"""
+    files = fingerprint([STORE_PATH, SCORES_PATH])
+    return {'version': snapshot_version(), 'files': [list(stamp) for stamp in files]}
+
+
+def current_publication():
+    """Directory of the newest publication; FileNotFoundError if nothing is published"""
+    with open(CURRENT_PATH) as f:
+        return os.path.join(SHARED_DIR, f.read().strip())
+
+
+def read_manifest(directory=None):
+    """Manifest of a publication (the current one by default)"""
+    directory = directory or current_publication()
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def is_current():
+    """True if the current publication was built from today's snapshot, features and scores"""
+    try:
+        manifest = read_manifest()
+    except (OSError, ValueError):
+        return False
+    return manifest['source'] == source_stamp()
+
+
+def publish(keep=DEFAULT_KEEP):
+    """Write every dataset into a new publication and point CURRENT at it.
+
+    Returns the publication's manifest.
+    """
+    start = time.perf_counter()
+    *tables, data_source, registry = load_interned_snapshot()
+    store, _ = refresh_store()
+    frames = dict(zip(TABLES, tables))
+    frames['features'] = rfm_frame(store)
+    if os.path.exists(SCORES_PATH):
+        frames['scores'] = load_scores()
+
+    stamp = source_stamp()
+    name = f"{stamp['version']}-{time.strftime('%Y%m%dT%H%M%S')}"
+    directory = os.path.join(SHARED_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    datasets = {}
+    for dataset, df in frames.items():
+        with span('shared.write', dataset=dataset):
+            datasets[dataset] = {'rows': len(df), 'bytes': write_frame(df, publication_file(directory, dataset))}
+    save_registry(registry, directory)
+
+    manifest = {
+        'name': name,
+        'version': stamp['version'],
+        'source': stamp,
+        'data_source': data_source,
+        'datasets': datasets,
+        'published_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'seconds': time.perf_counter() - start,
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Written last so workers never see a half-written publication
+    with atomic_write(CURRENT_PATH) as tmp_path, open(tmp_path, 'w') as f:
+        f.write(name)
+    prune(keep)
+    return manifest
+
+
+def prune(keep=DEFAULT_KEEP):
+    """Delete all but the newest keep publications (never the current one).
+
+    Workers that still map a deleted file keep their pages until they
+    re-attach; the OS frees them after that.
+    """
+    manifests = [os.path.join(SHARED_DIR, entry, MANIFEST_NAME) for entry in os.listdir(SHARED_DIR)]
+    newest_first = sorted((path for path in manifests if os.path.isfile(path)), key=os.path.getmtime, reverse=True)
+    current = current_publication()
+    for path in newest_first[max(keep, 1):]:
+        directory = os.path.dirname(path)
+        if directory != current:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+# ========================
+# ATTACH
+# ========================
+def attach(dataset, directory=None):
+    """One published dataset as a frame over the memory-mapped file.
+
+    Returns None for an optional dataset (scores) that was not published.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"dataset must be one of {list(DATASETS)}")
+    directory = directory or current_publication()
+    path = publication_file(directory, dataset)
+    if dataset == 'scores' and not os.path.exists(path):
+        return None
+    return read_frame(path)
+
+
+def attach_snapshot(directory=None):
+    """Like snapshot.load_interned_snapshot, from the current publication.
+
+    Returns (customers, sales, products, marketing, reviews, data_source, registry);
+    the registry's dictionaries are memory-mapped as well.
+    """
+    directory = directory or current_publication()
+    manifest = read_manifest(directory)
+    tables = [attach(table, directory) for table in TABLES]
+    return (*tables, manifest['data_source'], load_registry(directory, mmap_mode='r'))
+
+
+def shared_version():
+    """Snapshot version of the current publication"""
+    return read_manifest()['version']
+
+
+# ========================
+# SERVE
+# ========================
+def start_workers(count, base_port=DEFAULT_BASE_PORT, extra_args=()):
+    """Start count dashboard processes attached to the publication, one port each"""
+    env = dict(os.environ, RETAILSMART_SHARED='1', RETAILSMART_SHARED_DIR=SHARED_DIR)
+    return [subprocess.Popen([sys.executable, '-m', 'streamlit', 'run', APP_PATH,
+                              '--server.port', str(base_port + i), '--server.headless', 'true', *extra_args],
+                             env=env)
+            for i in range(count)]
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Publish datasets for multi-process dashboard serving')
+    parser.add_argument('--watch', type=float, default=0, metavar='SECONDS',
+                        help='keep running and republish when the data changes')
+    parser.add_argument('--serve', type=int, default=0, metavar='WORKERS', help='dashboard processes to start')
+    parser.add_argument('--base-port', type=int, default=DEFAULT_BASE_PORT)
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help='publications to keep on disk')
+    parser.add_argument('--force', action='store_true', help='publish even if the current one is up to date')
+    args = parser.parse_args()
+
+    def refresh(force):
+        # Pick up changed sources and appended rows before comparing stamps
+        refresh_snapshot()
+        refresh_store()
+        if not force and is_current():
+            return
+        manifest = publish(keep=args.keep)
+        total = sum(d['bytes'] for d in manifest['datasets'].values())
+        print(f"Published {manifest['name']} ({total / 2**20:,.1f} MiB, "
+              f"{', '.join(manifest['datasets'])}) in {manifest['seconds']:.2f}s -> {SHARED_DIR}", flush=True)
+
+    refresh(args.force)
+    workers = start_workers(args.serve, args.base_port) if args.serve else []
+    if workers:
+        print(f"Started {len(workers)} dashboard workers on ports "
+              f"{args.base_port}-{args.base_port + len(workers) - 1}", flush=True)
+    if not args.watch and not workers:
+        return
+
+    # A service manager stops us with SIGTERM; exit through the finally below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            if workers and any(worker.poll() is not None for worker in workers):
+                raise SystemExit('A dashboard worker exited')
+            time.sleep(args.watch or 1.0)
+            if args.watch:
+                refresh(False)
+    finally:
+        for worker in workers:
+            worker.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+RetailSmart Streaming Sketches
+==============================
+Fixed-memory summaries that let the tooling work over files in chunks instead
+of loading whole tables:
+
+- ReservoirQuantiles: a uniform random sample of bounded size (Algorithm R),
+  giving approximate quantiles / medians with rank error around 1/sqrt(size).
+- HashedKeySet: exact membership over 64-bit row hashes, kept as a few sorted
+  uint64 runs (8 bytes per distinct key, no Python objects).
+- HyperLogLog: approximate distinct counts in 2**precision one-byte
+  registers (16 KB, ~0.8% error by default); sketches merge by max.
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SAMPLE_SIZE = 100_000
+DEFAULT_HLL_PRECISION = 14
+
+
+# ========================
+# QUANTILES
+# ========================
+class ReservoirQuantiles:
+    """Uniform reservoir sample of a numeric stream"""
+
+    def __init__(self, size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.size = size
+        self.count = 0
+        self.sample = np.empty(size, dtype=np.float64)
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        """Add a batch of values (NaN is ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        # Fill the reservoir first
+        filled = min(self.size - min(self.count, self.size), len(values))
+        if filled:
+            self.sample[self.count:self.count + filled] = values[:filled]
+        rest = values[filled:]
+        start = self.count + filled
+        self.count += len(values)
+        if len(rest) == 0:
+            return
+
+        # Item number t (1-based) replaces a random slot with probability size/t;
+        # later items overwrite earlier ones in the same slot, as in the serial loop
+        t = np.arange(start + 1, start + len(rest) + 1)
+        slots = (self.rng.random(len(rest)) * t).astype(np.int64)
+        keep = slots < self.size
+        self.sample[slots[keep]] = rest[keep]
+
+    def quantile(self, q):
+        """Approximate quantile(s) of everything seen so far (NaN if empty)"""
+        n = min(self.count, self.size)
+        if n == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        return np.quantile(self.sample[:n], q)
+
+    def median(self):
+        return self.quantile(0.5)
+
+    @property
+    def nbytes(self):
+        return self.sample.nbytes
+
+
+# ========================
+# DISTINCT KEYS
+# ========================
+def row_hashes(df):
+    """64-bit hash of each row's values (equal rows hash equal)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class HashedKeySet:
+    """Exact set of uint64 keys stored as sorted runs, merged log-structured style"""
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self.runs)
+
+    def _contains(self, keys):
+        found = np.zeros(len(keys), dtype=bool)
+        for run in self.runs:
+            positions = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+            found |= run[positions] == keys
+        return found
+
+    def add_new(self, keys):
+        """Insert keys; returns a mask of those not seen before (first occurrence only)"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        _, first = np.unique(keys, return_index=True)
+        is_new = np.zeros(len(keys), dtype=bool)
+        is_new[first] = True
+        if self.runs:
+            is_new &= ~self._contains(keys)
+
+        fresh = np.sort(keys[is_new])
+        if len(fresh):
+            self.runs.append(fresh)
+            # Keep run sizes geometric so lookups stay at O(log n) runs
+            while len(self.runs) > 1 and len(self.runs[-2]) <= 2 * len(self.runs[-1]):
+                last = self.runs.pop()
+                self.runs[-1] = np.union1d(self.runs[-1], last)
+        return is_new
+
+
+# ========================
+# DISTINCT COUNTS
+# ========================
+def value_hashes(values):
+    """64-bit hash per value (pandas' hash_array, as row_hashes uses)"""
+    return pd.util.hash_array(np.asarray(values))
+
+
+class HyperLogLog:
+    """Approximate distinct count of a stream of 64-bit hashes"""
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    def update_hashes(self, hashes):
+        """Add a batch of 64-bit hashes"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if len(hashes) == 0:
+            return
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Rank = position of the first 1 bit in the remaining 64 - p bits. They
+        # fit in a float64 mantissa, so frexp's exponent is their exact bit length
+        rank = (64 - p + 1 - np.frexp(rest.astype(np.float64))[1]).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def update(self, values):
+        """Add a batch of values (nulls are ignored)"""
+        values = pd.Series(values, copy=False)
+        self.update_hashes(value_hashes(values[values.notna()].to_numpy()))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """Estimated number of distinct values seen"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small cardinalities: linear counting over the empty registers
+            return m * np.log(m / zeros)
+        return float(estimate)
+
+    @property
+    def nbytes(self):
+        return self.registers.nbytes
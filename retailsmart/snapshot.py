@@ -0,0 +1,499 @@
+"""
+RetailSmart Columnar Snapshots
+==============================
+Converts the Phase 1 cleaned CSVs (or the Datasets/ fallback) into typed
+Feather files so the dashboard never has to re-parse five CSVs on a cold start.
+
+A snapshot is rebuilt only when its source file changes: the manifest keeps the
+source mtime, size and SHA-256, and a file that was merely touched is detected
+by its unchanged hash.
+
+An interned layer sits on top: the same tables with their 32-char hex ID
+columns replaced by shared int32 codes (see retailsmart.ids). It is rebuilt
+whenever any base table changes, since the ID dictionaries span all tables.
+Each build goes into its own directory, and interned/CURRENT is switched to it
+in one rename, so readers never pair new codes with an old dictionary.
+
+Usage:
+    python -m retailsmart.snapshot            # build / refresh
+    python -m retailsmart.snapshot --force    # rebuild everything
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from retailsmart.ids import intern_tables, load_registry, save_registry
+from retailsmart.instrumentation import span
+from retailsmart.paths import SNAPSHOT_DIR, TABLES, atomic_write, cleaned_file, dataset_file, temp_dir
+
+MANIFEST_PATH = os.path.join(SNAPSHOT_DIR, 'manifest.json')
+INTERNED_DIR = os.path.join(SNAPSHOT_DIR, 'interned')
+INTERNED_CURRENT_PATH = os.path.join(INTERNED_DIR, 'CURRENT')
+# Builds kept on disk: the current one plus the one before it, which a reader
+# that resolved CURRENT just before a swap may still be loading
+INTERNED_KEEP = 2
+# Marks a finished build; unfinished ones older than this were abandoned
+BUILD_DONE_NAME = 'VERSION'
+STALE_BUILD_SECONDS = 3600
+
+# Bump whenever the declared schema below changes so old snapshots get rebuilt
+SCHEMA_VERSION = 1
+
+SOURCE_LABELS = {
+    'cleaned': 'Phase 1 Cleaned Data',
+    'raw': 'Raw Dataset Files',
+}
+
+# ========================
+# DECLARED SCHEMA
+# ========================
+# Columns missing from a source are simply ignored, so one declaration covers
+# both the raw Datasets/ layout and the Phase 1 cleaned layout.
+TABLE_DTYPES = {
+    'customers': {
+        'customer_id': str,
+        'customer_unique_id': str,
+        'customer_zip_code_prefix': 'float64',
+        'customer_city': 'category',
+        'customer_state': 'category',
+        'state': 'category',
+        'total_orders': 'float64',
+        'total_spent': 'float64',
+        'days_since_last_order': 'float64',
+        'churn_flag': 'Int8',
+    },
+    'sales': {
+        'order_id': str,
+        'customer_id': str,
+        'product_id': str,
+        'category_english': 'category',
+        'price': 'float64',
+        'freight_value': 'float64',
+        'payment_type': 'category',
+        'payment_value': 'float64',
+        'total_price': 'float64',
+        'year': 'float64',
+        'month': 'float64',
+        'weekday': 'float64',
+    },
+    'products': {
+        'product_id': str,
+        'category_english': 'category',
+        'product_name_lenght': 'float32',
+        'product_description_lenght': 'float32',
+        'product_photos_qty': 'float32',
+    },
+    'marketing': {
+        'campaign_id': str,
+        'customer_id': str,
+        'channel': 'category',
+        'spend': 'float64',
+        'conversions': 'float64',
+        'response_rate': 'float32',
+        'spend_band': 'category',
+    },
+    'reviews': {
+        'review_id': str,
+        'order_id': str,
+        'customer_id': str,
+        'review_score': 'float32',
+        'review_comment_message': str,
+    },
+}
+
+# Parsed after reading: cleaned files carry placeholders such as 'unknown' or
+# 'Not delivered' in these columns, which become NaT in the snapshot.
+TABLE_DATES = {
+    'customers': ['last_order'],
+    'sales': ['order_purchase_timestamp', 'order_delivered_customer_date'],
+    'products': [],
+    'marketing': ['start_date'],
+    'reviews': [],
+}
+
+# City names are strings in the cleaned files but an all-null float in the raw
+# export, so they are categorised only when they turn out to be text.
+TEXT_CATEGORY_COLUMNS = {
+    'customers': ['city'],
+}
+
+
+# ========================
+# SOURCE RESOLUTION
+# ========================
+def resolve_sources():
+    """Pick the cleaned files if all five exist, otherwise the Datasets/ fallback"""
+    for kind, locate in (('cleaned', cleaned_file), ('raw', dataset_file)):
+        paths = {table: locate(table) for table in TABLES}
+        if all(os.path.exists(path) for path in paths.values()):
+            return kind, paths
+    raise FileNotFoundError(
+        'No complete set of source CSVs found in Exported_files/Phase-1/Cleaned Files/ or Datasets/'
+    )
+
+
+def snapshot_file(table):
+    """Feather snapshot path for a table"""
+    return os.path.join(SNAPSHOT_DIR, f'{table}.feather')
+
+
+def current_interned_dir():
+    """Directory of the current interned build, or None before the first build"""
+    try:
+        with open(INTERNED_CURRENT_PATH) as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(INTERNED_DIR, name)
+
+
+def interned_file(table, directory=None):
+    """Feather path for a table in an interned build (the current one by default).
+
+    Resolve current_interned_dir() once and pass it in when reading several
+    tables, so they all come from the same build.
+    """
+    return os.path.join(directory or current_interned_dir() or INTERNED_DIR, f'{table}.feather')
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Streaming SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ========================
+# APPEND WATERMARKS
+# ========================
+# Incremental consumers (RFM feature store, data-quality profiles) treat the
+# source CSVs as append-only: they remember how many bytes they have folded
+# and a hash of all of those bytes, and parse only what was appended since.
+# The whole prefix is hashed: an edit anywhere in the folded rows must count
+# as a rewrite, or the consumer would silently drift from its source.
+def _hash_from(f, digest, size, block_size=1 << 20):
+    """Feed the next size bytes of an open file into digest, in blocks"""
+    remaining = size
+    while remaining > 0:
+        block = f.read(min(block_size, remaining))
+        if not block:
+            break
+        digest.update(block)
+        remaining -= len(block)
+    return digest
+
+
+def prefix_sha256(path, size):
+    """Streaming SHA-256 of exactly the first size bytes of a file"""
+    with open(path, 'rb') as f:
+        return _hash_from(f, hashlib.sha256(), size).hexdigest()
+
+
+def source_watermark(path, rows):
+    """What a consumer has folded of a source: path, rows, bytes, mtime and prefix hash"""
+    stat = os.stat(path)
+    return {'path': path, 'rows': rows, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'prefix_sha256': prefix_sha256(path, stat.st_size)}
+
+
+def is_append_of(watermark, path):
+    """True if path is the watermarked file with (possibly) rows appended"""
+    if not watermark or watermark.get('path') != path or not os.path.exists(path):
+        return False
+    if os.path.getsize(path) < watermark['size']:
+        return False
+    return prefix_sha256(path, watermark['size']) == watermark['prefix_sha256']
+
+
+# ========================
+# MANIFEST
+# ========================
+def read_manifest():
+    """Load the snapshot manifest, or an empty one"""
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'schema_version': SCHEMA_VERSION, 'tables': {}}
+    if manifest.get('schema_version') != SCHEMA_VERSION:
+        return {'schema_version': SCHEMA_VERSION, 'tables': {}}
+    return manifest
+
+
+def write_manifest(manifest):
+    """Atomically write the snapshot manifest"""
+    with atomic_write(MANIFEST_PATH) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def is_fresh(entry, source_path):
+    """Check a manifest entry against its source file.
+
+    Returns (fresh, updated_entry). A matching mtime and size is trusted as-is;
+    otherwise the file is hashed so a touched-but-identical file does not
+    trigger a rebuild.
+    """
+    if not entry or entry.get('source') != source_path:
+        return False, entry
+    if not os.path.exists(entry.get('snapshot', '')):
+        return False, entry
+
+    stat = os.stat(source_path)
+    if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+        return True, entry
+    if entry['size'] != stat.st_size:
+        return False, entry
+    if file_sha256(source_path) != entry['sha256']:
+        return False, entry
+
+    entry = dict(entry, mtime_ns=stat.st_mtime_ns)
+    return True, entry
+
+
+# ========================
+# BUILD / LOAD
+# ========================
+def read_source_csv(table, path, offset=0):
+    """Parse a source CSV with the declared dtypes.
+
+    A non-zero offset parses only the rows starting at that byte position
+    (a row boundary), reusing the header from the top of the file.
+    """
+    if offset:
+        with open(path, 'rb') as f:
+            header = pd.read_csv(f, nrows=0).columns
+            f.seek(offset)
+            df = pd.read_csv(f, header=None, names=header, dtype=TABLE_DTYPES[table], low_memory=False)
+    else:
+        df = pd.read_csv(path, dtype=TABLE_DTYPES[table], low_memory=False)
+    return _typed_source_frame(table, df)
+
+
+def read_appended(table, path, watermark=None):
+    """Parse the rows appended to a source since a watermark (all rows if None).
+
+    Returns (rows, watermark) with the watermark moved past those rows, or None
+    if path is not the watermarked file with rows appended. The prefix is hashed
+    once and the same hash carries on over the new bytes, which are read only
+    once for both hashing and parsing. When reading an append, a last line
+    still being written (no newline yet) is left for the next call.
+    """
+    if watermark is None:
+        watermark = {'path': path, 'rows': 0, 'size': 0, 'prefix_sha256': hashlib.sha256().hexdigest()}
+    if watermark.get('path') != path or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        digest = _hash_from(f, hashlib.sha256(), watermark['size'])
+        if f.tell() != watermark['size'] or digest.hexdigest() != watermark['prefix_sha256']:
+            return None
+        appended = f.read()
+        if watermark['size']:
+            appended = appended[:appended.rfind(b'\n') + 1]
+            f.seek(0)
+            header = pd.read_csv(f, nrows=0).columns
+    digest.update(appended)
+
+    dtype = TABLE_DTYPES[table]
+    if not watermark['size']:
+        df = pd.read_csv(io.BytesIO(appended), dtype=dtype, low_memory=False)
+    elif appended:
+        df = pd.read_csv(io.BytesIO(appended), header=None, names=header, dtype=dtype, low_memory=False)
+    else:
+        df = pd.read_csv(path, nrows=0, dtype=dtype)
+    watermark = {'path': path, 'rows': watermark['rows'] + len(df), 'size': watermark['size'] + len(appended),
+                 'prefix_sha256': digest.hexdigest()}
+    return _typed_source_frame(table, df), watermark
+
+
+def _typed_source_frame(table, df):
+    """Parse the declared date columns and turn low-cardinality text into categories"""
+    for col in TABLE_DATES[table]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+
+    for col in TEXT_CATEGORY_COLUMNS.get(table, []):
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype('category')
+
+    return df
+
+
+def build_table(table, source_path):
+    """Convert one source CSV into its Feather snapshot and return the manifest entry"""
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    stat = os.stat(source_path)
+    sha256 = file_sha256(source_path)
+
+    df = read_source_csv(table, source_path)
+    target = snapshot_file(table)
+    with atomic_write(target) as tmp_path:
+        df.reset_index(drop=True).to_feather(tmp_path)
+
+    return {
+        'source': source_path,
+        'snapshot': target,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'sha256': sha256,
+        'rows': len(df),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def refresh_snapshot(force=False):
+    """Bring every table snapshot up to date with its source.
+
+    Returns (source_kind, {table: rebuilt}).
+    """
+    kind, sources = resolve_sources()
+    manifest = read_manifest()
+    before = json.dumps(manifest, sort_keys=True)
+    rebuilt = {}
+
+    for table in TABLES:
+        entry = manifest['tables'].get(table)
+        fresh, entry = (False, entry) if force else is_fresh(entry, sources[table])
+        if not fresh:
+            with span('snapshot.build_table', table=table):
+                entry = build_table(table, sources[table])
+        manifest['tables'][table] = entry
+        rebuilt[table] = not fresh
+
+    manifest['source_kind'] = kind
+    # Readers call this on every load; leave the file alone when nothing changed
+    if json.dumps(manifest, sort_keys=True) != before:
+        write_manifest(manifest)
+    return kind, rebuilt
+
+
+def snapshot_version():
+    """Short digest identifying the current snapshot contents and layout"""
+    manifest = read_manifest()
+    # The schema version is part of it: a schema bump changes every table's
+    # layout, so artifacts stamped before it must not count as current
+    digest = hashlib.sha256(f'schema:{SCHEMA_VERSION}'.encode())
+    for table in TABLES:
+        digest.update(manifest['tables'].get(table, {}).get('sha256', '').encode())
+    return digest.hexdigest()[:12]
+
+
+def load_table(table):
+    """Read one table from its snapshot"""
+    return pd.read_feather(snapshot_file(table))
+
+
+def load_snapshot():
+    """Refresh if needed and load all five tables.
+
+    Returns (customers, sales, products, marketing, reviews, data_source) in the
+    same shape the dashboard's loader always returned.
+    """
+    kind, _ = refresh_snapshot()
+    tables = [load_table(table) for table in TABLES]
+    return (*tables, SOURCE_LABELS[kind])
+
+
+# ========================
+# INTERNED LAYER
+# ========================
+def interned_build_version(directory):
+    """Snapshot version a finished interned build was made from, or None"""
+    try:
+        with open(os.path.join(directory, BUILD_DONE_NAME)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def refresh_interned(force=False):
+    """Rebuild the interned layer if the base snapshot changed. Returns True if rebuilt"""
+    version = snapshot_version()
+    current = current_interned_dir()
+    if not force and current is not None and interned_build_version(current) == version:
+        return False
+
+    # Nothing in the new directory is visible to readers until CURRENT points
+    # at it, so its files are written in place
+    directory = temp_dir(os.path.join(INTERNED_DIR, version))
+    try:
+        interned, registry = intern_tables({table: load_table(table) for table in TABLES})
+        for table, df in interned.items():
+            df.to_feather(interned_file(table, directory))
+        save_registry(registry, directory)
+        with open(os.path.join(directory, BUILD_DONE_NAME), 'w') as f:
+            f.write(version)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    with atomic_write(INTERNED_CURRENT_PATH) as tmp_path, open(tmp_path, 'w') as f:
+        f.write(os.path.basename(directory))
+    prune_interned()
+    return True
+
+
+def prune_interned(keep=INTERNED_KEEP):
+    """Delete finished builds past the newest keep (never the current one), and
+    unfinished ones left behind by a crashed build"""
+    current = current_interned_dir()
+    finished, now = [], time.time()
+    for entry in os.scandir(INTERNED_DIR):
+        if entry.path == current:
+            continue
+        if not entry.is_dir():
+            # Files of the old single-directory layout
+            if entry.name != os.path.basename(INTERNED_CURRENT_PATH) and '.tmp' not in entry.name:
+                os.remove(entry.path)
+        elif interned_build_version(entry.path) is not None:
+            finished.append(entry.path)
+        elif now - entry.stat().st_mtime > STALE_BUILD_SECONDS:
+            shutil.rmtree(entry.path, ignore_errors=True)
+    finished.sort(key=os.path.getmtime, reverse=True)
+    for directory in finished[max(keep, 1) - 1:]:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def load_interned_snapshot():
+    """Like load_snapshot, but with hex IDs interned to int32 codes.
+
+    Returns (customers, sales, products, marketing, reviews, data_source, registry);
+    use registry.decode / decode_frame to show IDs as hex again.
+    """
+    kind, _ = refresh_snapshot()
+    refresh_interned()
+    directory = current_interned_dir()
+    tables = [pd.read_feather(interned_file(table, directory)) for table in TABLES]
+    return (*tables, SOURCE_LABELS[kind], load_registry(directory))
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Build RetailSmart columnar snapshots')
+    parser.add_argument('--force', action='store_true', help='rebuild every table')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    kind, rebuilt = refresh_snapshot(force=args.force)
+    interned_rebuilt = refresh_interned(force=args.force)
+    elapsed = time.perf_counter() - start
+
+    print(f"Source: {SOURCE_LABELS[kind]}")
+    for table, was_rebuilt in rebuilt.items():
+        print(f"  {table:<10} {'rebuilt' if was_rebuilt else 'up to date'}")
+    print(f"  {'interned':<10} {'rebuilt' if interned_rebuilt else 'up to date'}")
+    print(f"Done in {elapsed:.2f}s -> {SNAPSHOT_DIR}")
+
+
+if __name__ == '__main__':
+    main()
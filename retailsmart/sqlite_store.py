@@ -0,0 +1,398 @@
+"""
+RetailSmart SQLite Store
+========================
+Bulk-loads the five snapshot tables into one SQLite database and answers the
+dashboard's analytical queries from it, as an alternative to the in-memory
+pandas/cube path (set RETAILSMART_BACKEND=sqlite for the dashboard).
+
+Compared with the schema in Scripts/Data_Cleaning.sql:
+
+- timestamps are stored as Unix epoch seconds in DATETIME columns instead of
+  VARCHAR, so range predicates and ORDER BY work on integers
+  (datetime(col, 'unixepoch') renders them)
+- sales gets covering indexes on (customer_id, order_purchase_timestamp) and
+  (category_english, order_purchase_timestamp), plus one on the timestamp
+  alone for date-range KPIs; each carries the columns the queries read, so
+  they are answered from the index without touching the table
+- a daily_sales table (revenue, distinct orders, line items per day) is
+  materialised at load time, so range KPIs and trends read a few hundred
+  rows; an order has one purchase timestamp, so daily distinct-order counts
+  add up across any range
+- the load is one transaction of batched executemany() calls in WAL mode,
+  with indexes created after the rows are in, then ANALYZE
+
+The database is rebuilt whenever the snapshot version changes. It is built in
+a temp file and swapped in with os.replace; the built file is left in
+rollback-journal mode, so no -wal/-shm files are tied to the path across the
+swap. Rows repeating a primary key keep the last one, as the cleaned CSVs
+would on a re-import, and the dropped rows are counted in the meta table.
+
+Usage:
+    python -m retailsmart.sqlite_store            # build if stale
+    python -m retailsmart.sqlite_store --force
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.cube import GROWTH_WINDOW_DAYS, _growth
+from retailsmart.paths import SQLITE_DIR, TABLES, atomic_write
+from retailsmart.snapshot import load_table, refresh_snapshot, snapshot_version
+
+DB_PATH = os.path.join(SQLITE_DIR, 'retailsmart.db')
+BATCH_ROWS = 50_000
+DAY_SECONDS = 86400
+
+PRIMARY_KEYS = {'customers': 'customer_id', 'products': 'product_id'}
+
+INDEXES = [
+    ('sales', 'CREATE INDEX idx_sales_customer_ts ON sales (customer_id, order_purchase_timestamp, total_price, order_id)'),
+    ('sales', 'CREATE INDEX idx_sales_category_ts ON sales (category_english, order_purchase_timestamp, total_price)'),
+    ('sales', 'CREATE INDEX idx_sales_ts ON sales (order_purchase_timestamp, total_price, order_id)'),
+    ('marketing', 'CREATE INDEX idx_marketing_customer ON marketing (customer_id)'),
+    ('reviews', 'CREATE INDEX idx_reviews_order ON reviews (order_id)'),
+]
+
+DAILY_SALES_SQL = '''
+    CREATE TABLE daily_sales AS
+    SELECT (order_purchase_timestamp / 86400) * 86400 AS day,
+           SUM(total_price) AS revenue,
+           COUNT(DISTINCT order_id) AS orders,
+           COUNT(*) AS items
+    FROM sales WHERE order_purchase_timestamp IS NOT NULL
+    GROUP BY 1 ORDER BY 1'''
+
+# Parameterised statements; sqlite3 keeps them prepared per connection
+QUERIES = {
+    'bounds': 'SELECT MIN(day), MAX(day) FROM daily_sales',
+    'totals': '''
+        SELECT COALESCE(SUM(revenue), 0), COALESCE(SUM(orders), 0), COALESCE(SUM(items), 0)
+        FROM daily_sales WHERE day >= ? AND day < ?''',
+    'latest': '''
+        SELECT MAX(day) FROM daily_sales WHERE day >= ? AND day < ? AND orders > 0''',
+    'by_category': '''
+        SELECT COALESCE(category_english, 'unknown'), SUM(total_price)
+        FROM sales WHERE order_purchase_timestamp >= ? AND order_purchase_timestamp < ?
+        GROUP BY 1''',
+    'category_series': '''
+        SELECT (order_purchase_timestamp / 86400) * 86400, SUM(total_price)
+        FROM sales WHERE category_english = ?
+          AND order_purchase_timestamp >= ? AND order_purchase_timestamp < ?
+        GROUP BY 1 ORDER BY 1''',
+    'daily': '''
+        SELECT day, revenue, orders FROM daily_sales WHERE day >= ? AND day < ? ORDER BY day''',
+    'customer_history': '''
+        SELECT order_purchase_timestamp, order_id, total_price
+        FROM sales WHERE customer_id = ? ORDER BY order_purchase_timestamp''',
+}
+
+
+# ========================
+# SCHEMA / LOAD
+# ========================
+def _sql_type(dtype):
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'DATETIME'
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def create_table_sql(table, df):
+    """CREATE TABLE statement for a frame's columns"""
+    columns = []
+    for col, dtype in df.dtypes.items():
+        definition = f'"{col}" {_sql_type(dtype)}'
+        if PRIMARY_KEYS.get(table) == col:
+            definition += ' PRIMARY KEY'
+        columns.append(definition)
+    return f'CREATE TABLE {table} ({", ".join(columns)})'
+
+
+def _column_values(series):
+    """One column as a list of Python values SQLite can bind (None for missing)"""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        seconds = series.to_numpy(dtype='datetime64[s]').astype(np.int64)
+        return np.where(series.isna().to_numpy(), None, seconds).tolist()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if series.dtype == object or pd.api.types.is_extension_array_dtype(series.dtype):
+        return series.astype(object).where(series.notna(), None).tolist()
+    # NaN floats are stored as NULL by SQLite itself
+    return series.tolist()
+
+
+def drop_duplicate_keys(table, df):
+    """Keep the last row of each repeated primary key. Returns (df, rows dropped)"""
+    key = PRIMARY_KEYS.get(table)
+    if key not in df.columns:
+        return df, 0
+    repeated = (df[key].duplicated(keep='last') & df[key].notna()).to_numpy()
+    return (df[~repeated], int(repeated.sum())) if repeated.any() else (df, 0)
+
+
+def insert_rows(conn, table, df, batch_rows=BATCH_ROWS):
+    """Batched executemany; the caller owns the transaction.
+
+    A plain INSERT: a primary key conflict raises instead of silently
+    replacing a row (drop_duplicate_keys first).
+    """
+    placeholders = ', '.join('?' * len(df.columns))
+    insert = f'INSERT INTO {table} VALUES ({placeholders})'
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        conn.executemany(insert, zip(*[_column_values(batch[col]) for col in batch.columns]))
+
+
+def build_database(tables, path=DB_PATH, version=None, batch_rows=BATCH_ROWS):
+    """Load {table: DataFrame} into a fresh database at path"""
+    with atomic_write(path) as tmp_path:
+        _fill_database(tmp_path, tables, version, batch_rows)
+    # Left by builds that kept WAL mode; the new file never uses them
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return path
+
+
+def _fill_database(tmp_path, tables, version, batch_rows):
+    """Create and load the database file at tmp_path"""
+    conn = sqlite3.connect(tmp_path, isolation_level=None)
+    try:
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-262144')
+
+        conn.execute('BEGIN')
+        conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        duplicates = {}
+        for table, df in tables.items():
+            df, duplicates[table] = drop_duplicate_keys(table, df)
+            conn.execute(create_table_sql(table, df))
+            insert_rows(conn, table, df, batch_rows)
+        for table, statement in INDEXES:
+            if table in tables:
+                conn.execute(statement)
+        if 'sales' in tables:
+            conn.execute(DAILY_SALES_SQL)
+            conn.execute('CREATE UNIQUE INDEX idx_daily_sales_day ON daily_sales (day, revenue, orders, items)')
+        conn.execute("INSERT INTO meta VALUES ('snapshot_version', ?)", (version or '',))
+        conn.execute("INSERT INTO meta VALUES ('duplicate_keys', ?)",
+                     (json.dumps({table: n for table, n in duplicates.items() if n}),))
+        conn.execute('COMMIT')
+
+        conn.execute('ANALYZE')
+        # Back to a single self-contained file before it is swapped in, so
+        # readers never pair it with another build's -wal/-shm
+        conn.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        conn.close()
+
+
+def _meta_value(key, path):
+    if not os.path.exists(path):
+        return None
+    try:
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        try:
+            row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+
+
+def database_version(path=DB_PATH):
+    """Snapshot version the database was built from, or None"""
+    return _meta_value('snapshot_version', path)
+
+
+def duplicate_keys(path=DB_PATH):
+    """{table: rows dropped for repeating a primary key} of the last build"""
+    return json.loads(_meta_value('duplicate_keys', path) or '{}')
+
+
+def refresh_database(force=False, path=DB_PATH):
+    """Rebuild the database if the snapshot changed. Returns True if rebuilt"""
+    refresh_snapshot()
+    version = snapshot_version()
+    if not force and database_version(path) == version:
+        return False
+    build_database({table: load_table(table) for table in TABLES}, path, version)
+    return True
+
+
+# ========================
+# QUERIES
+# ========================
+def _epoch(value):
+    return int(pd.Timestamp(value).value // 10 ** 9)
+
+
+class _ThreadConnection:
+    """Holds one thread's connection; freed (and the connection closed) with the thread"""
+
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class SqliteAnalytics:
+    """Date-range analytics over the SQLite store, with the DailyCube query interface"""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = weakref.WeakSet()
+        low, high = self.execute('bounds').fetchone()
+        if low is None:
+            low = high = _epoch(pd.Timestamp.today().normalize())
+        self.days = pd.date_range(pd.to_datetime(low, unit='s').normalize(),
+                                  pd.to_datetime(high, unit='s').normalize(), freq='D')
+
+    @property
+    def connection(self):
+        """One read-only connection per thread (Streamlit serves sessions on threads)"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None or holder.conn is None:
+            holder = _ThreadConnection(sqlite3.connect(f'file:{self.path}?mode=ro', uri=True,
+                                                       check_same_thread=False))
+            self._local.holder = holder
+            with self._lock:
+                self._open.add(holder)
+        return holder.conn
+
+    def close(self):
+        """Close every thread's connection; a later query reopens one"""
+        with self._lock:
+            holders = list(self._open)
+            self._open.clear()
+        for holder in holders:
+            conn, holder.conn = holder.conn, None
+            if conn is not None:
+                conn.close()
+
+    def execute(self, name, params=()):
+        return self.connection.execute(QUERIES[name], params)
+
+    def _range(self, start, end):
+        """Half-open epoch range covering start..end inclusive, by whole days"""
+        return _epoch(pd.Timestamp(start).normalize()), _epoch(pd.Timestamp(end).normalize()) + DAY_SECONDS
+
+    def totals(self, start, end):
+        revenue, orders, items = self.execute('totals', self._range(start, end)).fetchone()
+        return {'revenue': revenue, 'orders': orders, 'items': items,
+                'aov': revenue / orders if orders > 0 else 0}
+
+    def by_category(self, start, end):
+        rows = self.execute('by_category', self._range(start, end)).fetchall()
+        return pd.DataFrame(rows, columns=['category_english', 'revenue'])
+
+    def series(self, start, end, freq='M'):
+        rows = self.execute('daily', self._range(start, end)).fetchall()
+        daily = pd.DataFrame(rows, columns=['date', 'revenue', 'orders'])
+        daily['date'] = pd.to_datetime(daily['date'], unit='s')
+        if freq == 'D' or daily.empty:
+            return daily
+        grouped = daily.groupby(daily['date'].dt.to_period(freq))[['revenue', 'orders']].sum()
+        grouped.index = grouped.index.to_timestamp()
+        return grouped.rename_axis('date').reset_index()
+
+    def kpis(self, start, end):
+        """Same definitions as DailyCube.kpis: 30-day windows ending at the last active day"""
+        low, high = self._range(start, end)
+        totals = self.totals(start, end)
+        kpis = {
+            'total_revenue': totals['revenue'],
+            'revenue_growth': 0,
+            'total_orders': totals['orders'],
+            'orders_growth': 0,
+            'avg_order_value': totals['aov'],
+            'aov_growth': 0,
+        }
+        latest = self.execute('latest', (low, high)).fetchone()[0]
+        if latest is None:
+            return kpis
+
+        # Both windows are bounded below by the range start, like DailyCube.kpis
+        window = GROWTH_WINDOW_DAYS * DAY_SECONDS
+        latest_end = (latest // DAY_SECONDS + 1) * DAY_SECONDS
+        recent_start = max(latest_end - window, low)
+        previous_start = max(latest_end - 2 * window, low)
+        recent = self.execute('totals', (recent_start, latest_end)).fetchone()
+        previous = self.execute('totals', (previous_start, recent_start)).fetchone()
+
+        recent_aov = recent[0] / recent[1] if recent[1] > 0 else 0
+        previous_aov = previous[0] / previous[1] if previous[1] > 0 else 0
+        kpis['revenue_growth'] = _growth(recent[0], previous[0])
+        kpis['orders_growth'] = _growth(recent[1], previous[1])
+        kpis['aov_growth'] = _growth(recent_aov, previous_aov)
+        return kpis
+
+    def category_series(self, category, start, end):
+        """Daily revenue of one category (uses the category covering index)"""
+        low, high = self._range(start, end)
+        rows = self.execute('category_series', (category, low, high)).fetchall()
+        frame = pd.DataFrame(rows, columns=['date', 'revenue'])
+        frame['date'] = pd.to_datetime(frame['date'], unit='s')
+        return frame
+
+    def customer_history(self, customer_id):
+        """Every sales line of one customer in date order (uses the customer covering index)"""
+        rows = self.execute('customer_history', (customer_id,)).fetchall()
+        frame = pd.DataFrame(rows, columns=['order_purchase_timestamp', 'order_id', 'total_price'])
+        frame['order_purchase_timestamp'] = pd.to_datetime(frame['order_purchase_timestamp'], unit='s')
+        return frame
+
+
+_latest = {}
+_latest_lock = threading.Lock()
+
+
+def open_analytics(path=DB_PATH):
+    """SqliteAnalytics over the database at path, closing the one opened before it.
+
+    Callers that cache one instance per data version would otherwise keep the
+    superseded instance's connections open until it is evicted.
+    """
+    analytics = SqliteAnalytics(path)
+    with _latest_lock:
+        previous, _latest[path] = _latest.get(path), analytics
+    if previous is not None:
+        previous.close()
+    return analytics
+
+
+# ========================
+# CLI
+# ========================
+def main():
+    parser = argparse.ArgumentParser(description='Build the RetailSmart SQLite store')
+    parser.add_argument('--force', action='store_true', help='rebuild even if up to date')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rebuilt = refresh_database(force=args.force)
+    elapsed = time.perf_counter() - start
+    status = 'rebuilt' if rebuilt else 'up to date'
+    print(f"SQLite store {status} in {elapsed:.2f}s -> {DB_PATH}")
+    for table, dropped in duplicate_keys().items():
+        print(f"  {table}: {dropped:,} rows dropped for a repeated {PRIMARY_KEYS[table]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Shared fixtures: a small synthetic dataset in a scratch project root.
+
+RETAILSMART_ROOT is pointed at a temporary directory before any retailsmart
+module is imported, so nothing the tests build (snapshots, stores, profiles)
+lands in the checkout.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = tempfile.mkdtemp(prefix='retailsmart-tests-')
+os.environ['RETAILSMART_ROOT'] = ROOT
+os.environ['RETAILSMART_METRICS'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retailsmart.ids import intern_tables  # noqa: E402
+from retailsmart.snapshot import read_source_csv  # noqa: E402
+from retailsmart.synthetic import generate  # noqa: E402
+
+TEST_ORDERS = 3000
+TEST_SEED = 7
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(ROOT, ignore_errors=True)
+
+
+@pytest.fixture(scope='session')
+def dataset_dir():
+    """Datasets/ of the scratch root, filled by the synthetic generator"""
+    generate(ROOT, n_orders=TEST_ORDERS, seed=TEST_SEED, marketing_rate=0.5)
+    return os.path.join(ROOT, 'Datasets')
+
+
+@pytest.fixture(scope='session')
+def tables(dataset_dir):
+    """{table: typed DataFrame} as the snapshot reads them"""
+    return {table: read_source_csv(table, os.path.join(dataset_dir, f'{table}.csv'))
+            for table in ('customers', 'sales', 'products', 'marketing')}
+
+
+@pytest.fixture(scope='session')
+def interned(tables):
+    """(tables with int32 ID codes, registry)"""
+    return intern_tables(tables)
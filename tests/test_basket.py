@@ -0,0 +1,76 @@
+"""Market basket: Eclat itemset supports against brute-force counting"""
+
+import itertools
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retailsmart.basket import Transactions, association_rules, frequent_itemsets
+
+
+def brute_force_supports(baskets, min_count, max_len):
+    """Orders containing each itemset, by enumerating every subset of every basket"""
+    counts = Counter()
+    for items in baskets:
+        for size in range(1, min(max_len, len(items)) + 1):
+            counts.update(itertools.combinations(sorted(items), size))
+    return {itemset: n for itemset, n in counts.items() if n >= min_count}
+
+
+def random_sales(seed=0, n_orders=600, n_items=12):
+    """Order lines with correlated items, some repeated within an order"""
+    rng = np.random.default_rng(seed)
+    popularity = np.linspace(2, 1, n_items)
+    popularity /= popularity.sum()
+    rows = []
+    for order in range(n_orders):
+        items = rng.choice(n_items, size=rng.integers(1, 6), p=popularity)
+        if 0 in items and rng.random() < 0.7:
+            items = np.append(items, [1, 2])
+        rows += [(f'o{order}', f'item{item:02d}') for item in items]
+    return pd.DataFrame(rows, columns=['order_id', 'category_english'])
+
+
+def labelled(itemsets, labels):
+    return {tuple(labels[i] for i in itemset): count for itemset, count in itemsets.items()}
+
+
+@pytest.mark.parametrize('min_support, max_len', [(0.02, 4), (0.05, 3), (0.1, 2)])
+def test_eclat_supports_match_brute_force(min_support, max_len):
+    sales = random_sales()
+    transactions = Transactions.from_sales(sales, level='category')
+    itemsets = frequent_itemsets(transactions, min_support, max_len)
+
+    baskets = sales.groupby('order_id')['category_english'].agg(set)
+    min_count = int(np.ceil(min_support * len(baskets)))
+    expected = brute_force_supports(baskets, min_count, max_len)
+    assert labelled(itemsets, transactions.items) == expected
+    assert max(len(itemset) for itemset in expected) == max_len
+
+
+def test_synthetic_category_baskets(tables):
+    sales = tables['sales']
+    transactions = Transactions.from_sales(sales, level='category')
+    itemsets = frequent_itemsets(transactions, min_support=0.001, max_len=3)
+
+    known = sales.dropna(subset=['category_english'])
+    baskets = known.groupby('order_id')['category_english'].agg(set)
+    assert transactions.n_orders == len(baskets)
+    expected = brute_force_supports(baskets, int(np.ceil(0.001 * len(baskets))), 3)
+    assert labelled(itemsets, transactions.items) == expected
+
+
+def test_rule_metrics_follow_from_supports():
+    sales = random_sales(seed=1)
+    transactions = Transactions.from_sales(sales, level='category')
+    itemsets = frequent_itemsets(transactions, 0.02, 3)
+    rules = association_rules(itemsets, transactions.n_orders, transactions.items, min_lift=0.0)
+    by_label = labelled(itemsets, transactions.items)
+    n = transactions.n_orders
+    for rule in rules.itertuples():
+        union = tuple(sorted(rule.antecedents + rule.consequents))
+        assert rule.support == pytest.approx(by_label[union] / n)
+        assert rule.confidence == pytest.approx(by_label[union] / by_label[tuple(rule.antecedents)])
+        assert rule.lift == pytest.approx(rule.confidence / (by_label[tuple(rule.consequents)] / n))
@@ -0,0 +1,68 @@
+"""Cohort matrix against a groupby reference, on hex and interned IDs"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retailsmart.cohorts import CohortMatrix
+from retailsmart.features import KEY
+
+
+def reference_cohorts(sales, customers):
+    """Active customers, orders and revenue per (cohort month, months since), with groupbys"""
+    person = sales['customer_id'].map(customers.drop_duplicates('customer_id').set_index('customer_id')[KEY])
+    df = sales.assign(person=person.fillna(sales['customer_id']),
+                      month=sales['order_purchase_timestamp'].dt.to_period('M'))
+    df['cohort'] = df.groupby('person')['month'].transform('min')
+    df['age'] = (df['month'] - df['cohort']).apply(lambda offset: offset.n)
+    cells = df.groupby(['cohort', 'age']).agg(customers=('person', 'nunique'), orders=('order_id', 'nunique'),
+                                              revenue=('total_price', 'sum'))
+    orders_per_person = df.groupby('person')['order_id'].nunique()
+    repeat = df.drop_duplicates('person').set_index('person')['cohort'][orders_per_person > 1].value_counts()
+    return cells, repeat
+
+
+def assert_matches_reference(matrix, cells, repeat):
+    months = matrix.months.to_period('M')
+    cohort = months.get_indexer(cells.index.get_level_values('cohort'))
+    age = cells.index.get_level_values('age').to_numpy()
+    assert (cohort >= 0).all()
+    for metric in ('customers', 'orders', 'revenue'):
+        np.testing.assert_allclose(getattr(matrix, metric)[cohort, age], cells[metric].to_numpy())
+        # Every other cell is empty
+        assert getattr(matrix, metric).sum() == pytest.approx(cells[metric].sum())
+    np.testing.assert_array_equal(matrix.repeat_customers[months.get_indexer(repeat.index)], repeat.to_numpy())
+    assert matrix.repeat_customers.sum() == repeat.sum()
+
+
+@pytest.fixture(scope='module')
+def reference(tables):
+    return reference_cohorts(tables['sales'], tables['customers'])
+
+
+def test_matrix_matches_groupby(tables, reference):
+    matrix = CohortMatrix.from_sales(tables['sales'], tables['customers'])
+    assert_matches_reference(matrix, *reference)
+
+
+def test_interned_ids_give_the_same_matrix(tables, interned, reference):
+    interned_tables, _ = interned
+    matrix = CohortMatrix.from_sales(interned_tables['sales'], interned_tables['customers'])
+    assert_matches_reference(matrix, *reference)
+
+
+def test_retention_frame(tables):
+    matrix = CohortMatrix.from_sales(tables['sales'], tables['customers'])
+    retention = matrix.frame('retention')
+    np.testing.assert_allclose(retention[0].to_numpy(), 1.0)
+    # Cells a cohort has not reached yet are NaN, not 0
+    assert retention.iloc[-1, 1:].isna().all()
+    assert (retention.fillna(0).to_numpy() <= 1.0).all()
+
+
+def test_no_sales():
+    sales = pd.DataFrame({'order_id': pd.Series(dtype=object), 'customer_id': pd.Series(dtype=object),
+                          'order_purchase_timestamp': pd.Series(dtype='datetime64[ns]'),
+                          'total_price': pd.Series(dtype=np.float64)})
+    matrix = CohortMatrix.from_sales(sales)
+    assert len(matrix.months) == 0 and matrix.frame('retention').empty
@@ -0,0 +1,92 @@
+"""DailyCube KPIs and slices against a pandas rescan of the sales rows"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retailsmart.cube import GROWTH_WINDOW_DAYS, DailyCube
+
+
+def growth(recent, previous):
+    return (recent - previous) / previous * 100 if previous > 0 else 0
+
+
+def reference_kpis(sales, start, end):
+    """The dashboard's original KPI rescan, on whole days and distinct orders"""
+    days = sales['order_purchase_timestamp'].dt.normalize()
+    rows = sales[(days >= pd.Timestamp(start).normalize()) & (days <= pd.Timestamp(end).normalize())]
+    days = days[rows.index]
+    revenue, orders = rows['total_price'].sum(), rows['order_id'].nunique()
+    kpis = {'total_revenue': revenue, 'total_orders': orders,
+            'avg_order_value': revenue / orders if orders else 0,
+            'revenue_growth': 0, 'orders_growth': 0, 'aov_growth': 0}
+    if rows.empty:
+        return kpis
+    latest = days.max()
+    recent = rows[days > latest - timedelta(days=GROWTH_WINDOW_DAYS)]
+    previous = rows[(days > latest - timedelta(days=2 * GROWTH_WINDOW_DAYS))
+                    & (days <= latest - timedelta(days=GROWTH_WINDOW_DAYS))]
+    windows = [(part['total_price'].sum(), part['order_id'].nunique()) for part in (recent, previous)]
+    (recent_revenue, recent_orders), (previous_revenue, previous_orders) = windows
+    kpis['revenue_growth'] = growth(recent_revenue, previous_revenue)
+    kpis['orders_growth'] = growth(recent_orders, previous_orders)
+    kpis['aov_growth'] = growth(recent_revenue / recent_orders if recent_orders else 0,
+                                previous_revenue / previous_orders if previous_orders else 0)
+    return kpis
+
+
+def date_ranges(sales):
+    """Full history, a long middle stretch and short ranges that clip the growth windows"""
+    first = sales['order_purchase_timestamp'].min().normalize()
+    last = sales['order_purchase_timestamp'].max().normalize()
+    middle = first + (last - first) / 2
+    return [
+        (first, last),
+        (first + timedelta(days=90), last - timedelta(days=90)),
+        (middle, middle + timedelta(days=44)),      # previous window cut to 15 days
+        (middle, middle + timedelta(days=20)),      # no previous window at all
+        (last + timedelta(days=1), last + timedelta(days=30)),      # no sales
+    ]
+
+
+@pytest.fixture(scope='module')
+def cube(tables):
+    return DailyCube.from_sales(tables['sales'], tables['products'])
+
+
+def assert_kpis_equal(actual, expected):
+    assert set(expected) <= set(actual)
+    for name, value in expected.items():
+        assert actual[name] == pytest.approx(value, rel=1e-9, abs=1e-9), name
+
+
+def test_kpis_match_rescan(cube, tables):
+    for start, end in date_ranges(tables['sales']):
+        assert_kpis_equal(cube.kpis(start, end), reference_kpis(tables['sales'], start, end))
+
+
+def test_short_range_growth_stays_inside_range(cube, tables):
+    sales = tables['sales']
+    start, end = date_ranges(sales)[2]
+    kpis = cube.kpis(start, end)
+    # A window reaching before the range would pick up revenue outside it
+    full = cube.kpis(sales['order_purchase_timestamp'].min(), end)
+    assert kpis['total_revenue'] < full['total_revenue']
+    assert kpis['revenue_growth'] == pytest.approx(reference_kpis(sales, start, end)['revenue_growth'])
+
+
+def test_series_and_category_split_sum_to_totals(cube, tables):
+    sales = tables['sales']
+    start, end = date_ranges(sales)[1]
+    totals = cube.totals(start, end)
+    monthly = cube.series(start, end, freq='M')
+    assert monthly['revenue'].sum() == pytest.approx(totals['revenue'])
+    assert monthly['orders'].sum() == totals['orders']
+    assert cube.by_category(start, end)['revenue'].sum() == pytest.approx(totals['revenue'])
+
+    days = sales['order_purchase_timestamp'].dt.normalize()
+    rows = sales[(days >= start) & (days <= end)]
+    expected = rows.groupby(rows['order_purchase_timestamp'].dt.to_period('M'))['total_price'].sum()
+    np.testing.assert_allclose(monthly['revenue'].to_numpy(), expected.to_numpy())
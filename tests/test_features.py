@@ -0,0 +1,94 @@
+"""RFM feature store: folding an append gives the same store as a rebuild"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retailsmart.features import KEY, read_store, refresh_store, rfm_frame
+
+
+def split_at_order(path, fraction):
+    """(head bytes, tail bytes) of a sales CSV, cut where a new order starts"""
+    with open(path, 'rb') as f:
+        lines = f.readlines()
+    orders = [line.split(b',', 1)[0] for line in lines]
+    cut = int(len(lines) * fraction)
+    while orders[cut] == orders[cut - 1]:
+        cut += 1
+    return b''.join(lines[:cut]), b''.join(lines[cut:])
+
+
+@pytest.fixture
+def sources(dataset_dir, tmp_path):
+    """Scratch copies of the sources the store reads"""
+    paths = {}
+    for table in ('customers', 'sales', 'marketing'):
+        paths[table] = str(tmp_path / f'{table}.csv')
+        shutil.copy(os.path.join(dataset_dir, f'{table}.csv'), paths[table])
+    return paths
+
+
+def test_incremental_fold_matches_rebuild(sources, tmp_path):
+    store_path = str(tmp_path / 'rfm_store.parquet')
+    head, tail = split_at_order(sources['sales'], 0.8)
+    marketing_head, marketing_tail = split_at_order(sources['marketing'], 0.5)
+    with open(sources['sales'], 'wb') as f:
+        f.write(head)
+    with open(sources['marketing'], 'wb') as f:
+        f.write(marketing_head)
+    _, report = refresh_store(path=store_path, sources=sources)
+    assert report['full_rebuild']
+
+    with open(sources['sales'], 'ab') as f:
+        f.write(tail)
+    with open(sources['marketing'], 'ab') as f:
+        f.write(marketing_tail)
+    folded, report = refresh_store(path=store_path, sources=sources)
+    assert not report['full_rebuild']
+    assert report['sales'] == tail.count(b'\n')
+    assert report['marketing'] == marketing_tail.count(b'\n')
+
+    rebuilt, _ = refresh_store(rebuild=True, path=str(tmp_path / 'rebuilt.parquet'), sources=sources)
+    pd.testing.assert_frame_equal(folded.sort_index(), rebuilt.sort_index(), check_exact=False)
+    # The saved store and its watermarks round-trip together
+    stored, state = read_store(store_path)
+    pd.testing.assert_frame_equal(stored.sort_index(), folded.sort_index(), check_exact=False)
+    assert state['sales']['size'] == os.path.getsize(sources['sales'])
+
+
+def test_nothing_new_is_a_no_op(sources, tmp_path):
+    store_path = str(tmp_path / 'rfm_store.parquet')
+    refresh_store(path=store_path, sources=sources)
+    _, report = refresh_store(path=store_path, sources=sources)
+    assert report == {'sales': 0, 'marketing': 0, 'full_rebuild': False}
+
+
+def test_rewritten_source_rebuilds(sources, tmp_path):
+    store_path = str(tmp_path / 'rfm_store.parquet')
+    refresh_store(path=store_path, sources=sources)
+    with open(sources['sales'], 'rb') as f:
+        data = f.read()
+    header_end = data.index(b'\n') + 1
+    with open(sources['sales'], 'wb') as f:
+        f.write(data[:header_end] + data[header_end:].replace(b'credit_card', b'CREDIT_CARD', 1))
+    _, report = refresh_store(path=store_path, sources=sources)
+    assert report['full_rebuild']
+
+
+def test_rfm_matches_pandas(sources, tables, tmp_path):
+    store, _ = refresh_store(path=str(tmp_path / 'rfm_store.parquet'), sources=sources)
+    rfm = rfm_frame(store)
+
+    sales, customers = tables['sales'], tables['customers']
+    keys = sales['customer_id'].map(customers.drop_duplicates('customer_id').set_index('customer_id')[KEY])
+    grouped = sales.assign(**{KEY: keys}).groupby(KEY)
+    expected = pd.DataFrame({
+        'frequency': grouped['order_id'].nunique().astype(np.float64),
+        'monetary': grouped['total_price'].sum(),
+        'recency': (sales['order_purchase_timestamp'].max() - grouped['order_purchase_timestamp'].max()).dt.days,
+    })
+    actual = rfm.loc[expected.index, expected.columns]
+    pd.testing.assert_frame_equal(actual, expected, check_exact=False, check_dtype=False, check_names=False)
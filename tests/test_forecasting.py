@@ -0,0 +1,83 @@
+"""Hierarchical forecasting: series build-up and reconciliation"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retailsmart.forecasting import LEVELS, SEASON, SeriesSet, reconcile
+
+
+@pytest.fixture(scope='module')
+def series(tables):
+    return SeriesSet.from_sales(tables['sales'], tables['customers'])
+
+
+def children_sums(values, nodes, child_level):
+    """Sum of each parent's children, indexed by parent row"""
+    children = np.flatnonzero(nodes['level'].to_numpy() == child_level)
+    sums = np.zeros_like(values)
+    np.add.at(sums, nodes['parent'].to_numpy()[children], values[children])
+    return sums
+
+
+def test_series_match_pandas(series, tables):
+    sales = tables['sales']
+    months = sales['order_purchase_timestamp'].dt.to_period('M')
+    total = series.nodes['level'].to_numpy() == 'total'
+    np.testing.assert_allclose(series.revenue[total][0], sales.groupby(months)['total_price'].sum().to_numpy())
+
+    categories = series.nodes['level'].to_numpy() == 'category'
+    labels = series.nodes.loc[categories, 'category'].to_numpy()
+    by_category = sales.assign(category=sales['category_english'].astype(object).fillna('unknown'))
+    expected = by_category.groupby('category')['total_price'].sum().reindex(labels)
+    np.testing.assert_allclose(series.revenue[categories].sum(axis=1), expected.to_numpy())
+
+
+def test_history_is_coherent(series):
+    for parent_level, child_level in zip(LEVELS, LEVELS[1:]):
+        parents = series.nodes['level'].to_numpy() == parent_level
+        for values in (series.orders, series.revenue):
+            np.testing.assert_allclose(children_sums(values, series.nodes, child_level)[parents], values[parents])
+
+
+def test_top_down_keeps_total_and_forecast_proportions(series):
+    rng = np.random.default_rng(3)
+    base = rng.uniform(1, 100, size=(len(series), 6))
+    reconciled = reconcile(base, series.revenue, series.nodes)
+    levels = series.nodes['level'].to_numpy()
+    parents = series.nodes['parent'].to_numpy()
+
+    np.testing.assert_allclose(reconciled[levels == 'total'], base[levels == 'total'])
+    for parent_level, child_level in zip(LEVELS, LEVELS[1:]):
+        sums = children_sums(reconciled, series.nodes, child_level)
+        np.testing.assert_allclose(sums[levels == parent_level], reconciled[levels == parent_level])
+
+    # Within a category, states keep the ratios of their own forecasts
+    bottom = np.flatnonzero(levels == 'category_state')
+    ratio = reconciled[bottom] / base[bottom]
+    for parent in np.unique(parents[bottom]):
+        siblings = ratio[parents[bottom] == parent]
+        np.testing.assert_allclose(siblings, np.broadcast_to(siblings[0], siblings.shape))
+
+
+def test_top_down_falls_back_to_recent_history(series):
+    levels = series.nodes['level'].to_numpy()
+    parents = series.nodes['parent'].to_numpy()
+    base = np.ones((len(series), 3))
+    bottom = np.flatnonzero(levels == 'category_state')
+    sizes = pd.Series(parents[bottom]).value_counts()
+    category = int(sizes.index[0])          # the category with the most states
+    zeroed = bottom[parents[bottom] == category]
+    base[zeroed] = 0
+    reconciled = reconcile(base, series.revenue, series.nodes)
+
+    recent = series.revenue[zeroed, -SEASON:].sum(axis=1)
+    np.testing.assert_allclose(reconciled[zeroed, 0], reconciled[category, 0] * recent / recent.sum())
+
+
+def test_bottom_up_sums_bottom_series(series):
+    base = np.random.default_rng(4).uniform(0, 10, size=(len(series), 4))
+    reconciled = reconcile(base, series.orders, series.nodes, method='bottom_up')
+    levels = series.nodes['level'].to_numpy()
+    np.testing.assert_allclose(reconciled[levels == 'category_state'], base[levels == 'category_state'])
+    np.testing.assert_allclose(reconciled[levels == 'total'][0], base[levels == 'category_state'].sum(axis=0))
@@ -0,0 +1,63 @@
+"""ID interning: hex <-> code round trips and persisted dictionaries"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from retailsmart.ids import (MISSING_CODE, IdDictionary, IdRegistry, hex_to_keys, keys_to_hex, load_registry,
+                             registry_file, save_registry)
+
+
+def test_hex_keys_round_trip(tables):
+    ids = tables['sales']['order_id'].to_numpy(dtype=object)
+    keys, valid = hex_to_keys(ids)
+    assert valid.all()
+    np.testing.assert_array_equal(keys_to_hex(keys), ids)
+
+
+def test_malformed_ids_are_invalid():
+    values = ['0123456789abcdef0123456789abcdef', None, 'short', 'zz23456789abcdef0123456789abcdef']
+    _, valid = hex_to_keys(values)
+    assert valid.tolist() == [True, False, False, False]
+
+    dictionary = IdDictionary.from_columns([pd.Series(values)])
+    assert len(dictionary) == 1
+    codes = dictionary.encode(values + ['ffffffffffffffffffffffffffffffff'])
+    assert codes.tolist() == [0, MISSING_CODE, MISSING_CODE, MISSING_CODE, MISSING_CODE]
+    assert dictionary.decode(codes).tolist() == [values[0], None, None, None, None]
+
+
+def test_interned_tables_decode_to_the_source(tables, interned):
+    interned_tables, registry = interned
+    for name in ('sales', 'customers', 'products'):
+        for column in interned_tables[name].columns:
+            if registry.column_entity(column) is None:
+                continue
+            assert interned_tables[name][column].dtype == np.int32
+            decoded = registry.decode_frame(interned_tables[name][[column]])[column]
+            np.testing.assert_array_equal(decoded.to_numpy(), tables[name][column].to_numpy(dtype=object))
+
+
+def test_codes_are_shared_across_tables(tables, interned):
+    interned_tables, _ = interned
+    # Same product_id, same code, so joins on codes match joins on hex
+    by_code = interned_tables['sales'][['product_id']].merge(
+        interned_tables['products'][['product_id']], on='product_id')
+    by_hex = tables['sales'][['product_id']].merge(tables['products'][['product_id']], on='product_id')
+    assert len(by_code) == len(by_hex)
+
+
+def test_registry_save_load_round_trip(interned, tmp_path):
+    _, registry = interned
+    save_registry(registry, str(tmp_path))
+    loaded = load_registry(str(tmp_path), mmap_mode='r')
+    assert loaded.summary() == registry.summary()
+    for entity, dictionary in registry.dictionaries.items():
+        np.testing.assert_array_equal(loaded.dictionaries[entity].keys, dictionary.keys)
+
+    # Entities the registry no longer has are removed, not left stale
+    fewer = IdRegistry({'order': registry.dictionaries['order']})
+    save_registry(fewer, str(tmp_path))
+    assert set(load_registry(str(tmp_path)).dictionaries) == {'order'}
+    assert not os.path.exists(registry_file(str(tmp_path), 'product'))
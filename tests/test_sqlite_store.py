@@ -0,0 +1,53 @@
+"""SQLite store: KPIs agree with the cube and the rescan, and duplicate keys are counted"""
+
+import os
+import sqlite3
+
+import pandas as pd
+import pytest
+from test_cube import assert_kpis_equal, date_ranges, reference_kpis
+
+from retailsmart.cube import DailyCube
+from retailsmart.sqlite_store import SqliteAnalytics, build_database, duplicate_keys
+
+
+@pytest.fixture(scope='module')
+def analytics(tables, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('sqlite') / 'retailsmart.db')
+    build_database({name: tables[name] for name in ('customers', 'sales', 'products')}, path, version='test')
+    analytics = SqliteAnalytics(path)
+    yield analytics
+    analytics.close()
+
+
+def test_kpis_match_rescan_and_cube(analytics, tables):
+    cube = DailyCube.from_sales(tables['sales'], tables['products'])
+    for start, end in date_ranges(tables['sales']):
+        expected = reference_kpis(tables['sales'], start, end)
+        assert_kpis_equal(analytics.kpis(start, end), expected)
+        assert_kpis_equal(analytics.kpis(start, end), cube.kpis(start, end))
+
+
+def test_short_range_growth(analytics, tables):
+    for start, end in date_ranges(tables['sales'])[2:4]:
+        kpis = analytics.kpis(start, end)
+        expected = reference_kpis(tables['sales'], start, end)
+        assert kpis['revenue_growth'] == pytest.approx(expected['revenue_growth'])
+        assert kpis['orders_growth'] == pytest.approx(expected['orders_growth'])
+
+
+def test_duplicate_primary_keys_keep_last_row(tables, tmp_path):
+    customers = tables['customers']
+    repeated = customers.iloc[:3].assign(customer_state='XX')
+    path = str(tmp_path / 'dupes.db')
+    build_database({'customers': pd.concat([customers, repeated], ignore_index=True)}, path)
+
+    assert duplicate_keys(path) == {'customers': 3}
+    conn = sqlite3.connect(path)
+    try:
+        count, replaced = conn.execute(
+            "SELECT COUNT(*), SUM(customer_state = 'XX') FROM customers").fetchone()
+    finally:
+        conn.close()
+    assert (count, replaced) == (len(customers), 3)
+    assert not os.path.exists(path + '-wal')